@@ -0,0 +1,57 @@
+"""离线批处理自博弈：所有对局的模型调用按前沿合批，经 Batch API 提交（见 src/agent/batch.py）。
+
+用法：
+    python scripts/batch_selfplay.py --games 500 --preset classic_9 --workdir batches/run-1
+    python scripts/batch_selfplay.py --games 20 --local http://127.0.0.1:8900/v1  # 本地替身（如 mock_openai）
+使用真实 Batch API 时需要配置 DEEPSEEK_API_KEY（或 --api-key-env），且端点需支持 /v1/batches。
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.agent.batch import BatchRunner, LocalBatchClient, OpenAIBatchClient
+from src.agent.mock_openai import mock_model_tiers
+from src.agent.model_tiers import DEFAULT_API_BASE, ModelUsageStats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="离线批处理自博弈")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--preset", default="classic_9")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default="batches/run")
+    parser.add_argument("--base-url", default=DEFAULT_API_BASE)
+    parser.add_argument("--api-key-env", default="DEEPSEEK_API_KEY")
+    parser.add_argument("--poll", type=float, default=30.0, help="批任务轮询间隔（秒）")
+    parser.add_argument("--local", default=None, help="本地替身端点；指定时逐条请求该端点而不提交批任务")
+    args = parser.parse_args()
+
+    configurable = {"preset": args.preset}
+    if args.local:
+        client = LocalBatchClient(args.local, args.api_key_env, concurrency=16)
+        configurable["model_tiers"] = mock_model_tiers(args.local)
+    else:
+        client = OpenAIBatchClient(args.base_url, args.api_key_env, poll_interval_s=args.poll)
+
+    usage = ModelUsageStats()
+    runner = BatchRunner(client, workdir=args.workdir)
+    for i in range(args.games):
+        runner.add_game(f"game-{args.seed + i}", {**configurable, "seed": args.seed + i, "priority": "batch", "usage_stats": usage})
+    start = time.perf_counter()
+    finals = runner.run()
+    elapsed = time.perf_counter() - start
+    finished = sum(1 for s in finals.values() if s and s.get("game_over"))
+    print(runner.report())
+    print(f"吞吐：{finished / elapsed * 3600:.1f} games/hour（{elapsed:.1f}s）")
+    print(usage.report())
+
+
+if __name__ == "__main__":
+    main()
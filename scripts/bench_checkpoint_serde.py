@@ -0,0 +1,93 @@
+"""checkpoint 序列化基准：对比默认 JsonPlusSerializer 与 GameStateSerializer。
+
+用法：python scripts/bench_checkpoint_serde.py [--days 8] [--preset classic_12]
+
+模拟一局逐日增长的对局（每天每名存活玩家一条发言、若干公告、每人追加内心想法、
+一轮投票），每天结束时把状态中的每个通道各序列化一次（相当于一次全量 checkpoint），
+输出每步字节数与编码/解码耗时，并校验整数键 `votes` 的往返正确性。
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+sys.path.append(os.getcwd())
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")  # 模块级 ChatOpenAI 需要 key，基准不会发起调用
+
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from src.agent.configuration import GAME_PRESETS
+from src.agent.memory import remember_private, remember_thought
+from src.agent.serde import GameStateSerializer
+from src.agent.state import GameState, Message, PlayerState
+from src.utils.helpers import get_default_state
+
+
+def _advance_day(state: GameState, day: int) -> None:
+    """原地推进一天：发言、公告、内心想法、投票"""
+    alive = state["alive_players"]
+    history = state["history"]
+    history.append(Message(role="system", content=f"【上帝公告】第{day}天。昨晚是平安夜。"))
+    roles = {p.id: p.role for p in state["players"]}
+    for p_id in alive:
+        history.append(Message(role=roles[p_id], content=f"我是{p_id}号，我觉得{alive[(p_id) % len(alive)]}号发言有问题，票型上和前置位抱团。", player_id=p_id))
+    state["players"] = [
+        remember_private(
+            remember_thought(p, f"第{day}天：重点关注票型，怀疑{alive[(p.id + day) % len(alive)]}号。", day=day),
+            Message(role="system", content=f"第{day}天私有记录"),
+        )
+        for p in state["players"]
+    ]
+    state["votes"] = {p_id: alive[(p_id + day) % len(alive)] for p_id in alive}
+    history.append(Message(role="system", content="【系统公告】处决投票详情：" + "；".join(f"{v} 投给 {t}号" for v, t in state["votes"].items())))
+    state["day_count"] = day
+
+
+def _checkpoint(serde: SerializerProtocol, state: GameState) -> Tuple[int, float, float]:
+    """序列化全部通道，返回 (字节数, 编码秒, 解码秒)"""
+    start = time.perf_counter()
+    blobs = [serde.dumps_typed(v) for v in state.values()]
+    encoded = time.perf_counter()
+    decoded = [serde.loads_typed(b) for b in blobs]
+    done = time.perf_counter()
+    restored: Dict[str, Any] = dict(zip(state.keys(), decoded))
+    assert restored["votes"] == state["votes"], "votes 往返不一致"
+    assert all(isinstance(k, int) for k in restored["votes"]), "votes 键类型丢失"
+    assert restored["history"] == state["history"]
+    assert restored["players"] == state["players"]
+    return sum(len(b[1]) for b in blobs), encoded - start, done - encoded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="checkpoint 序列化基准")
+    parser.add_argument("--days", type=int, default=8)
+    parser.add_argument("--preset", default="classic_12")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    serdes: List[Tuple[str, SerializerProtocol]] = [
+        ("jsonplus", JsonPlusSerializer(allowed_msgpack_modules=[PlayerState, Message])),
+        ("compact", GameStateSerializer()),
+    ]
+    state = get_default_state(GAME_PRESETS[args.preset])
+    print(f"{'day':>3} {'msgs':>5} | " + " | ".join(f"{name:>8} bytes  enc(us)  dec(us)" for name, _ in serdes) + " | ratio")
+    for day in range(1, args.days + 1):
+        _advance_day(state, day)
+        row = []
+        sizes = []
+        for _, serde in serdes:
+            total_enc = total_dec = 0.0
+            size = 0
+            for _ in range(args.repeat):
+                size, enc, dec = _checkpoint(serde, state)
+                total_enc += enc
+                total_dec += dec
+            sizes.append(size)
+            row.append(f"{size:>14} {total_enc / args.repeat * 1e6:>8.0f} {total_dec / args.repeat * 1e6:>8.0f}")
+        print(f"{day:>3} {len(state['history']):>5} | " + " | ".join(row) + f" | {sizes[1] / sizes[0]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""引擎扩展性基准：测量不同桌型下 GM / Action 单步耗时，验证 O(n) 缩放。
+
+用法：python scripts/bench_engine_scaling.py [--repeat 2000]
+
+只覆盖不调用模型的纯引擎步骤（胜负判定 + 调度、投票派发、收票判定、
+投票结算、天亮公告），每个桌型输出每步微秒数，并对 人数->耗时 做线性拟合，
+给出每增加一个座位的边际耗时与 R²。若引擎为 O(n)，R² 应接近 1 且边际耗时很小。
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.append(os.getcwd())
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")  # 模块级 ChatOpenAI 需要 key，基准不会发起调用
+
+from src.agent.configuration import GAME_PRESETS
+from src.agent.nodes.engine import action_handler_node, game_master_node, get_ordered_queue
+from src.agent.state import GameState
+from src.utils.helpers import get_default_state
+
+
+def _day_state(preset: str) -> GameState:
+    """构造一个第 2 天白天、全员存活、有警长的对局状态"""
+    state = get_default_state(GAME_PRESETS[preset])
+    alive = state["alive_players"]
+    state.update({
+        "phase": "day",
+        "day_count": 2,
+        "sheriff_id": alive[len(alive) // 2],
+        "speech_order_preference": "counter_clockwise",
+        "pk_candidates": [],
+        "pending_last_words": [],
+    })
+    return state
+
+
+def _steps(state: GameState) -> List[Tuple[str, Callable[[], Any]]]:
+    alive = state["alive_players"]
+    # 所有人投给 1 号（非警长），保证唯一出局者
+    votes = {p_id: alive[0] for p_id in alive}
+    discussion = {**state, "turn_type": "discussion", "discussion_queue": get_ordered_queue(state)}
+    voting = {**state, "turn_type": "voting", "discussion_queue": list(alive)}
+    voting_wait = {**state, "turn_type": "voting", "discussion_queue": [], "votes": votes}
+    voting_settle = {**state, "turn_type": "voting_settle", "votes": votes}
+    announce = {**state, "turn_type": "day_announcement", "last_night_dead": alive[-2:]}
+    return [
+        ("gm_discussion", lambda: game_master_node(discussion, {})),
+        ("gm_voting_dispatch", lambda: game_master_node(voting, {})),
+        ("gm_voting_collect", lambda: game_master_node(voting_wait, {})),
+        ("action_voting_settle", lambda: action_handler_node(voting_settle, {})),
+        # day_announcement 会原地修改玩家的 is_alive，这里每次传入新的玩家拷贝
+        ("action_day_announcement", lambda: action_handler_node(
+            {**announce, "players": [p.model_copy() for p in announce["players"]]}, {})),
+    ]
+
+
+def run(repeat: int) -> Dict[str, Dict[int, float]]:
+    """返回 {步骤: {人数: 每步微秒}}"""
+    results: Dict[str, Dict[int, float]] = {}
+    for preset in sorted(GAME_PRESETS, key=lambda k: sum(GAME_PRESETS[k].values())):
+        n = sum(GAME_PRESETS[preset].values())
+        for name, step in _steps(_day_state(preset)):
+            step()  # 预热
+            start = time.perf_counter()
+            for _ in range(repeat):
+                step()
+            elapsed = time.perf_counter() - start
+            results.setdefault(name, {})[n] = elapsed / repeat * 1e6
+    return results
+
+
+def _linear_fit(xs: List[int], ys: List[float]) -> Tuple[float, float]:
+    """最小二乘拟合 y = a + b*x，返回 (b, R²)"""
+    n = len(xs)
+    mx, my = sum(xs) / n, sum(ys) / n
+    sxx = sum((x - mx) ** 2 for x in xs)
+    sxy = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+    b = sxy / sxx
+    ss_tot = sum((y - my) ** 2 for y in ys) or 1e-12
+    ss_res = sum((y - (my + b * (x - mx))) ** 2 for x, y in zip(xs, ys))
+    return b, 1 - ss_res / ss_tot
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    sizes = sorted(next(iter(results.values())))
+    print(f"{'step (us)':<26}" + "".join(f"{n:>9}" for n in sizes) + f"{'us/seat':>10}{'R2':>7}")
+    for name, per_size in results.items():
+        slope, r2 = _linear_fit(sizes, [per_size[n] for n in sizes])
+        row = "".join(f"{per_size[n]:>9.1f}" for n in sizes)
+        print(f"{name:<26}{row}{slope:>10.2f}{r2:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""多桌托管内存基准：每条消息与每局对局常驻的字节数。
+
+用法：python scripts/bench_memory.py [--messages 20000] [--games 8] [--preset classic_12]
+
+1. 每条消息：按真实对局的比例（重复的系统公告与玩家发言）构造一批消息，
+   用 tracemalloc 分别统计紧凑的 `Message` 与旧版 pydantic 消息的常驻字节数；
+2. 每局对局：跑完若干局规则机器人对局并保留终局状态（相当于托管多桌时常驻的状态），
+   统计每局的常驻字节数与消息条数。
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from typing import Any, Callable, List, Optional, Tuple
+
+sys.path.append(os.getcwd())
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")  # 模块级 ChatOpenAI 需要 key，基准不会发起调用
+
+from pydantic import BaseModel
+
+from src.agent.graph import workflow
+from src.agent.state import Message
+
+
+class LegacyMessage(BaseModel):
+    """改造前的 pydantic 消息，仅用于对比"""
+
+    role: str
+    content: str
+    player_id: Optional[int] = None
+
+
+ROLES = ["werewolf", "villager", "seer", "witch", "hunter", "guard"]
+
+
+def _build_messages(cls: Callable[..., Any], n: int) -> List[Any]:
+    """按真实对局比例构造消息：约 1/3 系统公告（大量重复），其余为玩家发言"""
+    msgs: List[Any] = []
+    for i in range(n):
+        day = i // 60 + 1
+        if i % 3 == 0:
+            # 动态拼接的公告，与对局中一样每条都是新字符串对象
+            msgs.append(cls(role="".join(["sys", "tem"]), content=f"【上帝公告】第{day}天。昨晚是平安夜。"))
+        else:
+            p_id = i % 12 + 1
+            role = "".join([ROLES[p_id % len(ROLES)], ""])
+            msgs.append(cls(role=role, content=f"我是{p_id}号，我觉得{(p_id + i) % 12 + 1}号发言有问题，第{i}次发言。", player_id=p_id))
+    return msgs
+
+
+def _measure(build: Callable[[], Any]) -> Tuple[Any, int]:
+    """返回 (对象, 构造后常驻的字节数)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, after - before
+
+
+def bench_messages(n: int) -> None:
+    """每条消息的常驻字节数（含内容字符串）"""
+    print(f"== 每条消息（{n} 条，1/3 为系统公告）==")
+    results = {}
+    for name, cls in (("legacy", LegacyMessage), ("compact", Message)):
+        msgs, size = _measure(lambda: _build_messages(cls, n))
+        results[name] = size
+        print(f"{name:>8}: {size / n:>8.1f} bytes/msg")
+        del msgs
+    print(f"   ratio: {results['compact'] / results['legacy']:.2f}")
+
+
+def bench_games(games: int, preset: str) -> None:
+    """每局对局常驻的字节数（保留终局状态）"""
+    graph = workflow.compile()
+
+    def run() -> List[Any]:
+        return [
+            graph.invoke({}, {"recursion_limit": 2000, "configurable": {"preset": preset, "seed": seed, "player_policy": "bot"}})
+            for seed in range(games)
+        ]
+
+    graph.invoke({}, {"recursion_limit": 2000, "configurable": {"preset": preset, "seed": 0, "player_policy": "bot"}})  # 预热
+    finals, size = _measure(run)
+    n_msgs = sum(len(s["history"]) + sum(len(p.private_history) for p in s["players"]) for s in finals)
+    print(f"== 每局对局（{games} 局 {preset}，规则机器人）==")
+    print(f"  {size / games:>10.0f} bytes/game   {n_msgs / games:.0f} msgs/game")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="多桌托管内存基准")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--games", type=int, default=8)
+    parser.add_argument("--preset", default="classic_12")
+    args = parser.parse_args()
+    bench_messages(args.messages)
+    bench_games(args.games, args.preset)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""从录制的对局构建开局库。
+
+用法：
+    python scripts/build_opening_book.py books/classic_12.jsonl games/*.jsonl [--max-variants 4]
+
+无网络重放每盘磁带（见 `src/agent/replay.py`），收录其中大模型座位的首日决策与发言；
+输出文件已存在时在其基础上追加。
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ.setdefault("DEEPSEEK_API_KEY", "replay")  # 重放不会发起模型调用
+
+from src.agent.graph import workflow
+from src.agent.opening_book import OpeningBook, build_opening_book
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="从录制的对局构建开局库")
+    parser.add_argument("output", help="开局库文件（JSONL）")
+    parser.add_argument("tapes", nargs="+", help="录制的对局磁带")
+    parser.add_argument("--max-variants", type=int, default=4)
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        book = OpeningBook.load(args.output, max_variants=args.max_variants)
+    else:
+        book = OpeningBook(max_variants=args.max_variants)
+    before = len(book)
+    build_opening_book(args.tapes, book, graph=workflow.compile())
+    book.save(args.output)
+    print(f"{len(args.tapes)} 盘对局，新增 {len(book) - before} 个变体，共 {len(book.entries)} 个局面 / {len(book)} 个变体 → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
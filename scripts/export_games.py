@@ -0,0 +1,48 @@
+"""批量运行对局并导出为列式文件，供向量化分析（DuckDB / Polars / pandas）。
+
+用法：python scripts/export_games.py --games 1000 --preset classic_12 --policy bot --out exports/bot-run
+需要 pyarrow（pip install -e ".[analytics]"）；使用 llm 策略时需要配置 DEEPSEEK_API_KEY。
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.agent.analytics import ColumnarExporter
+from src.agent.host import GameHost
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="对局列式导出")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--preset", default="classic_12")
+    parser.add_argument("--policy", default="bot", help="玩家策略：llm / bot")
+    parser.add_argument("--out", default="exports/run")
+    parser.add_argument("--format", default="parquet", choices=["parquet", "arrow"])
+    parser.add_argument("--row-group", type=int, default=256, help="每个行组包含的对局数")
+    parser.add_argument("--batch", type=int, default=64, help="每批并发托管的对局数")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with ColumnarExporter(args.out, fmt=args.format, row_group_size=args.row_group) as exporter:
+        for offset in range(0, args.games, args.batch):
+            host = GameHost(max_workers=args.workers)
+            for i in range(offset, min(args.games, offset + args.batch)):
+                host.add_game(f"game-{i}", {"preset": args.preset, "seed": i, "player_policy": args.policy, "priority": "batch"})
+            for game_id, state in (await host.run()).items():
+                if state and state.get("game_over"):
+                    exporter.add(game_id, state)
+        exporter.flush()
+        print(f"导出 {exporter.games_written} 局到 {args.out}（{time.perf_counter() - start:.1f}s）")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
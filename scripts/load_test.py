@@ -0,0 +1,148 @@
+"""压测 langgraph dev 部署的 `agent` 图（含 HTTP API），模型请求打到本地模拟服务。
+
+用法：
+    langgraph dev --port 2024  # 另一个终端
+    python scripts/load_test.py --url http://127.0.0.1:2024 --concurrency 8 --games 32 --mock
+`--mock` 在本进程内启动 OpenAI 兼容模拟服务并通过 `model_tiers` 的 openai_api_base 选用；
+也可用 `--mock-base` 指向单独启动的模拟服务（scripts/mock_openai.py）。
+每个工作线程依次：创建线程 → `runs/stream`（updates 模式）跑完一局，
+统计每局耗时、相邻两步之间的间隔（步延迟）与错误，最后输出 games/hour 等汇总。
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.getcwd())
+
+from src.agent.mock_openai import MockBehavior, MockOpenAIServer, mock_model_tiers
+
+
+def _post(url: str, body: Dict[str, Any], timeout: float) -> Any:
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    return urllib.request.urlopen(request, timeout=timeout)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LoadStats:
+    """压测统计（线程安全）"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.finished = 0
+        self.failed = 0
+        self.steps = 0
+        self.step_errors = 0
+        self.step_latencies: List[float] = []
+        self.game_durations: List[float] = []
+        self.errors: Dict[str, int] = {}
+
+    def fail(self, reason: str) -> None:
+        with self.lock:
+            self.failed += 1
+            self.errors[reason] = self.errors.get(reason, 0) + 1
+
+
+def play_game(args: argparse.Namespace, index: int, configurable: Dict[str, Any], stats: LoadStats) -> None:
+    """通过 HTTP API 跑完一局"""
+    start = time.perf_counter()
+    try:
+        with _post(f"{args.url}/threads", {}, args.timeout) as resp:
+            thread_id = json.load(resp)["thread_id"]
+        body = {
+            "assistant_id": args.assistant,
+            "input": {},
+            "config": {"recursion_limit": 2000, "configurable": {**configurable, "seed": args.seed + index}},
+            "stream_mode": ["updates"],
+        }
+        last = time.perf_counter()
+        event, game_over = None, False
+        with _post(f"{args.url}/threads/{thread_id}/runs/stream", body, args.timeout) as resp:
+            for raw in resp:
+                line = raw.decode("utf-8").rstrip("\r\n")
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:") and event is not None:
+                    now = time.perf_counter()
+                    if event == "error":
+                        with stats.lock:
+                            stats.step_errors += 1
+                    elif event.startswith("updates"):
+                        data = json.loads(line[5:])
+                        game_over = game_over or any(isinstance(v, dict) and v.get("game_over") for v in data.values())
+                        with stats.lock:
+                            stats.steps += 1
+                            stats.step_latencies.append(now - last)
+                    last, event = now, None
+        if not game_over:
+            stats.fail("未结束")
+            return
+        with stats.lock:
+            stats.finished += 1
+            stats.game_durations.append(time.perf_counter() - start)
+    except Exception as e:  # 单局失败计入错误率，不中断压测
+        stats.fail(type(e).__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="langgraph dev 压测")
+    parser.add_argument("--url", default="http://127.0.0.1:2024")
+    parser.add_argument("--assistant", default="agent")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发对局数（工作线程数）")
+    parser.add_argument("--games", type=int, default=8)
+    parser.add_argument("--preset", default="classic_9")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--mock", action="store_true", help="在本进程内启动模拟服务")
+    parser.add_argument("--mock-base", default=None, help="已启动的模拟服务地址，如 http://127.0.0.1:8900/v1")
+    parser.add_argument("--mock-port", type=int, default=8900)
+    parser.add_argument("--latency", default="lognormal", choices=["fixed", "uniform", "lognormal"])
+    parser.add_argument("--median", type=float, default=0.5)
+    parser.add_argument("--spread", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server: Optional[MockOpenAIServer] = None
+    configurable: Dict[str, Any] = {"preset": args.preset}
+    if args.mock:
+        behavior = MockBehavior(args.latency, args.median, args.spread, args.rate_limit_rate, args.error_rate)
+        server = MockOpenAIServer(port=args.mock_port, behavior=behavior)
+        server.start_in_thread()
+        configurable["model_tiers"] = mock_model_tiers(server.base_url)
+    elif args.mock_base:
+        configurable["model_tiers"] = mock_model_tiers(args.mock_base)
+
+    stats = LoadStats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for i in range(args.games):
+            executor.submit(play_game, args, i, configurable, stats)
+    elapsed = time.perf_counter() - start
+
+    total = stats.finished + stats.failed
+    lat = stats.step_latencies
+    print(f"对局：{stats.finished}/{total} 完成，失败率 {stats.failed / max(1, total):.1%}，错误 {stats.errors or '-'}")
+    print(f"吞吐：{stats.finished / elapsed * 3600:.1f} games/hour（并发 {args.concurrency}，耗时 {elapsed:.1f}s）")
+    print(f"单局：avg={sum(stats.game_durations) / max(1, len(stats.game_durations)):.1f}s p95={_percentile(stats.game_durations, 0.95):.1f}s")
+    print(
+        f"步延迟：steps={stats.steps} errors={stats.step_errors} avg={sum(lat) / max(1, len(lat)):.3f}s "
+        f"p50={_percentile(lat, 0.5):.3f}s p95={_percentile(lat, 0.95):.3f}s max={max(lat, default=0.0):.3f}s"
+    )
+    if server is not None:
+        print(f"模拟服务：{server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""启动本地 OpenAI 兼容模拟服务（不消耗真实 token）。
+
+用法：python scripts/mock_openai.py --port 8900 --latency lognormal --median 0.8 --error-rate 0.02
+对局中把模型层级的 openai_api_base 指向 http://127.0.0.1:8900/v1 即可（见 src/agent/mock_openai.py）。
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from src.agent.mock_openai import MockBehavior, MockOpenAIServer
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI 兼容模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default="lognormal", choices=["fixed", "uniform", "lognormal"])
+    parser.add_argument("--median", type=float, default=0.5, help="延迟中位数（秒）")
+    parser.add_argument("--spread", type=float, default=0.5, help="uniform 为 ±秒数，lognormal 为 sigma")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回 429 的比例")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的比例")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    behavior = MockBehavior(args.latency, args.median, args.spread, args.rate_limit_rate, args.error_rate, args.seed)
+    server = MockOpenAIServer(args.host, args.port, behavior)
+    await server.start()
+    print(f"模拟服务：{server.base_url}", flush=True)
+    try:
+        while True:
+            await asyncio.sleep(30)
+            print(server.stats, flush=True)
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""剖析整局对局：为每局写出 collapsed-stack 火焰图与区间统计。
+
+用法：python scripts/profile_game.py --games 2 --preset classic_9 --policy llm --out profiles
+输出 profiles/<game_id>.collapsed（flamegraph.pl / speedscope 可直接打开）与 <game_id>.summary.json。
+使用 llm 策略时需要配置 DEEPSEEK_API_KEY。
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.agent.host import GameHost
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="对局性能剖析")
+    parser.add_argument("--games", type=int, default=1)
+    parser.add_argument("--preset", default="classic_9")
+    parser.add_argument("--policy", default="llm", help="玩家策略：llm / bot")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="profiles")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    host = GameHost(max_workers=args.workers)
+    for i in range(args.games):
+        host.add_game(f"game-{args.seed + i}", {"preset": args.preset, "seed": args.seed + i, "player_policy": args.policy, "profile_dir": args.out})
+    await host.run()
+    print(host.report())
+    for i in range(args.games):
+        path = os.path.join(args.out, f"game-{args.seed + i}.summary.json")
+        with open(path, encoding="utf-8") as f:
+            summary = json.load(f)
+        print(f"\n{path}  采样：{summary['samples']}")
+        for label, stats in sorted(summary["regions"].items(), key=lambda kv: -kv[1]["wall_s"]):
+            print(f"  {label:<28}calls={stats['calls']:<6}wall={stats['wall_s']:.3f}s cpu={stats['cpu_s']:.3f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
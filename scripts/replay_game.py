@@ -0,0 +1,46 @@
+"""录制 / 重放一局对局。
+
+用法：
+    python scripts/replay_game.py record games/g1.jsonl --preset classic_9 [--seed 42]
+    python scripts/replay_game.py replay games/g1.jsonl
+
+录制需要配置 DEEPSEEK_API_KEY；重放不访问网络，并校验终局状态与录制一致。
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ.setdefault("DEEPSEEK_API_KEY", "replay")  # 重放不会发起模型调用
+
+from src.agent.replay import record_game, replay_game, state_digest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="对局录制与重放")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("path", help="磁带文件（JSONL）")
+    parser.add_argument("--preset", default="classic_12")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.mode == "record":
+        configurable = {"preset": args.preset}
+        if args.seed is not None:
+            configurable["seed"] = args.seed
+        final = record_game(configurable, args.path)
+    else:
+        final = replay_game(args.path)
+    elapsed = time.perf_counter() - start
+    print(f"{args.mode} 完成：{elapsed:.3f}s，天数 {final.get('day_count')}，digest {state_digest(final)[:16]}")
+    print(final.get("history")[-1].content if final.get("history") else "")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""在单进程内并发托管多桌对局，并定期打印每桌进度。
+
+用法：python scripts/run_host.py --games 12 --workers 16 --preset classic_9
+需要配置 DEEPSEEK_API_KEY。
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.agent.host import GameHost
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="多桌托管")
+    parser.add_argument("--games", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=8, help="共享模型池的并发上限")
+    parser.add_argument("--batch-games", type=int, default=0, help="额外的离线自博弈桌数（batch 优先级）")
+    parser.add_argument("--preset", default="classic_12")
+    parser.add_argument("--interval", type=float, default=10.0, help="进度打印间隔（秒）")
+    args = parser.parse_args()
+
+    host = GameHost(max_workers=args.workers)
+    for i in range(args.games):
+        host.add_game(f"table-{i + 1}", {"preset": args.preset, "priority": "live"})
+    for i in range(args.batch_games):
+        host.add_game(f"batch-{i + 1}", {"preset": args.preset, "priority": "batch"})
+
+    async def report_loop() -> None:
+        while True:
+            await asyncio.sleep(args.interval)
+            print(host.report(), flush=True)
+
+    reporter = asyncio.create_task(report_loop())
+    try:
+        await host.run()
+    finally:
+        reporter.cancel()
+    print(host.report())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
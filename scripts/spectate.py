@@ -0,0 +1,47 @@
+"""启动观战服务并托管若干桌对局，观众通过 SSE 订阅状态增量。
+
+用法：python scripts/spectate.py --games 4 --preset classic_9 --policy bot --port 8765
+观看：curl -N http://127.0.0.1:8765/games/table-1/events
+使用 llm 策略时需要配置 DEEPSEEK_API_KEY。
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.agent.host import GameHost
+from src.agent.spectator import SpectatorServer
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="SSE 观战服务")
+    parser.add_argument("--games", type=int, default=2)
+    parser.add_argument("--preset", default="classic_9")
+    parser.add_argument("--policy", default="llm", help="玩家策略：llm / bot")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--wait", type=float, default=5.0, help="开局前等待观众连入的秒数")
+    args = parser.parse_args()
+
+    server = SpectatorServer(host=args.host, port=args.port)
+    await server.start()
+    print(f"观战服务：http://{args.host}:{server.port}/games", flush=True)
+
+    host = GameHost(max_workers=args.workers, spectators=server)
+    for i in range(args.games):
+        host.add_game(f"table-{i + 1}", {"preset": args.preset, "player_policy": args.policy})
+    await asyncio.sleep(args.wait)
+    await host.run()
+    print(host.report())
+    await server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
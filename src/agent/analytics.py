@@ -0,0 +1,207 @@
+"""对局分析导出：把结束的对局写成列式文件（Parquet / Arrow IPC）。
+
+批量自博弈后要统计各身份 / 性格 / 座位的胜率、警长影响、投票准确率等，
+逐个解析 checkpoint 太慢。这里从 `game_over` 时的 `GameState` 中抽取五张表：
+
+- `games`：每局一行（种子、人数、天数、胜方、最终警长、消息数、模型调用数 / token / 花费）；
+- `players`：每名玩家一行（座位、身份、阵营、性格、是否存活、是否获胜、是否当过警长）；
+- `votes`：每张票一行（天数、类型 sheriff / exile / pk、投票者与被投者及其身份）；
+- `night_actions`：每个夜间 / 技能行动一行（天数、行动、目标及其身份）；
+- `speeches`：每条公屏发言一行（序号、天数、发言者、身份、内容）。
+
+投票与夜间行动取自事实账本的 `vote_log` / `night_log`（见 `facts`）。
+`ColumnarExporter` 按表缓冲行，每攒够 `row_group_size` 局写出一个行组（Parquet row group /
+Arrow record batch），内存占用与导出的总局数无关。
+
+写文件需要可选依赖 `pyarrow`（`pip install -e ".[analytics]"`）；抽取行本身不依赖它。
+
+示例：
+    with ColumnarExporter("exports/run-1", fmt="parquet") as exporter:
+        for game_id, state in finals.items():
+            exporter.add(game_id, state)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from src.agent.budget import usage_totals
+from src.agent.state import GameState
+
+TABLES = ("games", "players", "votes", "night_actions", "speeches")
+
+_DAY_MARK = re.compile(r"第(\d+)天")
+_SHERIFF_MARK = re.compile(r"(\d+)号当选警长|警徽移交给(\d+)号")
+
+
+def _side(role: Optional[str]) -> Optional[str]:
+    if role is None:
+        return None
+    return "werewolf" if role == "werewolf" else "villager"
+
+
+def game_rows(game_id: str, state: GameState) -> Dict[str, List[Dict[str, Any]]]:
+    """从一局的终局状态中抽取五张表的行"""
+    players = state.get("players", [])
+    roles = {p.id: p.role for p in players}
+    winner = state.get("winner_side")
+    usage = usage_totals(state.get("token_usage"))
+    sheriffs = set()
+    for fact in state.get("fact_log") or []:
+        for elected, transferred in _SHERIFF_MARK.findall(fact):
+            sheriffs.add(int(elected or transferred))
+
+    speeches = []
+    day = 1
+    for seq, m in enumerate(state.get("history", [])):
+        if m.player_id is None:
+            mark = _DAY_MARK.search(m.content)
+            if mark:
+                day = int(mark.group(1))
+            continue
+        speeches.append({"game_id": game_id, "seq": seq, "day": day, "player_id": m.player_id, "role": roles.get(m.player_id), "content": m.content})
+
+    return {
+        "games": [{
+            "game_id": game_id,
+            "seed": state.get("seed"),
+            "n_players": len(players),
+            "n_wolves": sum(1 for p in players if p.role == "werewolf"),
+            "day_count": state.get("day_count"),
+            "winner_side": winner,
+            "sheriff_id": state.get("sheriff_id"),
+            "n_messages": len(state.get("history", [])),
+            "model_calls": int(usage["calls"]),
+            "tokens": int(usage["input_tokens"] + usage["output_tokens"]),
+            "cost_usd": float(usage["cost_usd"]),
+        }],
+        "players": [{
+            "game_id": game_id,
+            "player_id": p.id,
+            "role": p.role,
+            "side": _side(p.role),
+            "personality": p.personality,
+            "survived": p.is_alive,
+            "won": winner is not None and _side(p.role) == winner,
+            "was_sheriff": p.id in sheriffs,
+        } for p in players],
+        "votes": [{
+            "game_id": game_id,
+            "day": v["day"],
+            "kind": v["kind"],
+            "voter": v["voter"],
+            "voter_role": roles.get(v["voter"]),
+            "target": v["target"],
+            "target_role": roles.get(v["target"]),
+        } for v in state.get("vote_log") or []],
+        "night_actions": [{
+            "game_id": game_id,
+            "day": a["day"],
+            "action": a["action"],
+            "target": a["target"],
+            "target_role": roles.get(a["target"]),
+        } for a in state.get("night_log") or []],
+        "speeches": speeches,
+    }
+
+
+def _schemas(pa: Any) -> Dict[str, Any]:
+    return {
+        "games": pa.schema([
+            ("game_id", pa.string()), ("seed", pa.int64()), ("n_players", pa.int16()), ("n_wolves", pa.int16()),
+            ("day_count", pa.int16()), ("winner_side", pa.string()), ("sheriff_id", pa.int16()), ("n_messages", pa.int32()),
+            ("model_calls", pa.int32()), ("tokens", pa.int64()), ("cost_usd", pa.float64()),
+        ]),
+        "players": pa.schema([
+            ("game_id", pa.string()), ("player_id", pa.int16()), ("role", pa.string()), ("side", pa.string()),
+            ("personality", pa.string()), ("survived", pa.bool_()), ("won", pa.bool_()), ("was_sheriff", pa.bool_()),
+        ]),
+        "votes": pa.schema([
+            ("game_id", pa.string()), ("day", pa.int16()), ("kind", pa.string()), ("voter", pa.int16()),
+            ("voter_role", pa.string()), ("target", pa.int16()), ("target_role", pa.string()),
+        ]),
+        "night_actions": pa.schema([
+            ("game_id", pa.string()), ("day", pa.int16()), ("action", pa.string()), ("target", pa.int16()), ("target_role", pa.string()),
+        ]),
+        "speeches": pa.schema([
+            ("game_id", pa.string()), ("seq", pa.int32()), ("day", pa.int16()), ("player_id", pa.int16()),
+            ("role", pa.string()), ("content", pa.string()),
+        ]),
+    }
+
+
+class ColumnarExporter:
+    """把结束的对局按行组流式写入列式文件（每张表一个文件）。"""
+
+    def __init__(self, directory: str, fmt: str = "parquet", row_group_size: int = 256, compression: str = "zstd") -> None:
+        if fmt not in ("parquet", "arrow"):
+            raise ValueError(f"未知导出格式：{fmt}，可选：parquet / arrow")
+        try:
+            import pyarrow as pa
+        except ImportError as e:  # 可选依赖
+            raise ImportError('列式导出需要 pyarrow：pip install -e ".[analytics]"') from e
+        self.pa = pa
+        self.directory = directory
+        self.fmt = fmt
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.schemas = _schemas(pa)
+        self.games_written = 0
+        self._pending_games = 0
+        self._buffers: Dict[str, List[Dict[str, Any]]] = {t: [] for t in TABLES}
+        self._writers: Dict[str, Any] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, table: str) -> str:
+        """某张表的输出文件路径"""
+        return os.path.join(self.directory, f"{table}.{self.fmt}")
+
+    def add(self, game_id: str, state: GameState) -> None:
+        """登记一局已结束的对局；攒够一个行组后写出"""
+        if not state.get("game_over"):
+            raise ValueError(f"对局 {game_id} 尚未结束")
+        for table, rows in game_rows(game_id, state).items():
+            self._buffers[table].extend(rows)
+        self._pending_games += 1
+        if self._pending_games >= self.row_group_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """把缓冲的行写成一个行组"""
+        if not self._pending_games:
+            return
+        for table in TABLES:
+            writer = self._writer(table)
+            if self._buffers[table]:
+                writer.write_table(self.pa.Table.from_pylist(self._buffers[table], schema=self.schemas[table]))
+            self._buffers[table] = []
+        self.games_written += self._pending_games
+        self._pending_games = 0
+
+    def _writer(self, table: str) -> Any:
+        if table not in self._writers:
+            if self.fmt == "parquet":
+                import pyarrow.parquet as pq
+
+                self._writers[table] = pq.ParquetWriter(self.path(table), self.schemas[table], compression=self.compression)
+            else:
+                import pyarrow.ipc as ipc
+
+                options = ipc.IpcWriteOptions(compression=self.compression)
+                self._writers[table] = ipc.new_file(self.path(table), self.schemas[table], options=options)
+        return self._writers[table]
+
+    def close(self) -> None:
+        """写出剩余的行并关闭文件"""
+        self.flush()
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+    def __enter__(self) -> ColumnarExporter:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -0,0 +1,336 @@
+"""离线批处理模式：大规模自博弈时把模型调用攒成批任务提交给 Batch API。
+
+离线自博弈不需要交互式延迟，而批处理接口通常半价、吞吐更高。批处理模式下：
+
+1. `LLMPolicy` 不再直接调用模型，而是把完整的 chat completions 请求体交给
+   `interrupt()`，对局在“模型调用前沿”暂停（并行投票时同一步会有多个待处理请求）；
+2. `BatchRunner` 推进所有对局直到各自暂停，把全部待处理请求写成一个 JSONL 批任务文件
+   （OpenAI Batch API 输入格式，`custom_id` 为 `<game_id>::<interrupt_id>`），
+   交给 `BatchClient` 提交并等待结果；
+3. 结果落地后按 `Command(resume={interrupt_id: 响应})` 恢复每局，节点重新执行到
+   `interrupt()` 处取得响应、解析为结构化输出，之后与实时模式完全一致。
+
+暂停 / 恢复依赖 checkpointer（默认 `InMemorySaver` + `GameStateSerializer`）。
+规则机器人座位不受影响；流式发言、共享模型池与录制磁带在批处理模式下不生效。
+
+用量按层级参数的 `batch_cost_factor`（默认 `BATCH_COST_FACTOR`）折算花费，记入 `ModelUsageStats`。
+
+客户端：
+- `LocalBatchClient`：本地替身，逐条请求一个 OpenAI 兼容端点（如 `mock_openai`）；
+- `OpenAIBatchClient`：上传文件、创建 `/v1/chat/completions` 批任务、轮询并下载结果。
+
+示例：
+    runner = BatchRunner(OpenAIBatchClient(), workdir="batches/run-1")
+    for i in range(500):
+        runner.add_game(f"game-{i}", {"preset": "classic_9", "seed": i})
+    finals = runner.run()
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Protocol, Tuple, Type
+
+from langchain_core.messages import AIMessage
+from langchain_core.messages.utils import convert_to_openai_messages
+from langchain_core.output_parsers.openai_tools import PydanticToolsParser
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.types import Command, interrupt
+from pydantic import BaseModel
+
+from src.agent.model_tiers import DEFAULT_API_BASE, DEFAULT_API_KEY_ENV, get_usage_stats
+from src.agent.serde import GameStateSerializer
+
+# 批处理接口相对实时接口的价格系数
+BATCH_COST_FACTOR = 0.5
+MODEL_REQUEST = "model_request"
+_ID_SEP = "::"
+
+
+class BatchJobError(RuntimeError):
+    """批任务失败 / 过期 / 被取消"""
+
+
+def build_request_body(params: Dict[str, Any], schema: Type[BaseModel], prompt_value: Any, max_tokens: Optional[int]) -> Dict[str, Any]:
+    """构造一次结构化函数调用的 chat completions 请求体（与实时模式的参数一致）"""
+    tool = convert_to_openai_tool(schema)
+    body: Dict[str, Any] = {
+        "model": params["model"],
+        "messages": convert_to_openai_messages(prompt_value.to_messages()),
+        "temperature": float(params.get("temperature", 0.7)),
+        "tools": [tool],
+        "tool_choice": {"type": "function", "function": {"name": tool["function"]["name"]}},
+        "parallel_tool_calls": False,
+    }
+    if max_tokens is not None:
+        body["max_tokens"] = max_tokens
+    return body
+
+
+def parse_completion(body: Dict[str, Any], schema: Type[BaseModel]) -> Tuple[AIMessage, BaseModel]:
+    """把 chat completions 响应解析为消息与结构化输出；解析失败时抛出异常"""
+    message = body["choices"][0]["message"]
+    tool_calls = [
+        {"name": c["function"]["name"], "args": json.loads(c["function"]["arguments"] or "{}"), "id": c.get("id"), "type": "tool_call"}
+        for c in message.get("tool_calls") or []
+    ]
+    usage = body.get("usage") or {}
+    raw = AIMessage(
+        content=message.get("content") or "",
+        tool_calls=tool_calls,
+        usage_metadata={
+            "input_tokens": int(usage.get("prompt_tokens", 0)),
+            "output_tokens": int(usage.get("completion_tokens", 0)),
+            "total_tokens": int(usage.get("total_tokens", 0)),
+        },
+    )
+    parsed = PydanticToolsParser(tools=[schema], first_tool_only=True).invoke(raw)
+    if parsed is None:
+        raise ValueError("批处理响应中没有函数调用")
+    return raw, parsed
+
+
+def request_model_call(
+    config: Optional[RunnableConfig],
+    tier: str,
+    params: Dict[str, Any],
+    schema: Type[BaseModel],
+    prompt_value: Any,
+    max_tokens: Optional[int],
+    player_id: Optional[int] = None,
+) -> BaseModel:
+    """在模型调用前沿暂停对局，恢复后返回批处理结果解析出的结构化输出。
+
+    响应为 `{"body": 响应体 或 None, "error": 错误 或 None, "latency_s": 批任务耗时}`；
+    失败时抛出异常，由调用方走兜底逻辑。
+    """
+    body = build_request_body(params, schema, prompt_value, max_tokens)
+    response = interrupt({"type": MODEL_REQUEST, "tier": tier, "player_id": player_id, "body": body})
+    stats = get_usage_stats(config)
+    factor = float(params.get("batch_cost_factor", BATCH_COST_FACTOR))
+    batch_params = {
+        **params,
+        "input_cost_per_mtok": float(params.get("input_cost_per_mtok", 0.0)) * factor,
+        "output_cost_per_mtok": float(params.get("output_cost_per_mtok", 0.0)) * factor,
+    }
+    latency = float(response.get("latency_s", 0.0))
+    if response.get("error") or not response.get("body"):
+        stats.record(tier, batch_params, latency, ok=False)
+        raise BatchJobError(f"批处理请求失败：{response.get('error')}")
+    try:
+        raw, parsed = parse_completion(response["body"], schema)
+    except Exception:
+        stats.record(tier, batch_params, latency, ok=False)
+        raise
+    usage = raw.usage_metadata or {}
+    stats.record(tier, batch_params, latency, input_tokens=usage.get("input_tokens", 0), output_tokens=usage.get("output_tokens", 0))
+    return parsed
+
+
+# --- 批任务客户端 ---
+
+
+class BatchClient(Protocol):
+    """提交批任务文件并返回结果文件路径（OpenAI Batch API 输出格式）"""
+
+    def run(self, input_path: str, output_path: str) -> str: ...
+
+
+class LocalBatchClient:
+    """本地替身：逐条请求一个 OpenAI 兼容端点，按 Batch API 输出格式写出结果。"""
+
+    def __init__(self, base_url: str = DEFAULT_API_BASE, api_key_env: str = DEFAULT_API_KEY_ENV, concurrency: int = 4, timeout: float = 120.0) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.api_key = os.getenv(api_key_env) or "local"
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def _call(self, line: Dict[str, Any]) -> Dict[str, Any]:
+        request = urllib.request.Request(
+            f"{self.base_url}{line['url'].removeprefix('/v1')}",
+            data=json.dumps(line["body"], ensure_ascii=False).encode(),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+                return {"custom_id": line["custom_id"], "response": {"status_code": resp.status, "body": json.load(resp)}, "error": None}
+        except urllib.error.HTTPError as e:
+            return {"custom_id": line["custom_id"], "response": {"status_code": e.code, "body": None}, "error": {"message": str(e)}}
+        except OSError as e:
+            return {"custom_id": line["custom_id"], "response": None, "error": {"message": str(e)}}
+
+    def run(self, input_path: str, output_path: str) -> str:
+        with open(input_path, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(self._call, lines))
+        with open(output_path, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        return output_path
+
+
+class OpenAIBatchClient:
+    """OpenAI 兼容的 Batch API：上传输入文件、创建批任务、轮询完成后下载结果。"""
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_API_BASE,
+        api_key_env: str = DEFAULT_API_KEY_ENV,
+        poll_interval_s: float = 30.0,
+        completion_window: str = "24h",
+    ) -> None:
+        from openai import OpenAI
+
+        self.client = OpenAI(base_url=base_url, api_key=os.getenv(api_key_env))
+        self.poll_interval_s = poll_interval_s
+        self.completion_window = completion_window
+
+    def run(self, input_path: str, output_path: str) -> str:
+        with open(input_path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        job = self.client.batches.create(input_file_id=uploaded.id, endpoint="/v1/chat/completions", completion_window=self.completion_window)
+        while job.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(self.poll_interval_s)
+            job = self.client.batches.retrieve(job.id)
+        if job.status != "completed":
+            raise BatchJobError(f"批任务 {job.id} 状态为 {job.status}")
+        with open(output_path, "w", encoding="utf-8") as f:
+            # 失败的请求写在 error 文件中，格式相同
+            for file_id in (job.output_file_id, job.error_file_id):
+                if file_id:
+                    f.write(self.client.files.content(file_id).text.rstrip("\n") + "\n")
+        return output_path
+
+
+# --- 批处理对局执行器 ---
+
+
+@dataclass
+class BatchRound:
+    """一轮批任务的统计"""
+
+    index: int
+    requests: int
+    failed: int
+    latency_s: float
+
+
+class BatchRunner:
+    """推进所有对局到模型调用前沿，合批提交，结果落地后统一恢复。"""
+
+    def __init__(
+        self,
+        client: BatchClient,
+        workdir: str = "batches",
+        graph: Optional[Runnable] = None,
+        recursion_limit: int = 2000,
+    ) -> None:
+        if graph is None:
+            from src.agent.graph import workflow
+
+            graph = workflow.compile(checkpointer=InMemorySaver(serde=GameStateSerializer()))
+        self.graph = graph
+        self.client = client
+        self.workdir = workdir
+        self.recursion_limit = recursion_limit
+        self.rounds: List[BatchRound] = []
+        self._configs: Dict[str, RunnableConfig] = {}
+        self._finals: Dict[str, Optional[Dict[str, Any]]] = {}
+        os.makedirs(workdir, exist_ok=True)
+
+    def add_game(self, game_id: str, configurable: Optional[Dict[str, Any]] = None) -> None:
+        """登记一局对局；`configurable` 会并入该局的 graph config"""
+        if _ID_SEP in game_id:
+            raise ValueError(f"对局 ID 不能包含 {_ID_SEP!r}")
+        if game_id in self._configs:
+            raise ValueError(f"对局 {game_id} 已存在")
+        self._configs[game_id] = {
+            "recursion_limit": self.recursion_limit,
+            "configurable": {"thread_id": game_id, **(configurable or {}), "game_id": game_id, "batch_mode": True},
+        }
+
+    def _advance(self, game_id: str, payload: Any) -> List[Any]:
+        """推进一局直到暂停或结束，返回待处理的模型请求（Interrupt 列表）"""
+        config = self._configs[game_id]
+        self.graph.invoke(payload, config)
+        snapshot = self.graph.get_state(config)
+        pending = [i for i in snapshot.interrupts if isinstance(i.value, dict) and i.value.get("type") == MODEL_REQUEST]
+        if not pending:
+            self._finals[game_id] = snapshot.values
+        return pending
+
+    def run(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        """运行所有已登记的对局直到结束，返回 {game_id: 终局状态}"""
+        frontier: Dict[str, List[Any]] = {}
+        for game_id in self._configs:
+            if game_id not in self._finals:
+                pending = self._advance(game_id, {})
+                if pending:
+                    frontier[game_id] = pending
+        while frontier:
+            responses = self._submit(frontier)
+            frontier = {}
+            for game_id, resume in responses.items():
+                pending = self._advance(game_id, Command(resume=resume))
+                if pending:
+                    frontier[game_id] = pending
+        return dict(self._finals)
+
+    def _submit(self, frontier: Dict[str, List[Any]]) -> Dict[str, Dict[str, Any]]:
+        index = len(self.rounds)
+        input_path = os.path.join(self.workdir, f"round-{index:04d}.jsonl")
+        output_path = os.path.join(self.workdir, f"round-{index:04d}.out.jsonl")
+        with open(input_path, "w", encoding="utf-8") as f:
+            for game_id, pending in frontier.items():
+                for item in pending:
+                    line = {"custom_id": f"{game_id}{_ID_SEP}{item.id}", "method": "POST", "url": "/v1/chat/completions", "body": item.value["body"]}
+                    f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+        start = time.perf_counter()
+        self.client.run(input_path, output_path)
+        latency = time.perf_counter() - start
+
+        results: Dict[str, Dict[str, Any]] = {}
+        with open(output_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    results[result["custom_id"]] = result
+
+        # 缺失 / 失败的请求也要恢复（节点走兜底），否则对局会永远停在前沿
+        resumes: Dict[str, Dict[str, Any]] = {}
+        failed = 0
+        for game_id, pending in frontier.items():
+            resumes[game_id] = {}
+            for item in pending:
+                result = results.get(f"{game_id}{_ID_SEP}{item.id}") or {"error": {"message": "结果缺失"}}
+                response = result.get("response") or {}
+                ok = response.get("status_code") == 200 and response.get("body")
+                failed += 0 if ok else 1
+                resumes[game_id][item.id] = {
+                    "body": response.get("body") if ok else None,
+                    "error": None if ok else (result.get("error") or {"message": f"HTTP {response.get('status_code')}"}),
+                    "latency_s": latency,
+                }
+        self.rounds.append(BatchRound(index=index, requests=sum(len(p) for p in frontier.values()), failed=failed, latency_s=latency))
+        return resumes
+
+    def report(self) -> str:
+        """批任务轮次汇总"""
+        requests = sum(r.requests for r in self.rounds)
+        failed = sum(r.failed for r in self.rounds)
+        finished = sum(1 for s in self._finals.values() if s and s.get("game_over"))
+        per_round = requests / len(self.rounds) if self.rounds else 0.0
+        return (
+            f"对局 {finished}/{len(self._configs)} 结束；批任务 {len(self.rounds)} 轮，请求 {requests} 条"
+            f"（平均每轮 {per_round:.1f} 条，失败 {failed}），批任务总耗时 {sum(r.latency_s for r in self.rounds):.1f}s"
+        )
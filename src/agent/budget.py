@@ -0,0 +1,163 @@
+"""单局 token / 花费预算：按局记账、软硬上限与平滑降级。
+
+此前无法限制单局花费：带 PK 的长对局可能发出数百次调用，每次都携带完整的系统提示词。
+现在每次模型调用的 token 与估算花费（按层级价格，见 `model_tiers`）都计入当前节点的
+计量器，由 `player_agent` 随返回值写入状态 `token_usage`（按层级累加），因此用量随
+checkpoint 一起保存，分叉 / 续跑后继续累计。
+
+通过 `configurable.budget` 设置上限（任一项超出即触发对应级别）：
+
+    {"budget": {"soft_usd": 0.05, "hard_usd": 0.08, "soft_tokens": 200000, "hard_tokens": 300000}}
+
+- 软上限：缩短提示词中的短期历史窗口（`soft_history_window`）、关闭检索补回
+  （`soft_retrieval_top_k`）；设置了 `soft_tier` 时所有环节改走该层级。默认层级中 fast 与 full
+  同价，因此 `soft_tier` 默认不设置，且必须指向一个价格低于 full 的层级（否则抛出 ValueError）；
+- 硬上限：在软上限的基础上把大模型座位交给规则机器人（`hard_policy`，默认 bot），不再发出模型调用。
+
+并行投票环节同一轮的决策看到的是同一份用量，因此上限可能被最后一轮并行调用略微超出。
+对局结束时 GM 把预算报告（各层级用量、总计、上限、最终级别与降级决策数）写入 `budget_report`。
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Literal, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+
+from src.agent.configuration import DEFAULT_TIER, Configuration
+from src.agent.state import GameState
+
+BudgetLevel = Literal["ok", "soft", "hard"]
+
+# 降级参数的默认值，可在 `budget` 中覆盖
+DEFAULT_BUDGET: Dict[str, Any] = {
+    "soft_history_window": 8,
+    "soft_retrieval_top_k": 0,
+    "soft_tier": None,
+    "hard_policy": "bot",
+}
+_LIMIT_KEYS = ("soft_usd", "hard_usd", "soft_tokens", "hard_tokens")
+_USAGE_FIELDS = ("calls", "input_tokens", "output_tokens", "cost_usd")
+
+_METER: ContextVar[Optional[Dict[str, Dict[str, float]]]] = ContextVar("werewolf_budget_meter", default=None)
+
+
+@contextmanager
+def metered_usage() -> Iterator[Dict[str, Dict[str, float]]]:
+    """在该上下文内发出的模型调用按层级累计到返回的字典中"""
+    usage: Dict[str, Dict[str, float]] = {}
+    token = _METER.set(usage)
+    try:
+        yield usage
+    finally:
+        _METER.reset(token)
+
+
+def meter_call(tier: str, input_tokens: int, output_tokens: int, cost_usd: float) -> None:
+    """把一次模型调用计入当前计量器（不在计量上下文内时忽略）"""
+    usage = _METER.get()
+    if usage is None:
+        return
+    bucket = usage.setdefault(tier, dict.fromkeys(_USAGE_FIELDS, 0))
+    bucket["calls"] += 1
+    bucket["input_tokens"] += input_tokens
+    bucket["output_tokens"] += output_tokens
+    bucket["cost_usd"] += cost_usd
+
+
+def meter_merge(usage: Optional[Dict[str, Dict[str, float]]]) -> None:
+    """把一组已计量的用量并入当前计量器（重放磁带时还原录制时的用量）"""
+    meter = _METER.get()
+    if meter is None or not usage:
+        return
+    for tier, bucket in usage.items():
+        target = meter.setdefault(tier, dict.fromkeys(_USAGE_FIELDS, 0))
+        for key in _USAGE_FIELDS:
+            target[key] += bucket.get(key, 0)
+
+
+def usage_totals(usage: Optional[Dict[str, Dict[str, float]]]) -> Dict[str, float]:
+    """各层级用量之和"""
+    totals: Dict[str, float] = dict.fromkeys(_USAGE_FIELDS, 0)
+    for bucket in (usage or {}).values():
+        for key in _USAGE_FIELDS:
+            totals[key] += bucket.get(key, 0)
+    return totals
+
+
+def budget_level(usage: Optional[Dict[str, Dict[str, float]]], budget: Optional[Dict[str, Any]]) -> BudgetLevel:
+    """按已用量与上限判定当前预算级别"""
+    if not budget:
+        return "ok"
+    totals = usage_totals(usage)
+    spent = {"usd": totals["cost_usd"], "tokens": totals["input_tokens"] + totals["output_tokens"]}
+    for level in ("hard", "soft"):
+        for unit, value in spent.items():
+            limit = budget.get(f"{level}_{unit}")
+            if limit is not None and value >= float(limit):
+                return level  # type: ignore[return-value]
+    return "ok"
+
+
+def _check_soft_tier(configuration: Configuration, tier: str) -> None:
+    """软上限降级的目标层级必须比默认层级便宜，否则降级对花费毫无作用"""
+    cheap, default = configuration.tier_params(tier), configuration.tier_params(DEFAULT_TIER)
+    prices = [(float(cheap.get(k, 0.0)), float(default.get(k, 0.0))) for k in ("input_cost_per_mtok", "output_cost_per_mtok")]
+    if not (all(c <= d for c, d in prices) and any(c < d for c, d in prices)):
+        raise ValueError(f"soft_tier={tier} 的价格不低于 {DEFAULT_TIER} 层级，请在 model_tiers 中为其配置更便宜的模型")
+
+
+def apply_budget(config: RunnableConfig, state: GameState) -> Tuple[RunnableConfig, BudgetLevel]:
+    """按当前预算级别返回（可能降级后的）config 与级别"""
+    configuration = Configuration.from_runnable_config(config)
+    limits = {**DEFAULT_BUDGET, **(configuration.budget or {})}
+    if configuration.budget and limits["soft_tier"]:
+        _check_soft_tier(configuration, limits["soft_tier"])  # 开局即校验，而不是等到超出软上限
+    level = budget_level(state.get("token_usage"), configuration.budget)
+    if level == "ok":
+        return config, level
+    overrides: Dict[str, Any] = {
+        "history_window": min(configuration.history_window, int(limits["soft_history_window"])),
+        "retrieval_top_k": min(configuration.retrieval_top_k, int(limits["soft_retrieval_top_k"])),
+    }
+    if limits["soft_tier"]:
+        overrides["tier_override"] = limits["soft_tier"]
+    if level == "hard":
+        degrade = lambda name: limits["hard_policy"] if name == "llm" else name  # noqa: E731
+        overrides["player_policy"] = degrade(configuration.player_policy)
+        overrides["seat_policies"] = {k: degrade(v) for k, v in (configuration.seat_policies or {}).items()}
+    configurable = {**((config or {}).get("configurable") or {}), **overrides}
+    return {**(config or {}), "configurable": configurable}, level
+
+
+def budget_report(state: GameState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    """对局结束时的预算报告"""
+    budget = Configuration.from_runnable_config(config).budget or {}
+    usage = state.get("token_usage") or {}
+    return {
+        "level": budget_level(usage, budget),
+        "limits": {k: budget[k] for k in _LIMIT_KEYS if budget.get(k) is not None},
+        "total": usage_totals(usage),
+        "by_tier": {tier: dict(bucket) for tier, bucket in sorted(usage.items())},
+        "degraded_decisions": dict(state.get("budget_degraded") or {}),
+    }
+
+
+def render_budget_report(report: Dict[str, Any]) -> str:
+    """生成文本形式的预算报告"""
+    total = report["total"]
+    limits = "，".join(f"{k}={v}" for k, v in report["limits"].items()) or "未设置"
+    lines = [
+        f"预算级别：{report['level']}（上限：{limits}）",
+        f"合计：calls={total['calls']:g} in_tok={total['input_tokens']:g} out_tok={total['output_tokens']:g} cost=${total['cost_usd']:.4f}",
+    ]
+    for tier, bucket in report["by_tier"].items():
+        lines.append(
+            f"  [{tier}] calls={bucket['calls']:g} in_tok={bucket['input_tokens']:g} out_tok={bucket['output_tokens']:g} cost=${bucket['cost_usd']:.4f}"
+        )
+    degraded = report["degraded_decisions"]
+    if degraded:
+        lines.append("降级决策：" + "，".join(f"{k}×{v}" for k, v in sorted(degraded.items())))
+    return "\n".join(lines)
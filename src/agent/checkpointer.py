@@ -0,0 +1,422 @@
+"""本地 SQLite 持久化 checkpointer（WAL 模式，可配置落盘粒度）。
+
+`SQLiteCheckpointer` 继承 `InMemorySaver`：图运行期间的读写全部走内存，
+只有满足落盘策略的 checkpoint 才会写入 SQLite，且按批次提交，减少 fsync 次数：
+
+- `step`：每个 super-step 都落盘（等价于普通持久化 checkpointer）；
+- `turn`：发言权转移时落盘，即 (天数, 阶段, 环节, 当前玩家) 发生变化；
+  同一回合内 GM 的纯调度步骤不落盘；
+- `phase`：仅在昼夜切换（天数/阶段变化）时落盘。
+
+对局首个 checkpoint 与 `game_over` 的 checkpoint 总会落盘，`game_over` 时立即提交。
+每个线程只保留最近 `keep_last` 个已落盘 checkpoint，旧的 checkpoint、写入记录
+及不再被引用的通道值会在提交后一并清理——磁盘与内存同时清理，长期运行的托管进程
+内存不会随对局步数无限增长。
+
+进程崩溃后，用同一个数据库文件与 `thread_id` 重新运行即可从最近一次提交的
+checkpoint 恢复（尚未提交批次中的步骤会重新执行）。
+
+示例：
+    saver = SQLiteCheckpointer("games.db", durability="phase")  # 默认使用 GameStateSerializer
+    app = workflow.compile(checkpointer=saver)
+    app.invoke({}, {"configurable": {"thread_id": "game-1"}})
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Literal, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+
+from src.agent.configuration import Configuration
+from src.agent.serde import GameStateSerializer
+
+Durability = Literal["step", "turn", "phase"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS blob_refs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, channel)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    task_path TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+@dataclass
+class CheckpointerStats:
+    """落盘统计"""
+
+    puts: int = 0
+    durable: int = 0
+    flushes: int = 0
+    rows_written: int = 0
+    pruned: int = 0
+
+
+@dataclass
+class _PendingCheckpoint:
+    thread_id: str
+    checkpoint_ns: str
+    checkpoint_id: str
+    parent_id: Optional[str]
+    versions: ChannelVersions
+
+
+def durability_key(policy: Durability, values: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """返回用于判定是否落盘的键：与上一次落盘时不同即落盘；`step` 策略返回 None 表示每步落盘"""
+    if policy == "step":
+        return None
+    if policy == "turn":
+        return (values.get("day_count"), values.get("phase"), values.get("turn_type"), values.get("current_player_id"))
+    if policy == "phase":
+        return (values.get("day_count"), values.get("phase"))
+    raise ValueError(f"未知落盘策略：{policy}")
+
+
+class SQLiteCheckpointer(InMemorySaver):
+    """内存热数据 + SQLite 批量落盘的 checkpointer。"""
+
+    def __init__(
+        self,
+        path: str = "checkpoints.db",
+        *,
+        durability: Durability = "turn",
+        batch_size: int = 8,
+        flush_interval_s: float = 5.0,
+        keep_last: int = 20,
+        synchronous: Literal["OFF", "NORMAL", "FULL"] = "NORMAL",
+        serde: Optional[SerializerProtocol] = None,
+    ) -> None:
+        super().__init__(serde=serde or GameStateSerializer())
+        durability_key(durability, {})  # 提前校验策略名
+        if keep_last < 1:
+            raise ValueError("keep_last 至少为 1")
+        self.durability = durability
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_s = flush_interval_s
+        self.keep_last = keep_last
+        self.stats = CheckpointerStats()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._conn.executescript(_SCHEMA)
+        self._loaded: Set[str] = set()
+        self._last_key: Dict[Tuple[str, str], Any] = {}
+        self._last_durable: Dict[Tuple[str, str], str] = {}
+        self._durable_ids: Set[Tuple[str, str, str]] = set()
+        # 内存中每个 checkpoint 引用的通道版本，用于清理不再被引用的通道值
+        self._versions: Dict[Tuple[str, str, str], ChannelVersions] = {}
+        self._pruned_before: Dict[Tuple[str, str], str] = {}
+        self._pending: List[_PendingCheckpoint] = []
+        self._dirty_writes: Set[Tuple[str, str, str]] = set()
+        self._last_flush = time.monotonic()
+
+    # --- 写入 ---
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """写入内存，并按落盘策略决定是否加入待提交批次"""
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            self._ensure_loaded(thread_id)
+            result = super().put(config, checkpoint, metadata, new_versions)
+            checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+            values = checkpoint.get("channel_values", {})
+            policy = Configuration.from_runnable_config(config).durability or self.durability
+            key = durability_key(policy, values)
+            scope = (thread_id, checkpoint_ns)
+            game_over = bool(values.get("game_over"))
+            self.stats.puts += 1
+            self._versions[(thread_id, checkpoint_ns, checkpoint["id"])] = dict(checkpoint["channel_versions"])
+
+            if key is None or scope not in self._last_key or key != self._last_key[scope] or game_over:
+                self._last_key[scope] = key
+                self._durable_ids.add((thread_id, checkpoint_ns, checkpoint["id"]))
+                self._pending.append(_PendingCheckpoint(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    checkpoint_id=checkpoint["id"],
+                    parent_id=self._last_durable.get(scope),
+                    versions=dict(checkpoint["channel_versions"]),
+                ))
+                self._last_durable[scope] = checkpoint["id"]
+                self.stats.durable += 1
+
+            if game_over or self._should_flush():
+                self.flush()
+            return result
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """写入内存；属于已落盘 checkpoint 的写入记录随下一批提交"""
+        with self._lock:
+            scope = (config["configurable"]["thread_id"], config["configurable"].get("checkpoint_ns", ""))
+            if config["configurable"]["checkpoint_id"] < self._pruned_before.get(scope, ""):
+                return  # 后台写入晚于清理到达：所属 checkpoint 已被清理
+            super().put_writes(config, writes, task_id, task_path)
+            key = (
+                config["configurable"]["thread_id"],
+                config["configurable"].get("checkpoint_ns", ""),
+                config["configurable"]["checkpoint_id"],
+            )
+            if key in self._durable_ids:
+                self._dirty_writes.add(key)
+
+    def _should_flush(self) -> bool:
+        return len(self._pending) >= self.batch_size or (
+            bool(self._pending) and time.monotonic() - self._last_flush >= self.flush_interval_s
+        )
+
+    def flush(self) -> None:
+        """在一个事务中提交所有待落盘的 checkpoint 与写入记录，并清理旧 checkpoint"""
+        with self._lock:
+            if not self._pending and not self._dirty_writes:
+                return
+            pending, self._pending = self._pending, []
+            dirty, self._dirty_writes = self._dirty_writes, set()
+            rows = 0
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                for p in pending:
+                    rows += self._write_checkpoint(cur, p)
+                    dirty.add((p.thread_id, p.checkpoint_ns, p.checkpoint_id))
+                for key in dirty:
+                    rows += self._write_writes(cur, *key)
+                scopes = {(p.thread_id, p.checkpoint_ns) for p in pending}
+                for scope in scopes:
+                    self._prune(cur, *scope)
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                self._pending = pending + self._pending
+                self._dirty_writes |= dirty
+                raise
+            for scope in scopes:
+                self._prune_memory(*scope)
+            self.stats.flushes += 1
+            self.stats.rows_written += rows
+            self._last_flush = time.monotonic()
+
+    def _write_checkpoint(self, cur: sqlite3.Cursor, p: _PendingCheckpoint) -> int:
+        saved = self.storage[p.thread_id][p.checkpoint_ns].get(p.checkpoint_id)
+        if saved is None:  # 已被 delete_thread 删除
+            return 0
+        (c_type, c_bytes), (m_type, m_bytes), _ = saved
+        cur.execute(
+            "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (p.thread_id, p.checkpoint_ns, p.checkpoint_id, p.parent_id, c_type, c_bytes, m_type, m_bytes),
+        )
+        rows = 1
+        for channel, version in p.versions.items():
+            cur.execute(
+                "INSERT OR REPLACE INTO blob_refs VALUES (?, ?, ?, ?, ?)",
+                (p.thread_id, p.checkpoint_ns, p.checkpoint_id, channel, version),
+            )
+            blob = self.blobs.get((p.thread_id, p.checkpoint_ns, channel, version))
+            if blob is not None:
+                # 通道值按版本去重：未变化的通道不会重复写入
+                cur.execute(
+                    "INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+                    (p.thread_id, p.checkpoint_ns, channel, version, blob[0], blob[1]),
+                )
+                rows += cur.rowcount
+        return rows
+
+    def _write_writes(self, cur: sqlite3.Cursor, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> int:
+        stored = self.writes.get((thread_id, checkpoint_ns, checkpoint_id), {})
+        for (task_id, idx), (_, channel, (v_type, v_bytes), task_path) in stored.items():
+            cur.execute(
+                "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, v_type, v_bytes, task_path),
+            )
+        return len(stored)
+
+    def _prune(self, cur: sqlite3.Cursor, thread_id: str, checkpoint_ns: str) -> None:
+        stale = [
+            row[0]
+            for row in cur.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                (thread_id, checkpoint_ns, self.keep_last),
+            ).fetchall()
+        ]
+        if not stale:
+            return
+        for table in ("checkpoints", "blob_refs", "writes"):
+            cur.executemany(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(thread_id, checkpoint_ns, cid) for cid in stale],
+            )
+        cur.execute(
+            "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND NOT EXISTS ("
+            "SELECT 1 FROM blob_refs r WHERE r.thread_id = blobs.thread_id AND r.checkpoint_ns = blobs.checkpoint_ns "
+            "AND r.channel = blobs.channel AND r.version = blobs.version)",
+            (thread_id, checkpoint_ns),
+        )
+        self.stats.pruned += len(stale)
+
+    def _prune_memory(self, thread_id: str, checkpoint_ns: str) -> None:
+        """从内存中删除早于保留窗口的 checkpoint（含未落盘的中间步骤）、其写入记录与不再被引用的通道值"""
+        row = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_last - 1),
+        ).fetchone()
+        if row is None:
+            return
+        self._pruned_before[(thread_id, checkpoint_ns)] = row[0]
+        saved = self.storage[thread_id][checkpoint_ns]
+        stale = [cid for cid in saved if cid < row[0]]
+        if not stale:
+            return
+        released: Set[Tuple[str, Any]] = set()
+        for cid in stale:
+            key = (thread_id, checkpoint_ns, cid)
+            del saved[cid]
+            self.writes.pop(key, None)
+            self._durable_ids.discard(key)
+            released.update(self._versions.pop(key, {}).items())
+        # 每个通道值都被创建它的 checkpoint 引用，因此只需检查被删除 checkpoint 引用过的版本
+        live = {item for cid in saved for item in self._versions.get((thread_id, checkpoint_ns, cid), {}).items()}
+        for channel, version in released - live:
+            self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+
+    # --- 读取（按需从磁盘恢复线程） ---
+
+    def _ensure_loaded(self, thread_id: str) -> None:
+        if thread_id in self._loaded:
+            return
+        self._loaded.add(thread_id)
+        if self.storage.get(thread_id):
+            return
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata "
+                "FROM checkpoints WHERE thread_id = ?",
+                (thread_id,),
+            ).fetchall()
+            for ns, cid, parent_id, c_type, c_bytes, m_type, m_bytes in rows:
+                self.storage[thread_id][ns][cid] = ((c_type, c_bytes), (m_type, m_bytes), parent_id)
+                self._durable_ids.add((thread_id, ns, cid))
+                if cid > self._last_durable.get((thread_id, ns), ""):
+                    self._last_durable[(thread_id, ns)] = cid
+            for ns, channel, version, v_type, value in self._conn.execute(
+                "SELECT checkpoint_ns, channel, version, type, value FROM blobs WHERE thread_id = ?", (thread_id,)
+            ):
+                self.blobs[(thread_id, ns, channel, version)] = (v_type, value)
+            for ns, cid, channel, version in self._conn.execute(
+                "SELECT checkpoint_ns, checkpoint_id, channel, version FROM blob_refs WHERE thread_id = ?", (thread_id,)
+            ):
+                self._versions.setdefault((thread_id, ns, cid), {})[channel] = version
+            for ns, cid, task_id, idx, channel, v_type, value, task_path in self._conn.execute(
+                "SELECT checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path "
+                "FROM writes WHERE thread_id = ?",
+                (thread_id,),
+            ):
+                self.writes[(thread_id, ns, cid)][(task_id, idx)] = (task_id, channel, (v_type, value), task_path)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """读取 checkpoint；线程不在内存中时先从磁盘加载"""
+        self._ensure_loaded(config["configurable"]["thread_id"])
+        return super().get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """列出 checkpoint；未指定线程时会加载磁盘上的全部线程"""
+        if config and config.get("configurable", {}).get("thread_id"):
+            self._ensure_loaded(config["configurable"]["thread_id"])
+        else:
+            for (thread_id,) in self._conn.execute("SELECT DISTINCT thread_id FROM checkpoints").fetchall():
+                self._ensure_loaded(thread_id)
+        return super().list(config, filter=filter, before=before, limit=limit)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """同时删除内存与磁盘中的线程数据"""
+        with self._lock:
+            super().delete_thread(thread_id)
+            self._pending = [p for p in self._pending if p.thread_id != thread_id]
+            self._dirty_writes = {k for k in self._dirty_writes if k[0] != thread_id}
+            self._durable_ids = {k for k in self._durable_ids if k[0] != thread_id}
+            self._versions = {k: v for k, v in self._versions.items() if k[0] != thread_id}
+            for scope in [s for s in self._last_key if s[0] == thread_id]:
+                del self._last_key[scope]
+            for scope in [s for s in self._last_durable if s[0] == thread_id]:
+                del self._last_durable[scope]
+            for scope in [s for s in self._pruned_before if s[0] == thread_id]:
+                del self._pruned_before[scope]
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            for table in ("checkpoints", "blobs", "blob_refs", "writes"):
+                cur.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            cur.execute("COMMIT")
+
+    def close(self) -> None:
+        """提交剩余批次并关闭数据库"""
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """退出上下文时提交并关闭"""
+        self.close()
+        super().__exit__(*exc_info)
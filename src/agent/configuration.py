@@ -0,0 +1,165 @@
+"""对局配置：通过 graph config (`configurable`) 传入的可调参数。"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Literal, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+# 引擎支持的全部角色；神职在引擎中按"唯一角色"处理（每局最多 1 名）
+WOLF_ROLE = "werewolf"
+VILLAGER_ROLE = "villager"
+UNIQUE_ROLES = ("seer", "witch", "hunter", "guard")
+KNOWN_ROLES = (WOLF_ROLE, VILLAGER_ROLE) + UNIQUE_ROLES
+
+MIN_PLAYERS = 6
+MAX_PLAYERS = 30
+
+# 预设板子：{角色: 数量}
+GAME_PRESETS: Dict[str, Dict[str, int]] = {
+    "classic_6": {"werewolf": 2, "villager": 2, "seer": 1, "guard": 1},
+    "classic_9": {"werewolf": 3, "villager": 3, "seer": 1, "witch": 1, "hunter": 1},
+    "classic_12": {"werewolf": 4, "villager": 4, "seer": 1, "witch": 1, "hunter": 1, "guard": 1},
+    "classic_16": {"werewolf": 5, "villager": 7, "seer": 1, "witch": 1, "hunter": 1, "guard": 1},
+    "classic_20": {"werewolf": 6, "villager": 10, "seer": 1, "witch": 1, "hunter": 1, "guard": 1},
+    "classic_30": {"werewolf": 9, "villager": 17, "seer": 1, "witch": 1, "hunter": 1, "guard": 1},
+}
+DEFAULT_PRESET = "classic_12"
+
+# 模型分层：层级名 -> 模型参数。价格单位为美元 / 百万 token，用于估算各层花费，可在配置中覆盖。
+# 默认的 fast 与 full 是同一个模型、同一价格，只是温度更低（投票类决策更稳定），并不省钱；
+# 需要降本时在 `model_tiers` 中把 fast（或新层级）指向更便宜的模型 / 端点
+DEFAULT_MODEL_TIERS: Dict[str, Dict[str, Any]] = {
+    "full": {"model": "deepseek-chat", "temperature": 0.7, "input_cost_per_mtok": 0.27, "output_cost_per_mtok": 1.10},
+    "fast": {"model": "deepseek-chat", "temperature": 0.3, "input_cost_per_mtok": 0.27, "output_cost_per_mtok": 1.10},
+}
+# 分层路由：键为 "角色:环节"、"环节" 或 "角色"（按此优先级匹配），未匹配时使用 DEFAULT_TIER
+DEFAULT_TIER_ROUTES: Dict[str, str] = {
+    "sheriff_nomination": "fast",
+    "voting": "fast",
+    "pk_voting": "fast",
+    "sheriff_voting": "fast",
+}
+DEFAULT_TIER = "full"
+
+
+def validate_role_counts(role_counts: Dict[str, int]) -> Dict[str, int]:
+    """校验角色配置，返回去掉 0 值后的副本；不合法时抛出 ValueError"""
+    if any(int(n) < 0 for n in role_counts.values()):
+        raise ValueError("角色数量不能为负数")
+    counts = {role: int(n) for role, n in role_counts.items() if int(n) > 0}
+    unknown = set(counts) - set(KNOWN_ROLES)
+    if unknown:
+        raise ValueError(f"未知角色：{sorted(unknown)}，可选：{list(KNOWN_ROLES)}")
+    for role in UNIQUE_ROLES:
+        if counts.get(role, 0) > 1:
+            raise ValueError(f"神职 {role} 每局最多 1 名")
+
+    total = sum(counts.values())
+    if not MIN_PLAYERS <= total <= MAX_PLAYERS:
+        raise ValueError(f"总人数需在 {MIN_PLAYERS}-{MAX_PLAYERS} 之间，当前为 {total}")
+    wolves = counts.get(WOLF_ROLE, 0)
+    if wolves < 1:
+        raise ValueError("至少需要 1 名狼人")
+    if wolves >= total - wolves:
+        raise ValueError("狼人数量必须少于好人数量，否则开局即结束")
+    return counts
+
+
+@dataclass(kw_only=True)
+class Configuration:
+    """对局的可配置参数。
+
+    通过 `config["configurable"]` 传入，例如：
+    `graph.invoke({}, {"configurable": {"preset": "classic_9"}})`
+    或直接指定角色数量 `{"role_counts": {"werewolf": 3, "villager": 5, "seer": 1}}`。
+    """
+
+    preset: str = DEFAULT_PRESET
+    """预设板子名称，见 `GAME_PRESETS`。"""
+
+    role_counts: Optional[Dict[str, int]] = None
+    """自定义角色数量，优先级高于 `preset`。"""
+
+    seed: Optional[int] = None
+    """对局随机种子；为空时随机生成并写入状态，便于录制与重放。"""
+
+    priority: Literal["live", "batch"] = "live"
+    """模型调用优先级类别：观战局为 live，离线自博弈为 batch（见 `model_pool`）。"""
+
+    durability: Optional[Literal["step", "turn", "phase"]] = None
+    """覆盖 `SQLiteCheckpointer` 的落盘粒度；为空时使用 checkpointer 自身的设置。"""
+
+    model_tiers: Optional[Dict[str, Dict[str, Any]]] = None
+    """按层级名覆盖 / 新增模型参数（model、temperature、openai_api_base、api_key_env / api_key、价格、多端点 endpoints），与 `DEFAULT_MODEL_TIERS` 合并。"""
+
+    tier_routes: Optional[Dict[str, str]] = None
+    """分层路由规则，与 `DEFAULT_TIER_ROUTES` 合并，例如 `{"hunter:hunter_shoot": "fast"}`。"""
+
+    tier_override: Optional[str] = None
+    """所有环节强制使用的模型层级（预算降级时设置，见 `budget`）。"""
+
+    player_policy: str = "llm"
+    """默认玩家决策后端：llm（大模型）或 bot（规则机器人），见 `policies`。"""
+
+    seat_policies: Optional[Dict[int, str]] = None
+    """按座位覆盖决策后端，例如 `{3: "llm"}`。"""
+
+    history_window: int = 20
+    """提示词中原样携带的最近历史条数（短期记忆）。"""
+
+    retrieval_top_k: int = 4
+    """从窗口外的早前发言中检索注入提示词的条数（见 `retrieval`），0 表示关闭。"""
+
+    stream_speech: bool = True
+    """串行发言环节是否以自定义流事件逐段推送 speech（见 `streaming`）。"""
+
+    batch_mode: bool = False
+    """离线批处理模式：模型调用在前沿暂停、合批提交后恢复（由 `batch.BatchRunner` 设置，需要 checkpointer）。"""
+
+    budget: Optional[Dict[str, Any]] = None
+    """单局预算：soft_usd / hard_usd / soft_tokens / hard_tokens 上限与降级参数（见 `budget`）。"""
+
+    output_reask: bool = True
+    """结构化输出不合法且无法本地修复时，是否带上错误原因重问一次（见 `validation`）。"""
+
+    profile_dir: Optional[str] = None
+    """开启对局剖析并把火焰图写到该目录（也可用环境变量 `WEREWOLF_PROFILE`，见 `profiler`）。"""
+
+    def resolve_policy(self, player_id: int) -> str:
+        """返回某个座位使用的决策后端名称"""
+        seats = {int(k): v for k, v in (self.seat_policies or {}).items()}
+        return seats.get(player_id, self.player_policy)
+
+    def resolve_tier(self, role: str, turn_type: str) -> str:
+        """返回某角色在某环节使用的模型层级名"""
+        if self.tier_override:
+            return self.tier_override
+        routes = {**DEFAULT_TIER_ROUTES, **(self.tier_routes or {})}
+        for key in (f"{role}:{turn_type}", turn_type, role):
+            if key in routes:
+                return routes[key]
+        return DEFAULT_TIER
+
+    def tier_params(self, tier: str) -> Dict[str, Any]:
+        """返回某层级的模型参数；未定义的层级抛出 ValueError"""
+        overrides = (self.model_tiers or {}).get(tier)
+        if tier not in DEFAULT_MODEL_TIERS and overrides is None:
+            raise ValueError(f"未知模型层级：{tier}")
+        return {**DEFAULT_MODEL_TIERS.get(tier, DEFAULT_MODEL_TIERS[DEFAULT_TIER]), **(overrides or {})}
+
+    def resolve_role_counts(self) -> Dict[str, int]:
+        """返回本局实际使用的角色数量（已校验）"""
+        if self.role_counts:
+            return validate_role_counts(self.role_counts)
+        if self.preset not in GAME_PRESETS:
+            raise ValueError(f"未知预设：{self.preset}，可选：{sorted(GAME_PRESETS)}")
+        return validate_role_counts(GAME_PRESETS[self.preset])
+
+    @classmethod
+    def from_runnable_config(cls, config: Optional[RunnableConfig] = None) -> Configuration:
+        """从 RunnableConfig 中解析配置"""
+        configurable = dict((config or {}).get("configurable") or {})
+        names = {f.name for f in fields(cls) if f.init}
+        return cls(**{k: v for k, v in configurable.items() if k in names})
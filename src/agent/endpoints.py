@@ -0,0 +1,260 @@
+"""多端点 / 多密钥的模型客户端池：加权最少未完成请求均衡、熔断与自动故障转移。
+
+单个 `DEEPSEEK_API_KEY` + 单个 `openai_api_base` 的限流会卡住整个集群的吞吐。
+在模型层级参数中配置 `endpoints` 后，每次调用从中挑选一个端点：
+
+    "model_tiers": {"full": {"endpoints": [
+        {"name": "ds-a", "openai_api_base": "https://api.deepseek.com/v1", "api_key_env": "DEEPSEEK_API_KEY", "weight": 2},
+        {"name": "ds-b", "openai_api_base": "https://api.deepseek.com/v1", "api_key_env": "DEEPSEEK_API_KEY_2"},
+        {"name": "local", "openai_api_base": "http://10.0.0.5:8000/v1", "model": "deepseek-v3", "weight": 0.5},
+    ]}}
+
+- 均衡：选择 `(未完成请求数 + 1) / weight` 最小的可用端点（加权最少未完成请求）；
+- 熔断：连续 `failure_threshold` 次失败后断开 `cooldown_s` 秒，到期后放行一个探测请求
+  （半开），成功则恢复，失败则冷却时间翻倍（上限 `max_cooldown_s`）；所有候选端点都熔断时
+  提前探测最早恢复的一个，探测在途期间其余调用直接以 `NoHealthyEndpointError` 失败；
+- 故障转移：限流（429）、5xx、连接 / 超时错误计为端点失败并立即换下一个端点重试，
+  最多尝试 `max_attempts` 个端点；其余错误（如 400）直接抛出，不影响端点健康度。
+  端点模式下客户端自身的重试默认关闭（`max_retries=0`），由池子负责重试。
+
+端点条目中除 `name` / `weight` 外的键覆盖层级参数（模型名、地址、密钥环境变量等）。
+池子从 `config["configurable"]["endpoint_pool"]` 读取，未配置时使用进程级默认实例；
+`stats()` / `report()` 给出每个端点的调用、失败、熔断与延迟统计。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Literal, Optional, TypeVar
+
+from langchain_core.runnables import RunnableConfig
+from langchain_openai import ChatOpenAI
+
+from src.agent.model_tiers import get_tier_llm
+
+T = TypeVar("T")
+
+BreakerState = Literal["closed", "open", "half_open"]
+
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_COOLDOWN_S = 10.0
+DEFAULT_MAX_COOLDOWN_S = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+_LATENCY_SAMPLES = 1024
+_ENDPOINT_KEYS = ("name", "weight")
+
+
+class NoHealthyEndpointError(RuntimeError):
+    """所有候选端点都已尝试且失败"""
+
+
+def is_endpoint_failure(error: BaseException) -> bool:
+    """限流 / 服务端错误 / 连接与超时错误计为端点失败，可以换端点重试"""
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+def endpoint_name(spec: Dict[str, Any]) -> str:
+    """端点条目的名称（缺省为地址 + 密钥环境变量）"""
+    return str(spec.get("name") or f"{spec.get('openai_api_base', 'default')}#{spec.get('api_key_env', 'default')}")
+
+
+@dataclass
+class EndpointStats:
+    """单个端点的统计快照"""
+
+    name: str
+    weight: float
+    state: BreakerState = "closed"
+    in_flight: int = 0
+    calls: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    trips: int = 0  # 熔断次数
+    failovers: int = 0  # 在该端点失败后转移到其他端点的次数
+    latencies: List[float] = field(default_factory=list)
+
+    @property
+    def avg_latency_s(self) -> float:
+        """成功调用的平均延迟（秒）"""
+        return sum(self.latencies) / len(self.latencies) if self.latencies else 0.0
+
+    def latency_percentile(self, q: float) -> float:
+        """成功调用的延迟分位数（秒）"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Endpoint:
+    def __init__(self, name: str, weight: float) -> None:
+        self.stats = EndpointStats(name=name, weight=weight)
+        self.open_until = 0.0
+        self.cooldown_s = 0.0
+        self.probing = False
+
+    def available(self, now: float) -> bool:
+        state = self.stats.state
+        if state == "closed":
+            return True
+        if state == "open" and now >= self.open_until:
+            self.stats.state = "half_open"
+        # 半开状态只放行一个探测请求
+        return self.stats.state == "half_open" and not self.probing
+
+
+class EndpointPool:
+    """按名称跟踪端点健康度并分配调用（线程安全）。"""
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        cooldown_s: float = DEFAULT_COOLDOWN_S,
+        max_cooldown_s: float = DEFAULT_MAX_COOLDOWN_S,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.max_cooldown_s = max_cooldown_s
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._endpoints: Dict[str, _Endpoint] = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, spec: Dict[str, Any]) -> _Endpoint:
+        name = endpoint_name(spec)
+        weight = float(spec.get("weight", 1.0))
+        if weight <= 0:
+            raise ValueError(f"端点 {name} 的权重必须为正数")
+        if name not in self._endpoints:
+            self._endpoints[name] = _Endpoint(name, weight)
+        self._endpoints[name].stats.weight = weight
+        return self._endpoints[name]
+
+    def acquire(self, specs: List[Dict[str, Any]], exclude: Optional[set] = None) -> Optional[Dict[str, Any]]:
+        """挑选一个端点并登记为未完成请求；没有候选端点、或全部熔断且已有探测请求在途时返回 None"""
+        exclude = exclude or set()
+        with self._lock:
+            now = self.clock()
+            candidates = [(spec, self._endpoint(spec)) for spec in specs if endpoint_name(spec) not in exclude]
+            if not candidates:
+                return None
+            healthy = [(s, e) for s, e in candidates if e.available(now)]
+            if healthy:
+                spec, ep = min(healthy, key=lambda c: ((c[1].stats.in_flight + 1) / c[1].stats.weight, c[1].stats.calls))
+            elif any(e.probing for _, e in candidates):
+                return None  # 全部熔断且已有探测请求在途：直接卸载，不再打到故障端点
+            else:
+                # 全部熔断：提前探测最早恢复的端点（同一时间只放行一个），而不是直接失败
+                spec, ep = min(candidates, key=lambda c: c[1].open_until)
+                ep.stats.state = "half_open"
+            if ep.stats.state == "half_open":
+                ep.probing = True
+            ep.stats.in_flight += 1
+            ep.stats.calls += 1
+            return spec
+
+    def release(self, spec: Dict[str, Any], ok: bool, latency_s: float = 0.0, endpoint_error: bool = True) -> None:
+        """结束一次调用；`endpoint_error=False` 的失败（如请求本身非法）不影响健康度"""
+        with self._lock:
+            ep = self._endpoint(spec)
+            stats = ep.stats
+            stats.in_flight -= 1
+            if stats.state == "half_open":
+                ep.probing = False
+            if ok:
+                stats.latencies.append(latency_s)
+                del stats.latencies[:-_LATENCY_SAMPLES]
+                stats.consecutive_failures = 0
+                stats.state = "closed"
+                ep.cooldown_s = 0.0
+                return
+            if not endpoint_error:
+                stats.failures += 1
+                return
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if stats.state == "open":
+                return  # 熔断前已发出的请求陆续失败，不重复计入熔断
+            if stats.state == "half_open" or stats.consecutive_failures >= self.failure_threshold:
+                ep.cooldown_s = min(self.max_cooldown_s, ep.cooldown_s * 2 if ep.cooldown_s else self.cooldown_s)
+                ep.open_until = self.clock() + ep.cooldown_s
+                stats.state = "open"
+                stats.trips += 1
+
+    def call(self, specs: List[Dict[str, Any]], fn: Callable[[Dict[str, Any]], T]) -> T:
+        """在端点之间均衡执行一次调用，端点失败时自动转移到下一个端点"""
+        tried: set = set()
+        last_error: Optional[BaseException] = None
+        for _ in range(min(self.max_attempts, len(specs))):
+            spec = self.acquire(specs, exclude=tried)
+            if spec is None:
+                break
+            tried.add(endpoint_name(spec))
+            start = time.perf_counter()
+            try:
+                result = fn(spec)
+            except Exception as e:
+                failover = is_endpoint_failure(e)
+                self.release(spec, ok=False, endpoint_error=failover)
+                if not failover:
+                    raise
+                last_error = e
+                with self._lock:
+                    self._endpoint(spec).stats.failovers += 1
+                continue
+            self.release(spec, ok=True, latency_s=time.perf_counter() - start)
+            return result
+        raise NoHealthyEndpointError(f"所有端点均调用失败（已尝试 {sorted(tried)}）") from last_error
+
+    def stats(self) -> Dict[str, EndpointStats]:
+        """返回各端点统计的副本"""
+        with self._lock:
+            now = self.clock()
+            for ep in self._endpoints.values():
+                ep.available(now)  # 刷新到期的熔断状态
+            return {name: EndpointStats(**{**vars(ep.stats), "latencies": list(ep.stats.latencies)}) for name, ep in self._endpoints.items()}
+
+    def report(self) -> str:
+        """生成文本形式的端点统计"""
+        lines = [f"{'endpoint':<20}{'weight':>7}{'state':>11}{'inflt':>6}{'calls':>7}{'fail':>6}{'trips':>6}{'fover':>6}{'avg(s)':>8}{'p95(s)':>8}"]
+        for name, s in sorted(self.stats().items()):
+            lines.append(
+                f"{name:<20}{s.weight:>7g}{s.state:>11}{s.in_flight:>6}{s.calls:>7}{s.failures:>6}{s.trips:>6}{s.failovers:>6}"
+                f"{s.avg_latency_s:>8.2f}{s.latency_percentile(0.95):>8.2f}"
+            )
+        return "\n".join(lines)
+
+
+DEFAULT_ENDPOINT_POOL = EndpointPool()
+
+
+def get_endpoint_pool(config: Optional[RunnableConfig]) -> EndpointPool:
+    """从 config 中获取端点池，未配置时返回进程级默认实例"""
+    configurable = (config or {}).get("configurable") or {}
+    pool: Any = configurable.get("endpoint_pool")
+    return pool if isinstance(pool, EndpointPool) else DEFAULT_ENDPOINT_POOL
+
+
+def call_with_endpoints(
+    config: Optional[RunnableConfig], params: Dict[str, Any], max_tokens: Optional[int], fn: Callable[[ChatOpenAI], T]
+) -> T:
+    """用层级参数对应的模型执行 `fn`；配置了 `endpoints` 时经端点池均衡与故障转移"""
+    specs = params.get("endpoints")
+    if not specs:
+        return fn(get_tier_llm(params, max_tokens))
+    base = {k: v for k, v in params.items() if k != "endpoints"}
+
+    def on_endpoint(spec: Dict[str, Any]) -> T:
+        overrides = {k: v for k, v in spec.items() if k not in _ENDPOINT_KEYS}
+        return fn(get_tier_llm({"max_retries": 0, **base, **overrides}, max_tokens))
+
+    return get_endpoint_pool(config).call(list(specs), on_endpoint)
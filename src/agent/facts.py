@@ -0,0 +1,216 @@
+"""确定性的对局事实账本（长期记忆）。
+
+原先每晚由总结模型把最近 20 条历史压缩成 50 字的“谁跳了什么、谁死了”，
+既多一次模型调用，又可能漏记或记错。这些事实大多已经以结构化形式存在于状态中，
+因此改为由 `action_handler_node` 在每次结算 / 公告时增量记账：
+
+- `fact_log`：公开事件（天亮死讯、警长竞选、放逐投票票型、猎人开枪、警徽移交），
+  只追加，每条一个短句；夜间结算时死讯尚未公布，不会提前写入；
+- `role_claims`：玩家在发言中的身份声明 {玩家 ID: {"role": 身份, "checks": {玩家 ID: 结果}}}，
+  由本地正则从新增的公屏发言中提取（`fact_cursor` 记录已扫描到的历史位置）；
+- `vote_matrix`：全局票型矩阵 {投票者 ID: {被投者 ID: 累计票数}}，在警长投票与放逐（含 PK）
+  投票结算时累加，渲染为紧凑的票型表供玩家分析跟风 / 抱团（弃票不计）；
+- `vote_log` / `night_log`：逐票与逐个夜间行动（含猎人开枪、警徽移交）的结构化记录，
+  只追加，供对局结束后的分析导出使用（见 `analytics`），不进入提示词；
+- `game_summary`：账本渲染出的文本，作为提示词中的“游戏历史大纲（长期记忆）”。
+
+全部为本地规则，不调用模型，同一对局重放结果一致。
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Optional
+
+from src.agent.state import GameState, Message
+
+# 长期记忆中保留的最近事件条数（更早的事件仍保留在 `fact_log` 中）
+RENDER_EVENTS_LIMIT = 16
+# 票型表中列出的同票组合数
+CO_VOTE_PAIRS_LIMIT = 5
+# 夜间结算时记入 `night_log` 的夜间行动键（白天技能由各自的结算环节单独记录）
+NIGHT_LOG_ACTIONS = ("guard_protect", "wolf_kill", "seer_check", "witch_save", "witch_poison")
+
+_ROLE_CLAIM = re.compile(r"我(?:是|就是|才是|是真)(预言家|女巫|猎人|守卫|村民|平民)")
+_CHECK_CLAIM = re.compile(r"(?:查验|验了?|验出)(\d+)号(?:玩家)?(?:的身份)?(?:是|为)?【?(狼人|好人|金水|查杀)")
+_CHECK_ALIAS = {"金水": "好人", "查杀": "狼人"}
+_ROLE_ALIAS = {"平民": "村民"}
+
+
+def parse_claim(content: str) -> Optional[Dict[str, Any]]:
+    """从一段发言中提取身份声明与报出的查验结果；没有声明时返回 None"""
+    role_match = _ROLE_CLAIM.search(content)
+    checks = {int(pid): _CHECK_ALIAS.get(res, res) for pid, res in _CHECK_CLAIM.findall(content)}
+    if role_match is None and not checks:
+        return None
+    # 只报查验未明说身份时视为起跳预言家
+    role = _ROLE_ALIAS.get(role_match.group(1), role_match.group(1)) if role_match else "预言家"
+    return {"role": role, "checks": checks}
+
+
+def _merge_claims(claims: Dict[int, Dict[str, Any]], messages: List[Message]) -> Dict[int, Dict[str, Any]]:
+    merged = dict(claims)
+    for m in messages:
+        if m.player_id is None:
+            continue
+        claim = parse_claim(m.content)
+        if claim is None:
+            continue
+        prev = merged.get(m.player_id)
+        # 同一身份累积查验；改跳其他身份时以最新声明为准
+        checks = {**prev["checks"], **claim["checks"]} if prev and prev["role"] == claim["role"] else claim["checks"]
+        merged[m.player_id] = {"role": claim["role"], "checks": checks}
+    return merged
+
+
+def _vote_pattern(votes: Dict[int, Optional[int]]) -> str:
+    grouped: Dict[Optional[int], List[int]] = {}
+    for voter, target in votes.items():
+        grouped.setdefault(target, []).append(voter)
+    parts = [
+        f"{','.join(map(str, sorted(v)))}→{t}" if t is not None else f"{','.join(map(str, sorted(v)))}弃票"
+        for t, v in sorted(grouped.items(), key=lambda kv: (kv[0] is None, kv[0] or 0))
+    ]
+    return "，".join(parts) or "无人投票"
+
+
+def _top_voted(votes: Dict[int, Optional[int]]) -> List[int]:
+    """得票最多的玩家（平票时多于一人）"""
+    counts: Dict[int, int] = {}
+    for target in votes.values():
+        if target is not None:
+            counts[target] = counts.get(target, 0) + 1
+    top = max(counts.values(), default=0)
+    return sorted(t for t, n in counts.items() if n == top) if top else []
+
+
+def _events(state: GameState, updates: Dict[str, Any]) -> List[str]:
+    """本次结算产生的公开事件"""
+    turn_type = state["turn_type"]
+    day = f"D{state['day_count']}"
+
+    if turn_type == "day_announcement":
+        dead = state.get("last_night_dead", [])
+        return [f"{day} 天亮：{'平安夜' if not dead else '、'.join(f'{d}号' for d in dead) + '死亡'}"]
+
+    if turn_type == "sheriff_settle":
+        pattern = _vote_pattern(state.get("votes", {}))
+        if updates.get("sheriff_id") is not None:
+            return [f"{day} 警长投票（{pattern}），{updates['sheriff_id']}号当选警长"]
+        tied = _top_voted(state.get("votes", {}))
+        if len(tied) > 1:
+            return [f"{day} 警长投票（{pattern}），{'、'.join(map(str, tied))}号平票，无人当选"]
+        return [f"{day} 警长投票（{pattern}），无人当选"]
+
+    if turn_type == "voting_settle":
+        kind = "PK投票" if state.get("pk_candidates") else "放逐投票"
+        pattern = _vote_pattern(state.get("votes", {}))
+        if updates.get("last_execution_id") is not None:
+            return [f"{day} {kind}（{pattern}），{updates['last_execution_id']}号出局"]
+        if updates.get("pk_candidates"):
+            return [f"{day} {kind}（{pattern}），{'、'.join(map(str, sorted(updates['pk_candidates'])))}号平票进入PK"]
+        return [f"{day} {kind}（{pattern}），无人出局"]
+
+    if turn_type == "hunter_announcement":
+        target = state["night_actions"].get("hunter_shoot")
+        hunter = state.get("pending_hunter_shoot")
+        who = f"猎人{hunter}号" if hunter is not None else "猎人"
+        return [f"{day} {who}开枪带走{target}号" if target else f"{day} {who}放弃开枪"]
+
+    if turn_type in ("sheriff_transfer", "sheriff_transfer_announcement"):
+        target = state["night_actions"].get("sheriff_transfer")
+        return [f"{day} 警徽移交给{target}号" if target is not None else f"{day} 警徽被撕毁"]
+
+    return []
+
+
+def update_vote_matrix(matrix: Dict[int, Dict[int, int]], votes: Dict[int, Optional[int]]) -> Dict[int, Dict[int, int]]:
+    """把一轮投票累加进票型矩阵，返回新矩阵（不修改原矩阵）"""
+    updated = dict(matrix)
+    for voter, target in votes.items():
+        if target is None:
+            continue
+        row = dict(updated.get(voter, {}))
+        row[target] = row.get(target, 0) + 1
+        updated[voter] = row
+    return updated
+
+
+def co_votes(matrix: Dict[int, Dict[int, int]]) -> List[tuple]:
+    """两两投票者的同票次数（按被投者取较小累计票数求和），返回 [(次数, 投票者 a, 投票者 b)] 降序"""
+    voters = sorted(matrix)
+    pairs = []
+    for i, a in enumerate(voters):
+        for b in voters[i + 1:]:
+            shared = sum(min(n, matrix[b].get(t, 0)) for t, n in matrix[a].items())
+            if shared:
+                pairs.append((shared, a, b))
+    return sorted(pairs, key=lambda x: (-x[0], x[1], x[2]))
+
+
+def render_vote_matrix(matrix: Optional[Dict[int, Dict[int, int]]]) -> str:
+    """把票型矩阵渲染为紧凑的表：每名投票者一行，另列同票最多的组合"""
+    if not matrix:
+        return "暂无投票记录"
+    lines = []
+    for voter, row in sorted(matrix.items()):
+        cells = "、".join(f"{t}号×{n}" if n > 1 else f"{t}号" for t, n in sorted(row.items(), key=lambda kv: (-kv[1], kv[0])))
+        lines.append(f"{voter}号→{cells}")
+    pairs = [f"{a}&{b}×{n}" for n, a, b in co_votes(matrix) if n > 1][:CO_VOTE_PAIRS_LIMIT]
+    if pairs:
+        lines.append("同票：" + "，".join(pairs))
+    return "\n".join(lines)
+
+
+def render_facts(
+    fact_log: List[str],
+    role_claims: Dict[int, Dict[str, Any]],
+    alive_players: List[int],
+    sheriff_id: Optional[int],
+) -> str:
+    """把账本渲染为提示词中的长期记忆文本"""
+    lines = [f"存活：{'、'.join(map(str, sorted(alive_players)))}号；警长：{f'{sheriff_id}号' if sheriff_id is not None else '无'}"]
+    if role_claims:
+        claims = []
+        for pid, claim in sorted(role_claims.items()):
+            checks = "，".join(f"{t}号={r}" for t, r in sorted(claim["checks"].items()))
+            claims.append(f"{pid}号自称{claim['role']}" + (f"（报验：{checks}）" if checks else ""))
+        lines.append("身份声明：" + "；".join(claims))
+    if fact_log:
+        lines.append("事件：" + "；".join(fact_log[-RENDER_EVENTS_LIMIT:]))
+    return "\n".join(lines)
+
+
+def record_facts(state: GameState, updates: Dict[str, Any]) -> Dict[str, Any]:
+    """根据一次结算的状态与更新增量记账，返回需要并入 `updates` 的字段"""
+    history = state.get("history", [])
+    cursor = state.get("fact_cursor", 0)
+    claims = _merge_claims(state.get("role_claims") or {}, history[cursor:])
+    events = _events(state, updates)
+    fact_log = [*(state.get("fact_log") or []), *events]
+    alive = updates.get("alive_players", state["alive_players"])
+    sheriff_id = updates["sheriff_id"] if "sheriff_id" in updates else state.get("sheriff_id")
+    recorded = {
+        "fact_log": events,  # operator.add 追加
+        "role_claims": claims,
+        "fact_cursor": len(history),
+        "game_summary": render_facts(fact_log, claims, alive, sheriff_id),
+    }
+    turn_type = state["turn_type"]
+    day = state["day_count"]
+    if turn_type in ("sheriff_settle", "voting_settle"):
+        votes = state.get("votes", {})
+        kind = "sheriff" if turn_type == "sheriff_settle" else ("pk" if state.get("pk_candidates") else "exile")
+        recorded["vote_matrix"] = update_vote_matrix(state.get("vote_matrix") or {}, votes)
+        recorded["vote_log"] = [{"day": day, "kind": kind, "voter": v, "target": t} for v, t in sorted(votes.items())]
+    elif turn_type == "night_settle":
+        actions = state.get("night_actions", {})
+        recorded["night_log"] = [
+            {"day": day, "action": a, "target": actions[a]} for a in NIGHT_LOG_ACTIONS if actions.get(a) is not None
+        ]
+    elif turn_type == "hunter_announcement":
+        shot = state["night_actions"].get("hunter_shoot")
+        recorded["night_log"] = [{"day": day, "action": "hunter_shoot", "target": shot}] if shot is not None else []
+    elif turn_type in ("sheriff_transfer", "sheriff_transfer_announcement"):
+        recorded["night_log"] = [{"day": day, "action": "sheriff_transfer", "target": state["night_actions"].get("sheriff_transfer")}]
+    return recorded
@@ -0,0 +1,195 @@
+"""从任意 checkpoint 分叉对局，并发运行 what-if 推演。
+
+用于策略调参：在某个决策点（如 `wolf_kill` 或 `voting` 之前）把对局分叉，
+在不同随机种子 / 性格配置下并发跑 K 局后续，按分支汇总胜率。
+
+- 分叉点来自带 checkpointer 的对局线程（`find_fork_points`），记录该 checkpoint
+  的状态与下一节点；
+- `fork_state` 以写时复制的方式克隆状态：公共历史中的 `Message` 对象在各分支间共享，
+  玩家对象只有在需要覆盖性格时才复制（引擎与玩家节点都不会原地修改玩家对象）；
+- 续跑使用 `build_workflow(resume=True)` 编译的图，跳过初始化，从分叉点的下一节点继续；
+- 所有推演作为独立对局交给 `GameHost` 并发运行，共享同一个模型池。
+
+示例：
+    point = find_fork_points(app, {"configurable": {"thread_id": "g1"}}, turn_type="voting")[-1]
+    results = await run_rollouts(point, [Branch("base"), Branch("aggressive", personalities={3: "激进"})], k=16)
+    print(format_rollout_report(results))
+"""
+
+from __future__ import annotations
+
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from src.agent.host import GameHost
+from src.agent.model_pool import ModelWorkerPool
+
+ResumeNode = str  # "game_master"：分叉点之后由 GM 推进；"dispatch"：按路由重新派发当前回合
+
+
+@dataclass(frozen=True)
+class ForkPoint:
+    """一个可分叉的 checkpoint"""
+
+    values: Dict[str, Any]
+    resume_node: ResumeNode
+    checkpoint_id: Optional[str] = None
+
+    @property
+    def day_count(self) -> int:
+        """分叉点所在天数"""
+        return int(self.values.get("day_count", 0))
+
+    @property
+    def turn_type(self) -> Optional[str]:
+        """分叉点所在环节"""
+        return self.values.get("turn_type")
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Any) -> ForkPoint:
+        """从 `StateSnapshot` 构造分叉点"""
+        resume_node = "game_master" if "game_master" in snapshot.next else "dispatch"
+        checkpoint_id = ((snapshot.config or {}).get("configurable") or {}).get("checkpoint_id")
+        return cls(values=dict(snapshot.values), resume_node=resume_node, checkpoint_id=checkpoint_id)
+
+
+def find_fork_points(
+    app: Runnable,
+    config: RunnableConfig,
+    turn_type: Optional[str] = None,
+    day_count: Optional[int] = None,
+) -> List[ForkPoint]:
+    """按时间顺序列出线程中可分叉的决策点。
+
+    决策点是 GM 刚布置好某个环节、玩家尚未行动的 checkpoint（下一节点不是 GM）。
+    `app` 需要是带 checkpointer 编译的对局图。
+    """
+    points = []
+    for snapshot in app.get_state_history(config):  # type: ignore[attr-defined]
+        values = snapshot.values
+        if not snapshot.next or "game_master" in snapshot.next or not values.get("players"):
+            continue
+        if turn_type is not None and values.get("turn_type") != turn_type:
+            continue
+        if day_count is not None and values.get("day_count") != day_count:
+            continue
+        points.append(ForkPoint.from_snapshot(snapshot))
+    points.reverse()
+    return points
+
+
+def fork_state(
+    values: Dict[str, Any],
+    *,
+    seed: Optional[int] = None,
+    personalities: Optional[Dict[int, str]] = None,
+) -> Dict[str, Any]:
+    """写时复制地克隆对局状态，可覆盖随机种子与部分玩家的性格"""
+    forked = dict(values)
+    if seed is not None:
+        forked["seed"] = seed
+    if personalities:
+        forked["players"] = [
+            p.model_copy(update={"personality": personalities[p.id]}) if p.id in personalities else p
+            for p in values["players"]
+        ]
+    return forked
+
+
+@dataclass
+class Branch:
+    """一个推演分支：相同的分叉点，不同的种子 / 性格配置"""
+
+    name: str
+    seed: Optional[int] = None
+    """分支基础种子；第 i 局推演的种子由它派生。为 None 时每局随机"""
+
+    personalities: Dict[int, str] = field(default_factory=dict)
+    """按玩家 ID 覆盖性格"""
+
+    configurable: Dict[str, Any] = field(default_factory=dict)
+    """额外并入推演对局 config 的配置（如 priority）"""
+
+    def rollout_seed(self, index: int) -> int:
+        """第 `index` 局推演使用的种子"""
+        if self.seed is None:
+            return random.SystemRandom().randrange(2**32)
+        return random.Random(f"{self.seed}:{index}").randrange(2**32)
+
+
+@dataclass
+class BranchResult:
+    """单个分支的推演汇总"""
+
+    name: str
+    rollouts: int = 0
+    wins: Counter = field(default_factory=Counter)
+    failed: int = 0
+    avg_days: float = 0.0
+
+    def win_rate(self, side: str) -> float:
+        """某一阵营在已完成推演中的胜率"""
+        finished = self.rollouts - self.failed
+        return self.wins[side] / finished if finished else 0.0
+
+
+def _rollout_id(branch: Branch, index: int) -> str:
+    return f"{branch.name}#{index}"
+
+
+async def run_rollouts(
+    point: ForkPoint,
+    branches: Sequence[Branch],
+    k: int = 8,
+    *,
+    graph: Optional[Runnable] = None,
+    pool: Optional[ModelWorkerPool] = None,
+    max_workers: int = 8,
+    recursion_limit: int = 1000,
+) -> Dict[str, BranchResult]:
+    """从分叉点为每个分支并发运行 `k` 局推演，返回 {分支名: 汇总}"""
+    if len({b.name for b in branches}) != len(branches):
+        raise ValueError("分支名不能重复")
+    if graph is None:
+        from src.agent.graph import build_workflow
+
+        graph = build_workflow(resume=True).compile()
+    host = GameHost(graph=graph, pool=pool, max_workers=max_workers, recursion_limit=recursion_limit)
+    for branch in branches:
+        for i in range(k):
+            host.add_game(
+                _rollout_id(branch, i),
+                {**branch.configurable, "resume_node": point.resume_node},
+                initial_state=fork_state(point.values, seed=branch.rollout_seed(i), personalities=branch.personalities),
+            )
+    finals = await host.run()
+
+    results: Dict[str, BranchResult] = {}
+    for branch in branches:
+        result = BranchResult(name=branch.name, rollouts=k)
+        days = []
+        for i in range(k):
+            final = finals.get(_rollout_id(branch, i))
+            if not final or not final.get("game_over"):
+                result.failed += 1
+                continue
+            result.wins[final.get("winner_side")] += 1
+            days.append(final.get("day_count", 0))
+        result.avg_days = sum(days) / len(days) if days else 0.0
+        results[branch.name] = result
+    return results
+
+
+def format_rollout_report(results: Dict[str, BranchResult]) -> str:
+    """生成各分支胜率的文本报告"""
+    lines = [f"{'branch':<16}{'runs':>6}{'failed':>8}{'wolf%':>8}{'good%':>8}{'days':>7}"]
+    for r in results.values():
+        lines.append(
+            f"{r.name:<16}{r.rollouts:>6}{r.failed:>8}{r.win_rate('werewolf') * 100:>7.1f}%"
+            f"{r.win_rate('villager') * 100:>7.1f}%{r.avg_days:>7.1f}"
+        )
+    return "\n".join(lines)
@@ -1,15 +1,18 @@
 from typing import Literal, Union
 from langgraph.graph import StateGraph, END, START
 from langchain_core.runnables import RunnableConfig
+from src.agent.configuration import Configuration
 from src.agent.state import GameState
 from src.agent.nodes.engine import game_master_node, action_handler_node
 from src.agent.nodes.roles import player_agent_node
+from src.agent.profiler import profiled
 from src.utils.helpers import get_default_state
 
 def init_node(state: GameState, config: RunnableConfig) -> GameState:
-    """初始化节点：如果状态缺失，加载默认对局"""
+    """初始化节点：如果状态缺失，按 config 中的预设/角色配置加载新对局"""
     if not state or "players" not in state or not state["players"]:
-        return get_default_state()
+        configuration = Configuration.from_runnable_config(config)
+        return get_default_state(configuration.resolve_role_counts(), seed=configuration.seed)
     return state
 
 from langgraph.constants import Send
@@ -43,31 +46,44 @@ def routing_logic(state: GameState):
     
     return "game_master"
 
-# 构建图
-workflow = StateGraph(GameState)
+def resume_router(state: GameState, config: RunnableConfig):
+    """分叉续跑入口：从分叉点记录的下一节点恢复调度（见 `src.agent.fork`）"""
+    if state.get("game_over"):
+        return END
+    if (config.get("configurable") or {}).get("resume_node") == "game_master":
+        return "game_master"
+    return routing_logic(state)
+
+_ROUTES = {
+    "player_agent": "player_agent",
+    "action_handler": "action_handler",
+    "game_master": "game_master",
+    END: END
+}
+
+def build_workflow(resume: bool = False) -> StateGraph:
+    """构建对局图；`resume=True` 时跳过初始化，直接从输入状态继续（用于从 checkpoint 分叉）"""
+    workflow = StateGraph(GameState)
+
+    # 添加节点（未开启剖析时包装层直接透传，见 `src.agent.profiler`）
+    workflow.add_node("game_master", profiled("game_master", game_master_node))
+    workflow.add_node("player_agent", profiled("player_agent", player_agent_node))
+    workflow.add_node("action_handler", profiled("action_handler", action_handler_node))
 
-# 添加节点
-workflow.add_node("init", init_node)
-workflow.add_node("game_master", game_master_node)
-workflow.add_node("player_agent", player_agent_node)
-workflow.add_node("action_handler", action_handler_node)
+    # 设置边
+    if resume:
+        workflow.add_conditional_edges(START, resume_router, _ROUTES)
+    else:
+        workflow.add_node("init", init_node)
+        workflow.add_edge(START, "init")
+        workflow.add_edge("init", "game_master")
+    workflow.add_edge("player_agent", "game_master")
+    workflow.add_edge("action_handler", "game_master")
 
-# 设置边
-workflow.add_edge(START, "init")
-workflow.add_edge("init", "game_master")
-workflow.add_edge("player_agent", "game_master")
-workflow.add_edge("action_handler", "game_master")
+    workflow.add_conditional_edges("game_master", routing_logic, _ROUTES)
+    return workflow
 
-workflow.add_conditional_edges(
-    "game_master",
-    routing_logic,
-    {
-        "player_agent": "player_agent",
-        "action_handler": "action_handler",
-        "game_master": "game_master",
-        END: END
-    }
-)
+workflow = build_workflow()
 
 # 导出 workflow 用于 main.py 灵活编译，导出 graph 用于 langgraph dev
 # 注意：在 Studio 环境下，Studio 会自动处理持久化，不需要显式注入 checkpointer
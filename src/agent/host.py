@@ -0,0 +1,253 @@
+"""多桌托管：在同一进程内用 asyncio 并发运行多个对局。
+
+所有对局共享一个 `ModelWorkerPool`，由池子负责全局并发上限与对局间的公平调度；
+主机负责启动对局、跟踪每桌进度（阶段/天数/环节/步数/模型调用）并汇总报告，
+报告中包含各模型层级的延迟与花费（见 `model_tiers`）。
+传入 `SpectatorServer` 时，每桌的状态流同时转发给观战服务（见 `spectator`）。
+所有桌共享一个 `EndpointPool`，层级配置了多个端点 / 密钥时在其间均衡并熔断（见 `endpoints`）。
+所有桌共享一个 `ValidationStats`，报告中给出各环节输出的合法 / 修复 / 重问 / 兜底次数（见 `validation`）。
+传入 `OpeningBook` 时，各桌大模型座位的首日决策先查开局库，命中则不调用模型（见 `opening_book`）。
+设置 `profile_dir`（或环境变量 `WEREWOLF_PROFILE`）时，每桌各写出一份火焰图（见 `profiler`）。
+
+示例：
+    host = GameHost(max_workers=16)
+    for i in range(24):
+        host.add_game(f"table-{i}", {"preset": "classic_9"})
+    await host.run()
+    print(host.report())
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Literal, Optional
+
+from langchain_core.runnables import Runnable
+
+from src.agent.configuration import Configuration
+from src.agent.endpoints import EndpointPool
+from src.agent.model_pool import GamePoolStats, ModelWorkerPool
+from src.agent.model_tiers import ModelUsageStats
+from src.agent.opening_book import OpeningBook
+from src.agent.profiler import profile_game, resolve_profile_dir
+from src.agent.spectator import SpectatorServer
+from src.agent.validation import ValidationStats
+
+TableStatus = Literal["pending", "running", "finished", "failed"]
+
+
+@dataclass
+class TableProgress:
+    """单桌进度快照"""
+
+    game_id: str
+    priority: str = "live"
+    status: TableStatus = "pending"
+    phase: Optional[str] = None
+    day_count: int = 0
+    turn_type: Optional[str] = None
+    steps: int = 0
+    model_calls: int = 0
+    avg_model_wait_s: float = 0.0
+    winner_side: Optional[str] = None
+    error: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed_s(self) -> float:
+        """已运行时长（秒）"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+
+@dataclass
+class _Table:
+    game_id: str
+    configurable: Dict[str, Any]
+    initial_state: Dict[str, Any]
+    progress: TableProgress
+    final_state: Optional[Dict[str, Any]] = None
+
+
+class GameHost:
+    """在单进程内并发托管多桌对局，共享一个有界模型调用池。"""
+
+    def __init__(
+        self,
+        graph: Optional[Runnable] = None,
+        pool: Optional[ModelWorkerPool] = None,
+        max_workers: int = 8,
+        recursion_limit: int = 1000,
+        on_progress: Optional[Callable[[TableProgress], None]] = None,
+        spectators: Optional[SpectatorServer] = None,
+        endpoints: Optional[EndpointPool] = None,
+        opening_book: Optional[OpeningBook] = None,
+    ) -> None:
+        if graph is None:
+            from src.agent.graph import graph as default_graph
+
+            graph = default_graph
+        self.graph = graph
+        self.pool = pool or ModelWorkerPool(max_workers=max_workers)
+        self.recursion_limit = recursion_limit
+        self.on_progress = on_progress
+        self.spectators = spectators
+        self.endpoints = endpoints or EndpointPool()
+        self.opening_book = opening_book
+        self.usage = ModelUsageStats()
+        self.validation = ValidationStats()
+        self._tables: Dict[str, _Table] = {}
+
+    def add_game(
+        self,
+        game_id: str,
+        configurable: Optional[Dict[str, Any]] = None,
+        initial_state: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """登记一桌对局；`configurable` 会并入该桌的 graph config"""
+        if game_id in self._tables:
+            raise ValueError(f"对局 {game_id} 已存在")
+        self._tables[game_id] = _Table(
+            game_id=game_id,
+            configurable=dict(configurable or {}),
+            initial_state=dict(initial_state or {}),
+            progress=TableProgress(
+                game_id=game_id,
+                priority=Configuration.from_runnable_config({"configurable": configurable or {}}).priority,
+            ),
+        )
+        if self.spectators is not None:
+            self.spectators.open(game_id)  # 观众可以在开局前连入等待
+
+    async def run(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        """并发运行所有已登记的对局，返回 {game_id: 终局状态}（失败为 None）"""
+        pending = [t for t in self._tables.values() if t.progress.status == "pending"]
+        if not pending:
+            return {t.game_id: t.final_state for t in self._tables.values()}
+        # 每桌在主机自有线程池中各占一个线程驱动同步图，不改动事件循环的默认线程池；
+        # 桌内的并行扇出由图自己的线程池执行（`max_concurrency` 按人数设置，见 `_run_table`）
+        executor = ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="game-host")
+        try:
+            await asyncio.gather(*(self._run_table(t, executor) for t in pending))
+        finally:
+            executor.shutdown(wait=True)
+        return {t.game_id: t.final_state for t in self._tables.values()}
+
+    def _estimate_seats(self, table: _Table) -> int:
+        players = table.initial_state.get("players")
+        if players:
+            return len(players)
+        counts = Configuration.from_runnable_config({"configurable": table.configurable}).resolve_role_counts()
+        return sum(counts.values())
+
+    async def _run_table(self, table: _Table, executor: ThreadPoolExecutor) -> None:
+        progress = table.progress
+        progress.status = "running"
+        progress.started_at = time.monotonic()
+        config = {
+            "recursion_limit": self.recursion_limit,
+            # 每桌最多同时有"人数"个节点在等模型，扇出线程需覆盖全部座位
+            "max_concurrency": self._estimate_seats(table) + 4,
+            "configurable": {
+                "thread_id": table.game_id,
+                **table.configurable,
+                "game_id": table.game_id,
+                "model_pool": self.pool,
+                "usage_stats": self.usage,
+                "endpoint_pool": self.endpoints,
+                "validation_stats": self.validation,
+                "opening_book": self.opening_book,
+            },
+        }
+        profile_dir = resolve_profile_dir(table.configurable)
+        try:
+            with profile_game(table.game_id, profile_dir) if profile_dir else nullcontext():
+                loop = asyncio.get_running_loop()
+                chunks: asyncio.Queue = asyncio.Queue()
+                done = object()
+
+                def drive() -> None:
+                    # 在工作线程中运行同步图，把流式输出交回事件循环处理
+                    try:
+                        for item in self.graph.stream(table.initial_state, config, stream_mode=["updates", "values"]):
+                            loop.call_soon_threadsafe(chunks.put_nowait, item)
+                    finally:
+                        loop.call_soon_threadsafe(chunks.put_nowait, done)
+
+                driver = loop.run_in_executor(executor, contextvars.copy_context().run, drive)
+                while (item := await chunks.get()) is not done:
+                    mode, chunk = item
+                    if mode == "values":
+                        table.final_state = chunk
+                        self._apply(progress, chunk)
+                        if self.spectators is not None:
+                            self.spectators.publish(table.game_id, chunk)
+                    else:
+                        progress.steps += 1
+                        self._notify(progress)
+                await driver
+            progress.status = "finished"
+        except Exception as e:  # 单桌异常不影响其他桌
+            progress.status = "failed"
+            progress.error = f"{type(e).__name__}: {e}"
+        finally:
+            progress.finished_at = time.monotonic()
+            self._notify(progress)
+            if self.spectators is not None:
+                self.spectators.finish(table.game_id, progress.error)
+
+    def _apply(self, progress: TableProgress, values: Dict[str, Any]) -> None:
+        progress.phase = values.get("phase", progress.phase)
+        progress.day_count = values.get("day_count", progress.day_count)
+        progress.turn_type = values.get("turn_type", progress.turn_type)
+        if values.get("game_over"):
+            progress.winner_side = values.get("winner_side")
+
+    def _refresh_stats(self, progress: TableProgress) -> None:
+        stats = self.pool.stats().get(progress.game_id, GamePoolStats())
+        progress.model_calls = stats.completed + stats.failed
+        progress.avg_model_wait_s = stats.avg_wait_s
+
+    def _notify(self, progress: TableProgress) -> None:
+        self._refresh_stats(progress)
+        if self.on_progress is not None:
+            self.on_progress(progress)
+
+    def progress(self) -> List[TableProgress]:
+        """返回所有桌的进度快照"""
+        for table in self._tables.values():
+            self._refresh_stats(table.progress)
+        return [TableProgress(**vars(t.progress)) for t in self._tables.values()]
+
+    def report(self) -> str:
+        """生成文本形式的每桌进度报告"""
+        lines = [f"{'game':<16}{'class':<7}{'status':<10}{'day':>4} {'turn':<24}{'steps':>6}{'calls':>7}{'wait(s)':>9}{'time(s)':>9}  winner"]
+        for p in self.progress():
+            lines.append(
+                f"{p.game_id:<16}{p.priority:<7}{p.status:<10}{p.day_count:>4} {str(p.turn_type):<24}{p.steps:>6}"
+                f"{p.model_calls:>7}{p.avg_model_wait_s:>9.2f}{p.elapsed_s:>9.1f}  {p.winner_side or p.error or '-'}"
+            )
+        lines.append(f"模型池：max_workers={self.pool.max_workers}, in_flight={self.pool.in_flight}")
+        for name, c in self.pool.class_stats().items():
+            lines.append(
+                f"  [{name}] weight={c.weight:g} calls={c.granted} queued={c.queued} preempted={c.preempted} "
+                f"wait avg={c.avg_wait_s:.2f}s p95={c.wait_percentile(0.95):.2f}s max={c.max_wait_s:.2f}s"
+            )
+        lines.append("模型分层：")
+        lines.extend(f"  {line}" for line in self.usage.report().splitlines())
+        if self.endpoints.stats():
+            lines.append("模型端点：")
+            lines.extend(f"  {line}" for line in self.endpoints.report().splitlines())
+        if self.opening_book is not None:
+            lines.append(self.opening_book.report())
+        if self.validation.snapshot():
+            lines.append("输出校验：")
+            lines.extend(f"  {line}" for line in self.validation.report().splitlines())
+        return "\n".join(lines)
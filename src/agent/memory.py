@@ -0,0 +1,108 @@
+"""有界的玩家私有记忆。
+
+玩家每行动一次（包括每轮并行投票、上警报名）都会追加一条内心想法，而提示词只读取
+最近几条；不加限制时 `private_thoughts` / `private_history` 随对局线性增长，
+每步的玩家拷贝与 checkpoint 都要带上整份列表。
+
+这里把私有记忆拆成两部分：
+- 最近若干条原文（环形缓冲，超出上限时淘汰最早的一条）；
+- 被淘汰条目的滚动摘要：每条压缩为一个短句，摘要总长度有上限，超出时丢弃最早的短句。
+因此每名玩家的记忆大小与拷贝开销在整局中保持常数。压缩是确定性的本地规则，
+不调用模型，重放时结果一致。
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from src.agent.state import Message, PlayerState
+
+# 最近想法保留条数，与提示词中的原文窗口一致：淘汰即进入摘要，原文与摘要之间没有断档
+THOUGHTS_LIMIT = 5
+# 最近私有消息保留条数
+PRIVATE_HISTORY_LIMIT = 8
+# 单条想法压缩后的最大长度
+DIGEST_ITEM_CHARS = 40
+# 摘要的最大总长度
+DIGEST_MAX_CHARS = 600
+
+DIGEST_SEP = "；"
+
+_SENTENCE_END = re.compile(r"[。！？!?\n]")
+_CHECK_FEEDBACK = re.compile(r"查验反馈：(\d+)号玩家的身份是【(.+?)】")
+_DIGEST_CHECK = re.compile(r"(\d+)号=(狼人|好人)")
+
+
+def _compact_text(text: str, prefix: str = "") -> str:
+    """把一段文本压缩为一个短句：取第一句，折叠空白并截断"""
+    first = _SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    first = " ".join(first.split())
+    if len(first) > DIGEST_ITEM_CHARS:
+        first = first[: DIGEST_ITEM_CHARS - 1] + "…"
+    return prefix + first
+
+
+def _compact_message(m: Message) -> str:
+    """私有消息的压缩形式；查验反馈保留为“N号=身份”，不丢失关键事实"""
+    match = _CHECK_FEEDBACK.search(m.content)
+    if match:
+        return f"{match.group(1)}号={match.group(2)}"
+    return _compact_text(m.content)
+
+
+def roll_digest(digest: str, items: List[str]) -> str:
+    """把新压缩的短句并入摘要，超出长度上限时丢弃最早的短句"""
+    parts = [p for p in digest.split(DIGEST_SEP) if p] if digest else []
+    parts.extend(i for i in items if i)
+    total = sum(len(p) + len(DIGEST_SEP) for p in parts)
+    start = 0
+    while total > DIGEST_MAX_CHARS and start < len(parts) - 1:
+        total -= len(parts[start]) + len(DIGEST_SEP)
+        start += 1
+    return DIGEST_SEP.join(parts[start:])
+
+
+def _bounded(items: List, new_items: List, limit: int) -> Tuple[List, List]:
+    """追加后只保留最近 `limit` 条，返回 (保留部分, 被淘汰部分)"""
+    merged = [*items, *new_items]
+    cut = max(0, len(merged) - limit)
+    return merged[cut:], merged[:cut]
+
+
+def remember_thought(player: PlayerState, thought: str, day: Optional[int] = None) -> PlayerState:
+    """返回追加了一条内心想法的新玩家对象（写时复制，不修改原对象）"""
+    thoughts, evicted = _bounded(player.private_thoughts, [thought], THOUGHTS_LIMIT)
+    update = {"private_thoughts": thoughts}
+    if evicted:
+        prefix = f"D{day}:" if day is not None else ""
+        update["thought_digest"] = roll_digest(player.thought_digest, [_compact_text(t, prefix) for t in evicted])
+    return player.model_copy(update=update)
+
+
+def remember_private(player: PlayerState, *messages: Message) -> PlayerState:
+    """返回追加了私有消息（如查验反馈）的新玩家对象（写时复制，不修改原对象）"""
+    history, evicted = _bounded(player.private_history, list(messages), PRIVATE_HISTORY_LIMIT)
+    update = {"private_history": history}
+    if evicted:
+        update["history_digest"] = roll_digest(player.history_digest, [_compact_message(m) for m in evicted])
+    return player.model_copy(update=update)
+
+
+def recent_thoughts(player: PlayerState) -> str:
+    """提示词中的私有想法：早前想法摘要 + 保留的全部原文（最多 `THOUGHTS_LIMIT` 条）"""
+    lines = []
+    if player.thought_digest:
+        lines.append(f"（早前想法摘要）{player.thought_digest}")
+    lines.extend(player.private_thoughts)
+    return "\n".join(lines)
+
+
+def check_results(player: PlayerState) -> Dict[int, str]:
+    """汇总玩家私有记忆中的全部查验结果 {玩家 ID: 身份}（含已压缩进摘要的部分）"""
+    results = {int(pid): res for pid, res in _DIGEST_CHECK.findall(player.history_digest)}
+    for m in player.private_history:
+        match = _CHECK_FEEDBACK.search(m.content)
+        if match:
+            results[int(match.group(1))] = match.group(2)
+    return results
@@ -0,0 +1,309 @@
+"""本地 OpenAI 兼容模拟服务：不消耗真实 token 地压测整条链路（含 langgraph dev 的 HTTP API）。
+
+`POST /v1/chat/completions` 按请求中的函数定义（`AgentOutput` / `NightAction` / `VotingOutput` 等）
+直接合成一次合法的函数调用：字符串字段填入模拟文本，枚举字段随机取值，目标 ID 从对局状态消息里
+出现过的玩家编号中挑选（排除自己）。支持非流式与流式（SSE 分片、`stream_options.include_usage`）
+两种返回，`usage` 按字符数粗略估算。
+
+延迟与故障可配置（见 `MockBehavior`）：固定 / 均匀 / 对数正态分布的延迟，按比例注入
+429（限流）与 500（服务端错误）。服务只依赖标准库（asyncio 上的最小 HTTP/1.1 实现，支持 keep-alive）。
+
+通过模型层级的 `openai_api_base` 选用：
+    server = MockOpenAIServer(port=8900, behavior=MockBehavior(latency="lognormal", median_s=0.8))
+    await server.start()
+    configurable = {"model_tiers": mock_model_tiers(server.base_url)}
+
+也可单独启动：`python scripts/mock_openai.py --port 8900`，压测驱动见 `scripts/load_test.py`。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from src.agent.configuration import DEFAULT_MODEL_TIERS
+
+LatencyKind = Literal["fixed", "uniform", "lognormal"]
+
+# 流式返回时函数参数的分片长度（字符）
+STREAM_PIECE_CHARS = 12
+# 指向模拟服务时使用的占位密钥（模拟服务不校验鉴权）
+MOCK_API_KEY = "mock-key"
+
+_SELF_ID = re.compile(r"ID：(\d+)")
+_PLAYER_REF = re.compile(r"玩家\s*(\d+)|(\d+)\s*号")
+_MOCK_SPEECH = ("我是好人，先听后置位发言。", "我觉得{target}号的发言有问题，建议大家关注。", "这一轮我跟警长的票。")
+
+
+@dataclass
+class MockBehavior:
+    """模拟服务的延迟分布与故障注入比例"""
+
+    latency: LatencyKind = "lognormal"
+    median_s: float = 0.5
+    spread: float = 0.5
+    """uniform 为 ±spread 秒；lognormal 为对数标准差 sigma"""
+    rate_limit_rate: float = 0.0
+    error_rate: float = 0.0
+    seed: Optional[int] = None
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """采样一次请求的总延迟（秒）"""
+        if self.latency == "fixed":
+            return max(0.0, self.median_s)
+        if self.latency == "uniform":
+            return max(0.0, rng.uniform(self.median_s - self.spread, self.median_s + self.spread))
+        return self.median_s * math.exp(rng.gauss(0.0, self.spread))
+
+
+@dataclass
+class MockStats:
+    """模拟服务的累计统计"""
+
+    requests: int = 0
+    streamed: int = 0
+    rate_limited: int = 0
+    errors: int = 0
+    by_tool: Dict[str, int] = field(default_factory=dict)
+
+
+def mock_model_tiers(base_url: str, tiers: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """返回把各模型层级指向模拟服务的 `model_tiers` 覆盖配置（模拟服务不校验密钥，带一个占位密钥）"""
+    return {tier: {"openai_api_base": base_url, "api_key": MOCK_API_KEY} for tier in tiers or DEFAULT_MODEL_TIERS}
+
+
+def _prompt_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for m in messages:
+        content = m.get("content")
+        if isinstance(content, list):
+            content = " ".join(str(c.get("text", "")) for c in content if isinstance(c, dict))
+        parts.append(str(content or ""))
+    return "\n".join(parts)
+
+
+def _candidate_targets(messages: List[Dict[str, Any]]) -> List[int]:
+    # 系统提示词里只取自己的座位号（其中的发言示例编号不是真实玩家）
+    self_id = _SELF_ID.search(_prompt_text([m for m in messages if m.get("role") == "system"]))
+    me = int(self_id.group(1)) if self_id else None
+    text = _prompt_text([m for m in messages if m.get("role") != "system"])
+    ids = {int(a or b) for a, b in _PLAYER_REF.findall(text)}
+    return sorted(i for i in ids if i != me and i > 0)
+
+
+def _field_types(prop: Dict[str, Any]) -> List[str]:
+    if "anyOf" in prop:
+        return [t for option in prop["anyOf"] for t in _field_types(option)]
+    kind = prop.get("type")
+    return list(kind) if isinstance(kind, list) else [kind] if kind else []
+
+
+def fake_arguments(parameters: Dict[str, Any], messages: List[Dict[str, Any]], rng: random.Random) -> Dict[str, Any]:
+    """按函数参数的 JSON Schema 合成一份合法参数"""
+    targets = _candidate_targets(messages)
+    target = rng.choice(targets) if targets else None
+    args: Dict[str, Any] = {}
+    for name, prop in (parameters.get("properties") or {}).items():
+        types = _field_types(prop)
+        if "enum" in prop:
+            args[name] = rng.choice(prop["enum"])
+        elif "integer" in types:
+            args[name] = target if target is not None or "null" in types else 1
+        elif "string" in types:
+            if name == "speech":
+                args[name] = rng.choice(_MOCK_SPEECH).format(target=target or 1)
+            elif name == "thought":
+                args[name] = "模拟思考：根据票型与发言做出判断。"
+            else:
+                args[name] = None if "null" in types else ""
+        else:
+            args[name] = None
+    return args
+
+
+def _usage(messages: List[Dict[str, Any]], arguments: str) -> Dict[str, int]:
+    prompt_tokens = max(1, len(_prompt_text(messages)) // 2)
+    completion_tokens = max(1, len(arguments) // 2)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _pick_tool(body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    tools = body.get("tools") or []
+    choice = body.get("tool_choice")
+    wanted = choice.get("function", {}).get("name") if isinstance(choice, dict) else None
+    for tool in tools:
+        if wanted is None or tool.get("function", {}).get("name") == wanted:
+            return tool.get("function")
+    return None
+
+
+class MockOpenAIServer:
+    """OpenAI 兼容的 `/v1/chat/completions` 模拟服务。"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8900, behavior: Optional[MockBehavior] = None) -> None:
+        self.host = host
+        self.port = port
+        self.behavior = behavior or MockBehavior()
+        self.stats = MockStats()
+        self._rng = random.Random(self.behavior.seed)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        """供 `openai_api_base` 使用的地址"""
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> None:
+        """开始监听；`port=0` 时由系统分配端口，实际端口写回 `self.port`"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        """停止监听"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def start_in_thread(self) -> threading.Thread:
+        """在后台线程的独立事件循环中运行（供同步代码 / 测试使用），返回后即可接受请求"""
+        ready = threading.Event()
+
+        def run() -> None:
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+
+        thread = threading.Thread(target=run, name="mock-openai", daemon=True)
+        thread.start()
+        ready.wait()
+        return thread
+
+    # --- HTTP ---
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, body = request
+                path = path.split("?")[0].rstrip("/")
+                if method == "GET" and path.endswith("/models"):
+                    data = {"object": "list", "data": [{"id": t["model"], "object": "model"} for t in DEFAULT_MODEL_TIERS.values()]}
+                    await self._respond(writer, "200 OK", data)
+                elif method == "POST" and path.endswith("/chat/completions"):
+                    await self._completion(writer, json.loads(body or b"{}"))
+                else:
+                    await self._respond(writer, "404 Not Found", {"error": {"message": "not found"}})
+        except (ConnectionError, asyncio.IncompleteReadError, json.JSONDecodeError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bytes]]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) < 2:
+            return None
+        length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        body = await reader.readexactly(length) if length else b""
+        return request_line[0], request_line[1], body
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: str, data: Dict[str, Any], headers: str = "") -> None:
+        body = json.dumps(data, ensure_ascii=False).encode()
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n{headers}\r\n".encode() + body
+        )
+        await writer.drain()
+
+    async def _completion(self, writer: asyncio.StreamWriter, body: Dict[str, Any]) -> None:
+        behavior = self.behavior
+        self.stats.requests += 1
+        latency = behavior.sample_latency(self._rng)
+        roll = self._rng.random()
+        if roll < behavior.rate_limit_rate:
+            self.stats.rate_limited += 1
+            await self._respond(writer, "429 Too Many Requests", {"error": {"message": "mock rate limit", "type": "rate_limit"}}, "Retry-After: 0\r\n")
+            return
+        if roll < behavior.rate_limit_rate + behavior.error_rate:
+            self.stats.errors += 1
+            await asyncio.sleep(latency)
+            await self._respond(writer, "500 Internal Server Error", {"error": {"message": "mock server error", "type": "server_error"}})
+            return
+
+        messages = body.get("messages") or []
+        tool = _pick_tool(body)
+        name = tool.get("name") if tool else None
+        arguments = json.dumps(fake_arguments(tool.get("parameters") or {}, messages, self._rng), ensure_ascii=False) if tool else ""
+        self.stats.by_tool[name or "<text>"] = self.stats.by_tool.get(name or "<text>", 0) + 1
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "mock")
+        usage = _usage(messages, arguments)
+        call_id = f"call_{uuid.uuid4().hex[:12]}"
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency)
+            message: Dict[str, Any] = {"role": "assistant", "content": None if tool else "模拟回复。"}
+            if tool:
+                message["tool_calls"] = [{"id": call_id, "type": "function", "function": {"name": name, "arguments": arguments}}]
+            await self._respond(writer, "200 OK", {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool else "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.stats.streamed += 1
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+
+        async def send(payload: Any) -> None:
+            data = f"data: {payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)}\n\n".encode()
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+
+        def chunk(delta: Dict[str, Any], finish: Optional[str] = None) -> Dict[str, Any]:
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+
+        # 一半延迟作为首包时间，其余均摊到各分片
+        pieces = [arguments[i : i + STREAM_PIECE_CHARS] for i in range(0, len(arguments), STREAM_PIECE_CHARS)] if tool else ["模拟回复。"]
+        await asyncio.sleep(latency / 2)
+        if tool:
+            await send(chunk({"role": "assistant", "tool_calls": [{"index": 0, "id": call_id, "type": "function", "function": {"name": name, "arguments": ""}}]}))
+        for piece in pieces:
+            await asyncio.sleep(latency / 2 / max(1, len(pieces)))
+            if tool:
+                await send(chunk({"tool_calls": [{"index": 0, "function": {"arguments": piece}}]}))
+            else:
+                await send(chunk({"role": "assistant", "content": piece}))
+        await send(chunk({}, "tool_calls" if tool else "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            await send({**chunk({}), "choices": [], "usage": usage})
+        await send("[DONE]")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
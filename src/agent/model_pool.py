@@ -0,0 +1,284 @@
+"""进程内共享的模型调用池。
+
+多桌同时运行时，所有 `player_agent` 与总结模型的调用都经过同一个有界 worker 池：
+- 全局并发上限 `max_workers`，防止一台服务器上的几十桌同时打满模型配额；
+- 等待中的请求按对局分队列，空闲 worker 在对局之间轮转分配，
+  因此某一桌 12 路并行投票不会饿死其他桌的串行发言；
+- 对局带有优先级类别（`live` 观战局 / `batch` 离线自博弈），类别之间按权重做
+  加权公平排队（stride 调度）。新到达的 live 请求会排到已在排队的 batch 请求之前
+  （抢占的是排队中的 batch 调用，已在执行的调用不会被打断），持续拥塞时
+  batch 仍按权重获得一小部分 worker，不会被完全饿死。
+
+图节点是同步函数（在线程池中执行），因此池子基于 `threading.Condition` 实现，
+节点通过 `run_model_call(config, fn)` 提交调用，池子从 `config["configurable"]` 中读取：
+- `model_pool`：`ModelWorkerPool` 实例，缺省时直接调用；
+- `game_id`（缺省用 `thread_id`）：用于公平调度与统计；
+- `priority`：优先级类别，缺省为 `live`；
+- `model_tape`：可选的 `ModelTape`，用于录制 / 重放模型输出（见 `src.agent.replay`）。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, TypeVar
+
+from langchain_core.runnables import RunnableConfig
+
+from src.agent.configuration import Configuration
+from src.agent.replay import get_model_tape
+
+T = TypeVar("T")
+
+DEFAULT_GAME_ID = "default"
+DEFAULT_PRIORITY = "live"
+# 类别权重：拥塞时 live:batch 按 8:1 分配 worker
+DEFAULT_CLASS_WEIGHTS: Dict[str, float] = {"live": 8.0, "batch": 1.0}
+# 排队可被抢占的类别
+PREEMPTIBLE_CLASSES = frozenset({"batch"})
+_WAIT_SAMPLES = 1024
+
+
+@dataclass
+class GamePoolStats:
+    """单个对局在池中的调用统计"""
+
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    queued: int = 0
+    in_flight: int = 0
+    total_wait_s: float = 0.0
+    max_wait_s: float = 0.0
+    by_kind: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def avg_wait_s(self) -> float:
+        """已开始执行的调用的平均排队时间"""
+        started = self.completed + self.failed + self.in_flight
+        return self.total_wait_s / started if started else 0.0
+
+
+@dataclass
+class ClassPoolStats:
+    """单个优先级类别的排队统计"""
+
+    weight: float
+    submitted: int = 0
+    granted: int = 0
+    queued: int = 0
+    in_flight: int = 0
+    preempted: int = 0  # 排队中被后到的高优先级请求插队的次数
+    total_wait_s: float = 0.0
+    max_wait_s: float = 0.0
+    recent_waits: List[float] = field(default_factory=list)
+
+    @property
+    def avg_wait_s(self) -> float:
+        """平均排队时间"""
+        return self.total_wait_s / self.granted if self.granted else 0.0
+
+    def wait_percentile(self, q: float) -> float:
+        """最近若干次调用排队时间的分位数（q 取 0-1）"""
+        if not self.recent_waits:
+            return 0.0
+        ordered = sorted(self.recent_waits)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass(eq=False)
+class _Ticket:
+    game_id: str
+    kind: str
+    priority: str
+    enqueued_at: float
+    granted: bool = False
+
+
+class _ClassQueue:
+    """单个优先级类别的等待队列：内部按对局轮转"""
+
+    def __init__(self, weight: float) -> None:
+        self.weight = weight
+        self.pass_ = 0.0  # stride 调度的虚拟时间
+        self.queues: Dict[str, Deque[_Ticket]] = {}
+        self.ring: Deque[str] = deque()  # 有等待请求的对局，按轮转顺序排列
+        self.stats = ClassPoolStats(weight=weight)
+        self._waits: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+
+    def push(self, ticket: _Ticket) -> None:
+        queue = self.queues.setdefault(ticket.game_id, deque())
+        if not queue:
+            self.ring.append(ticket.game_id)
+        queue.append(ticket)
+
+    def head(self) -> _Ticket:
+        return self.queues[self.ring[0]][0]
+
+    def pop(self) -> _Ticket:
+        game_id = self.ring.popleft()
+        queue = self.queues[game_id]
+        ticket = queue.popleft()
+        if queue:
+            self.ring.append(game_id)
+        else:
+            del self.queues[game_id]
+        return ticket
+
+    def record_wait(self, wait: float) -> None:
+        self._waits.append(wait)
+        self.stats.total_wait_s += wait
+        self.stats.max_wait_s = max(self.stats.max_wait_s, wait)
+
+    def snapshot(self) -> ClassPoolStats:
+        return ClassPoolStats(**{**vars(self.stats), "recent_waits": list(self._waits)})
+
+
+class ModelWorkerPool:
+    """有界模型调用池（线程安全）：类别间加权公平排队，类别内按对局轮转。"""
+
+    def __init__(self, max_workers: int = 8, class_weights: Optional[Dict[str, float]] = None) -> None:
+        if max_workers < 1:
+            raise ValueError("max_workers 至少为 1")
+        weights = dict(class_weights or DEFAULT_CLASS_WEIGHTS)
+        if any(w <= 0 for w in weights.values()):
+            raise ValueError("优先级类别权重必须为正数")
+        self.max_workers = max_workers
+        self._cond = threading.Condition()
+        self._classes: Dict[str, _ClassQueue] = {name: _ClassQueue(w) for name, w in weights.items()}
+        self._vtime = 0.0  # 最近一次分配的虚拟时间
+        self._in_flight = 0
+        self._stats: Dict[str, GamePoolStats] = {}
+
+    def submit(self, game_id: str, fn: Callable[[], T], kind: str = "player", priority: str = DEFAULT_PRIORITY) -> T:
+        """在池中执行一次模型调用，阻塞直到获得 worker 并返回结果"""
+        if priority not in self._classes:
+            raise ValueError(f"未知优先级类别：{priority}，可选：{sorted(self._classes)}")
+        ticket = self._acquire(game_id, kind, priority)
+        ok = False
+        try:
+            result = fn()
+            ok = True
+            return result
+        finally:
+            self._release(ticket, ok)
+
+    def _acquire(self, game_id: str, kind: str, priority: str) -> _Ticket:
+        ticket = _Ticket(game_id=game_id, kind=kind, priority=priority, enqueued_at=time.monotonic())
+        with self._cond:
+            stats = self._stats.setdefault(game_id, GamePoolStats())
+            stats.submitted += 1
+            stats.queued += 1
+            stats.by_kind[kind] = stats.by_kind.get(kind, 0) + 1
+            cls = self._classes[priority]
+            if not cls.ring:
+                # 类别从空闲变为积压：不允许用空闲期"攒"下的份额插队
+                cls.pass_ = max(cls.pass_, self._vtime)
+            cls.push(ticket)
+            cls.stats.submitted += 1
+            cls.stats.queued += 1
+            self._dispatch()
+            while not ticket.granted:
+                self._cond.wait()
+        return ticket
+
+    def _release(self, ticket: _Ticket, ok: bool) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._classes[ticket.priority].stats.in_flight -= 1
+            stats = self._stats[ticket.game_id]
+            stats.in_flight -= 1
+            if ok:
+                stats.completed += 1
+            else:
+                stats.failed += 1
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        """在持锁状态下，把空闲 worker 分配给虚拟时间最小的类别，类别内按对局轮转"""
+        granted = False
+        while self._in_flight < self.max_workers:
+            backlogged = [c for c in self._classes.values() if c.ring]
+            if not backlogged:
+                break
+            cls = min(backlogged, key=lambda c: (c.pass_, -c.weight))
+            ticket = cls.pop()
+            self._vtime = cls.pass_
+            cls.pass_ += 1.0 / cls.weight
+            # 统计被插队的可抢占请求：比本次分配的请求更早入队却仍在排队
+            for other in backlogged:
+                if other is not cls and other.ring and other.head().priority in PREEMPTIBLE_CLASSES \
+                        and other.head().enqueued_at < ticket.enqueued_at:
+                    other.stats.preempted += 1
+            ticket.granted = True
+            granted = True
+            self._in_flight += 1
+
+            wait = time.monotonic() - ticket.enqueued_at
+            cls.stats.queued -= 1
+            cls.stats.in_flight += 1
+            cls.stats.granted += 1
+            cls.record_wait(wait)
+            stats = self._stats[ticket.game_id]
+            stats.queued -= 1
+            stats.in_flight += 1
+            stats.total_wait_s += wait
+            stats.max_wait_s = max(stats.max_wait_s, wait)
+        if granted:
+            self._cond.notify_all()
+
+    @property
+    def in_flight(self) -> int:
+        """当前正在执行的调用数"""
+        with self._cond:
+            return self._in_flight
+
+    def class_stats(self) -> Dict[str, ClassPoolStats]:
+        """按优先级类别返回排队统计快照"""
+        with self._cond:
+            return {name: cls.snapshot() for name, cls in self._classes.items()}
+
+    def stats(self) -> Dict[str, GamePoolStats]:
+        """按对局返回统计快照"""
+        with self._cond:
+            return {
+                game_id: GamePoolStats(**{**vars(s), "by_kind": dict(s.by_kind)})
+                for game_id, s in self._stats.items()
+            }
+
+
+def get_game_id(config: Optional[RunnableConfig]) -> str:
+    """从 config 中解析对局 ID（game_id > thread_id）"""
+    configurable = (config or {}).get("configurable") or {}
+    return str(configurable.get("game_id") or configurable.get("thread_id") or DEFAULT_GAME_ID)
+
+
+def get_priority(config: Optional[RunnableConfig]) -> str:
+    """从 config 中解析对局的优先级类别"""
+    return Configuration.from_runnable_config(config).priority
+
+
+def get_model_pool(config: Optional[RunnableConfig]) -> Optional[ModelWorkerPool]:
+    """从 config 中获取共享模型池，未配置时返回 None"""
+    configurable = (config or {}).get("configurable") or {}
+    pool: Any = configurable.get("model_pool")
+    return pool if isinstance(pool, ModelWorkerPool) else None
+
+
+def run_model_call(
+    config: Optional[RunnableConfig], fn: Callable[[], T], kind: str = "player", player_id: Optional[int] = None
+) -> T:
+    """执行一次模型调用：配置了共享池则经池调度，否则直接调用。
+
+    配置了 `model_tape` 时按磁带录制输出，重放模式下直接返回录制结果（不占用池）。
+    """
+    pool = get_model_pool(config)
+    call: Callable[[], T] = fn
+    if pool is not None:
+        call = lambda: pool.submit(get_game_id(config), fn, kind=kind, priority=get_priority(config))  # noqa: E731
+    tape = get_model_tape(config)
+    if tape is None:
+        return call()
+    return tape.call(config, call, kind=kind, player_id=player_id)
@@ -0,0 +1,176 @@
+"""模型分层：按环节与角色把决策路由到不同的模型，并统计各层延迟与花费。
+
+简单决策（上警报名、投票）走便宜 / 快速的层级，发言等关键决策走完整模型。
+层级参数与路由规则在 `Configuration.model_tiers` / `tier_routes` 中配置
+（默认值见 `DEFAULT_MODEL_TIERS` / `DEFAULT_TIER_ROUTES`）。
+
+每次调用的延迟（不含模型池排队时间）与 token 用量记入 `ModelUsageStats`：
+从 `config["configurable"]["usage_stats"]` 读取，未配置时记入进程级默认实例；
+同时计入当前节点的单局预算计量（见 `budget`）。
+重放模式下模型不会被调用，因此不产生统计。
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langchain_openai import ChatOpenAI
+
+from src.agent.budget import meter_call
+
+DEFAULT_API_BASE = "https://api.deepseek.com/v1"
+DEFAULT_API_KEY_ENV = "DEEPSEEK_API_KEY"
+DEFAULT_MAX_RETRIES = 2
+# 每个层级保留的最近延迟样本数（长期运行的托管进程中统计大小保持常数）
+_LATENCY_SAMPLES = 1024
+
+
+@lru_cache(maxsize=None)
+def _build_chat_model(
+    model: str,
+    api_base: str,
+    api_key_env: str,
+    temperature: float,
+    max_tokens: Optional[int],
+    max_retries: int,
+    api_key: Optional[str] = None,
+) -> ChatOpenAI:
+    return ChatOpenAI(
+        model=model,
+        openai_api_key=api_key or os.getenv(api_key_env),
+        openai_api_base=api_base,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        max_retries=max_retries,
+    )
+
+
+def get_tier_llm(params: Dict[str, Any], max_tokens: Optional[int] = None) -> ChatOpenAI:
+    """按层级参数与 token 上限取得（缓存的）模型实例；`api_key` 直接给出密钥时优先于 `api_key_env`"""
+    return _build_chat_model(
+        params["model"],
+        params.get("openai_api_base", DEFAULT_API_BASE),
+        params.get("api_key_env", DEFAULT_API_KEY_ENV),
+        float(params.get("temperature", 0.7)),
+        max_tokens,
+        int(params.get("max_retries", DEFAULT_MAX_RETRIES)),
+        params.get("api_key"),
+    )
+
+
+@dataclass
+class TierStats:
+    """单个模型层级的累计统计"""
+
+    calls: int = 0
+    failures: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    latencies: List[float] = field(default_factory=list)  # 最近 `_LATENCY_SAMPLES` 次调用的延迟
+
+    @property
+    def avg_latency_s(self) -> float:
+        """最近调用的平均延迟（秒）"""
+        return sum(self.latencies) / len(self.latencies) if self.latencies else 0.0
+
+    def latency_percentile(self, q: float) -> float:
+        """最近调用的延迟分位数（秒），q 取 0-1"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ModelUsageStats:
+    """按模型层级汇总调用次数、延迟、token 用量与估算花费（线程安全）。"""
+
+    def __init__(self) -> None:
+        self._tiers: Dict[str, TierStats] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        tier: str,
+        params: Dict[str, Any],
+        latency_s: float,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        ok: bool = True,
+    ) -> None:
+        """记录一次模型调用"""
+        cost = (
+            input_tokens * float(params.get("input_cost_per_mtok", 0.0))
+            + output_tokens * float(params.get("output_cost_per_mtok", 0.0))
+        ) / 1e6
+        meter_call(tier, input_tokens, output_tokens, cost)
+        with self._lock:
+            stats = self._tiers.setdefault(tier, TierStats())
+            stats.calls += 1
+            stats.failures += 0 if ok else 1
+            stats.input_tokens += input_tokens
+            stats.output_tokens += output_tokens
+            stats.cost_usd += cost
+            stats.latencies.append(latency_s)
+            del stats.latencies[:-_LATENCY_SAMPLES]
+
+    def snapshot(self) -> Dict[str, TierStats]:
+        """返回各层级统计的副本"""
+        with self._lock:
+            return {name: TierStats(**{**vars(s), "latencies": list(s.latencies)}) for name, s in self._tiers.items()}
+
+    def report(self) -> str:
+        """生成文本形式的分层统计"""
+        lines = [f"{'tier':<8}{'calls':>7}{'fail':>6}{'avg(s)':>8}{'p95(s)':>8}{'in_tok':>10}{'out_tok':>10}{'cost($)':>10}"]
+        for name, s in sorted(self.snapshot().items()):
+            lines.append(
+                f"{name:<8}{s.calls:>7}{s.failures:>6}{s.avg_latency_s:>8.2f}{s.latency_percentile(0.95):>8.2f}"
+                f"{s.input_tokens:>10}{s.output_tokens:>10}{s.cost_usd:>10.4f}"
+            )
+        return "\n".join(lines)
+
+
+DEFAULT_USAGE_STATS = ModelUsageStats()
+
+
+def get_usage_stats(config: Optional[RunnableConfig]) -> ModelUsageStats:
+    """从 config 中获取用量统计，未配置时返回进程级默认实例"""
+    configurable = (config or {}).get("configurable") or {}
+    stats: Any = configurable.get("usage_stats")
+    return stats if isinstance(stats, ModelUsageStats) else DEFAULT_USAGE_STATS
+
+
+def tracked_structured_call(
+    config: Optional[RunnableConfig], tier: str, params: Dict[str, Any], fn: Callable[[], Dict[str, Any]]
+) -> Any:
+    """执行 `include_raw=True` 的结构化调用，记录延迟与 token 用量后返回解析结果。
+
+    解析失败时抛出解析异常，由调用方走兜底逻辑。
+    """
+    stats = get_usage_stats(config)
+    start = time.perf_counter()
+    try:
+        result = fn()
+    except Exception:
+        stats.record(tier, params, time.perf_counter() - start, ok=False)
+        raise
+    latency = time.perf_counter() - start
+    usage = getattr(result.get("raw"), "usage_metadata", None) or {}
+    error = result.get("parsing_error")
+    stats.record(
+        tier,
+        params,
+        latency,
+        input_tokens=int(usage.get("input_tokens", 0)),
+        output_tokens=int(usage.get("output_tokens", 0)),
+        ok=error is None and result.get("parsed") is not None,
+    )
+    if error is not None:
+        raise error
+    return result.get("parsed")
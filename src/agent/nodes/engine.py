@@ -1,21 +1,12 @@
-import os
-import random
+from bisect import bisect_left
 from typing import Dict, List, Any, Optional, Literal
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain_core.runnables import RunnableConfig
 from src.agent.state import GameState, Message
-
-# 加载环境变量
-load_dotenv()
-
-# 初始化用于总结的 LLM
-summarizer_llm = ChatOpenAI(
-    model="deepseek-chat", 
-    openai_api_key=os.getenv("DEEPSEEK_API_KEY"),
-    openai_api_base="https://api.deepseek.com/v1",
-    temperature=0.3 # 总结需要低随机性
-)
+from src.agent.budget import budget_report
+from src.agent.facts import record_facts
+from src.agent.memory import remember_private
+from src.agent.policies import first_day_candidates, first_night_actions
+from src.utils.helpers import get_rng
 
 def game_master_node(state: GameState, config: RunnableConfig) -> Dict[str, Any]:
     """
@@ -25,23 +16,23 @@ def game_master_node(state: GameState, config: RunnableConfig) -> Dict[str, Any]
     # 但由于 GM 需要判定下一步，我们可以在返回 updates 时统一处理
     updates = {}
     
-    # 1. 判定胜负
+    # 1. 判定胜负 (一次建立 id -> role 映射，O(n))
     players = state["players"]
     alive_ids = state["alive_players"]
+    role_by_id = {p.id: p.role for p in players}
     
     wolf_count = 0
     human_count = 0
     for p_id in alive_ids:
-        p = next(player for player in players if player.id == p_id)
-        if p.role == "werewolf":
+        if role_by_id[p_id] == "werewolf":
             wolf_count += 1
         else:
             human_count += 1
             
     if wolf_count == 0:
-        return {"game_over": True, "winner_side": "villager"}
+        return {"game_over": True, "winner_side": "villager", "budget_report": budget_report(state, config)}
     if wolf_count >= human_count:
-        return {"game_over": True, "winner_side": "werewolf"}
+        return {"game_over": True, "winner_side": "werewolf", "budget_report": budget_report(state, config)}
 
     # 2. 调度逻辑
     phase = state["phase"]
@@ -97,43 +88,12 @@ def game_master_node(state: GameState, config: RunnableConfig) -> Dict[str, Any]
     if phase == "night":
         # --- 优化：首夜决策自动化 ---
         if state["day_count"] == 1 and state.get("turn_type") != "night_settle":
-            night_actions = {}
-            players = state["players"]
-            alive_ids = state["alive_players"]
-            
-            # 1. 狼人随机刀一个非狼玩家
-            wolves = [p.id for p in players if p.role == "werewolf" and p.is_alive]
-            non_wolves = [p_id for p_id in alive_ids if p_id not in wolves]
-            wolf_kill = random.choice(non_wolves) if non_wolves else None
-            night_actions["wolf_kill"] = wolf_kill
-            
-            # 2. 守卫固定守自己
-            guard = next((p for p in players if p.role == "guard" and p.is_alive), None)
-            night_actions["guard_protect"] = guard.id if guard else None
-            
-            # 3. 预言家验下一位（环形）
-            seer = next((p for p in players if p.role == "seer" and p.is_alive), None)
-            seer_check = None
-            if seer:
-                alive_sorted = sorted(alive_ids)
-                idx = alive_sorted.index(seer.id)
-                seer_check = alive_sorted[(idx + 1) % len(alive_sorted)]
-                night_actions["seer_check"] = seer_check
-                
-                # 记录查验结果到预言家私有历史
-                target_p = next(p for p in players if p.id == seer_check)
-                res = "狼人" if target_p.role == "werewolf" else "好人"
-                msg = Message(role="system", content=f"查验反馈：{seer_check}号玩家的身份是【{res}】。")
-                # 注意：这里需要深拷贝玩家列表来更新
-                updated_players = [p.model_copy(deep=True) for p in players]
-                new_seer = next(p for p in updated_players if p.id == seer.id)
-                new_seer.private_history.append(msg)
-                updates["players"] = updated_players
-
-            # 4. 女巫肯定救人
-            witch = next((p for p in players if p.role == "witch" and p.is_alive), None)
-            if witch and state["witch_potions"].get("save"):
-                night_actions["witch_save"] = wolf_kill
+            # 首夜规则策略（见 src.agent.policies）
+            night_actions, seer_feedback = first_night_actions(state)
+            if seer_feedback:
+                # 只拷贝并返回被修改的预言家，merge_players 会按 ID 覆盖
+                seer, msg = seer_feedback
+                updates["players"] = [remember_private(seer, msg)]
             
             updates.update({
                 "turn_type": "night_settle",
@@ -151,18 +111,25 @@ def game_master_node(state: GameState, config: RunnableConfig) -> Dict[str, Any]
             
         start_idx = current_idx if state.get("current_player_id") is None else current_idx + 1
         
+        role_map = {"guard_protect": "guard", "wolf_kill": "werewolf", "seer_check": "seer", "witch_action": "witch"}
+        first_actor: Dict[str, int] = {}
+        for p in players:
+            if p.is_alive and p.role not in first_actor:
+                first_actor[p.role] = p.id
         for i in range(start_idx, len(order)):
             next_type = order[i]
-            role_map = {"guard_protect": "guard", "wolf_kill": "werewolf", "seer_check": "seer", "witch_action": "witch"}
-            target_role = role_map[next_type]
-            actor = next((p for p in players if p.role == target_role and p.is_alive), None)
+            actor_id = first_actor.get(role_map[next_type])
             
-            if actor:
-                return {"turn_type": next_type, "current_player_id": actor.id, "parallel_player_ids": None}
+            if actor_id is not None:
+                return {"turn_type": next_type, "current_player_id": actor_id, "parallel_player_ids": None}
         
         return {"turn_type": "night_settle", "current_player_id": None, "parallel_player_ids": None}
         
     if phase == "day":
+        if turn_type == "night_settle":
+            # 夜间结算完成，进入天亮公告（死讯在此时才公开）
+            return {"turn_type": "day_announcement", "current_player_id": None, "parallel_player_ids": None}
+
         if turn_type == "day_announcement":
             # 1. 如果夜晚有人死且有遗言 (仅首夜有遗言)
             if state.get("pending_last_words"):
@@ -190,6 +157,9 @@ def game_master_node(state: GameState, config: RunnableConfig) -> Dict[str, Any]
                 return {"turn_type": "hunter_shoot", "current_player_id": state["pending_hunter_shoot"], "parallel_player_ids": None}
             if state.get("pending_sheriff_transfer"):
                 return {"turn_type": "sheriff_transfer", "current_player_id": state.get("sheriff_id"), "parallel_player_ids": None}
+            # 被处决者的遗言结束后进入处决公告（随后入夜），而不是再开一轮讨论
+            if state.get("last_execution_id") is not None:
+                return {"turn_type": "execution_announcement", "current_player_id": None, "parallel_player_ids": None}
             # 回到主流程
             return {"turn_type": "discussion", "discussion_queue": get_ordered_queue(state), "current_player_id": None, "parallel_player_ids": None}
 
@@ -206,6 +176,8 @@ def game_master_node(state: GameState, config: RunnableConfig) -> Dict[str, Any]
                  return {"turn_type": "sheriff_nomination", "discussion_queue": sorted(state["alive_players"]), "current_player_id": None, "parallel_player_ids": None}
             
             # 注意：如果是由于投票死而触发的猎人公告，应该进夜晚前的结算，而非回讨论
+            if state.get("last_execution_id") is not None:
+                return {"turn_type": "execution_announcement", "current_player_id": None, "parallel_player_ids": None}
             return {"turn_type": "discussion", "discussion_queue": get_ordered_queue(state), "current_player_id": None, "parallel_player_ids": None}
 
         elif turn_type == "sheriff_nomination" and not state["discussion_queue"]:
@@ -219,18 +191,16 @@ def game_master_node(state: GameState, config: RunnableConfig) -> Dict[str, Any]
         elif turn_type == "sheriff_discussion" and not state["discussion_queue"]:
             # 发言结束，由非上警玩家投票（并行）
             # 优化：采用“隐蔽死亡”规则，今晚死的人（尚未公布）也可以投警长
-            actually_alive = [p.id for p in state["players"] if p.is_alive]
-            candidates = state.get("election_candidates", [])
-            voters = [p_id for p_id in actually_alive if p_id not in candidates]
+            candidates = set(state.get("election_candidates", []))
+            voters = [p.id for p in state["players"] if p.is_alive and p.id not in candidates]
             if not voters:
                 # 极端情况：全员上警，全部退水或某种逻辑错误，这里兜底
                 return {"turn_type": "sheriff_settle", "current_player_id": None, "parallel_player_ids": None}
             return {"turn_type": "sheriff_voting", "discussion_queue": sorted(voters), "current_player_id": None, "parallel_player_ids": None}
             
         elif turn_type == "sheriff_voting" and not state["discussion_queue"]:
-            actually_alive = [p.id for p in state["players"] if p.is_alive]
-            candidates = state.get("election_candidates", [])
-            voters = [p_id for p_id in actually_alive if p_id not in candidates]
+            candidates = set(state.get("election_candidates", []))
+            voters = [p.id for p in state["players"] if p.is_alive and p.id not in candidates]
             actual_votes = state.get("votes", {})
             if not voters or all(v_id in actual_votes for v_id in voters):
                 return {"turn_type": "sheriff_settle", "current_player_id": None, "parallel_player_ids": None}
@@ -241,15 +211,16 @@ def game_master_node(state: GameState, config: RunnableConfig) -> Dict[str, Any]
             return {"turn_type": "sheriff_announcement", "current_player_id": None, "parallel_player_ids": None}
             
         elif turn_type == "sheriff_announcement":
-            # 公告完成后的处理
+            # 公告完成后的处理（警长竞选没有 PK 轮；清掉残留的 PK 名单，避免被当作处决 PK）
             if state["day_count"] == 1:
-                return {"turn_type": "day_announcement", "current_player_id": None, "parallel_player_ids": None}
-            return {"turn_type": "discussion", "discussion_queue": get_ordered_queue(state), "current_player_id": None, "parallel_player_ids": None}
+                return {"turn_type": "day_announcement", "pk_candidates": [], "current_player_id": None, "parallel_player_ids": None}
+            return {"turn_type": "discussion", "pk_candidates": [], "discussion_queue": get_ordered_queue(state), "current_player_id": None, "parallel_player_ids": None}
             
         elif turn_type == "pk_discussion" and not state["discussion_queue"]:
              # PK 讨论结束，进入 PK 投票
              # 正常处决 PK
-             voters = [p_id for p_id in state["alive_players"] if p_id not in state["pk_candidates"]]
+             pk_set = set(state["pk_candidates"])
+             voters = [p_id for p_id in state["alive_players"] if p_id not in pk_set]
              
              if not voters: voters = state["alive_players"] # 全员 PK 则全员投
              return {"turn_type": "pk_voting", "discussion_queue": voters, "current_player_id": None, "parallel_player_ids": None}
@@ -267,7 +238,8 @@ def game_master_node(state: GameState, config: RunnableConfig) -> Dict[str, Any]
             return {} # 继续等待其他并行节点合并
             
         elif turn_type == "pk_voting" and not state["discussion_queue"]:
-             voters = [p_id for p_id in state["alive_players"] if p_id not in state["pk_candidates"]]
+             pk_set = set(state["pk_candidates"])
+             voters = [p_id for p_id in state["alive_players"] if p_id not in pk_set]
              if not voters: voters = state["alive_players"]
              actual_votes = state.get("votes", {})
              if all(v_id in actual_votes for v_id in voters):
@@ -295,13 +267,15 @@ def game_master_node(state: GameState, config: RunnableConfig) -> Dict[str, Any]
         elif turn_type == "sheriff_transfer_announcement":
            if state.get("last_execution_id"):
                return {"turn_type": "execution_announcement", "current_player_id": None, "parallel_player_ids": None}
-           return {"turn_type": "day_announcement", "current_player_id": None, "parallel_player_ids": None}
+           # 夜间死亡的警长移交完毕：天亮公告已发布，直接进入讨论（避免重复公告）
+           return {"turn_type": "discussion", "discussion_queue": get_ordered_queue(state), "current_player_id": None, "parallel_player_ids": None}
 
         elif turn_type == "execution_announcement":
             return {
                 "phase": "night",
                 "day_count": state["day_count"] + 1,
                 "turn_type": "guard_protect",
+                "last_execution_id": None,
                 "current_player_id": None,
                 "parallel_player_ids": None
             }
@@ -317,23 +291,27 @@ def get_ordered_queue(state: GameState) -> List[int]:
     if sheriff_id is None or order_pref is None:
         return alive
     
-    # 简单的环形排序逻辑：以警长为中心
-    idx = alive.index(sheriff_id)
+    # 简单的环形排序逻辑：以警长为中心 (二分定位，警长可能已出局)
+    idx = bisect_left(alive, sheriff_id)
+    if idx == len(alive) or alive[idx] != sheriff_id:
+        return alive
     if order_pref == "clockwise":
         # 顺时针：idx+1, idx+2 ...
         return alive[idx+1:] + alive[:idx+1]
     else:
-        # 逆时针
-        rev = alive[::-1]
-        r_idx = rev.index(sheriff_id)
-        return rev[r_idx+1:] + rev[:r_idx+1]
-
-    return {}
+        # 逆时针：idx-1, idx-2 ... 最后轮到警长
+        return alive[:idx][::-1] + alive[idx:][::-1]
 
 def action_handler_node(state: GameState, config: RunnableConfig) -> Dict[str, Any]:
     """
     行动节点 (Action)：硬编码。
+    每次结算 / 公告后增量更新事实账本（长期记忆），见 `src.agent.facts`。
     """
+    updates = _settle(state)
+    return {**updates, **record_facts(state, updates)}
+
+def _settle(state: GameState) -> Dict[str, Any]:
+    """按当前环节结算行动或生成公告"""
     turn_type = state["turn_type"]
     
     if turn_type == "night_settle":
@@ -380,24 +358,17 @@ def action_handler_node(state: GameState, config: RunnableConfig) -> Dict[str, A
                 if p.id == state.get("sheriff_id"):
                     pending_sheriff_transfer = True
         
-        # 自动总结逻辑 (简易版)
-        history_str = "\n".join([f"【玩家 {m.player_id}】: {m.content}" if m.player_id else f"【系统】: {m.content}" for m in state["history"][-20:]])
-        summary_prompt = f"请用50字以内总结当前对局的关键事实（谁跳了什么，谁死了）：\n原有总结：{state.get('game_summary','')}\n最新进展：\n{history_str}"
-        try:
-            new_summary = summarizer_llm.invoke(summary_prompt).content
-        except:
-            new_summary = state.get("game_summary", "")
+        # 用过的药水作废；记录今晚的守护对象（守卫不可连守）
+        witch_potions = dict(state.get("witch_potions") or {})
+        if witch_save is not None:
+            witch_potions["save"] = False
+        if witch_poison is not None:
+            witch_potions["poison"] = False
 
         # --- 优化：首日上警自动化 ---
         if state["day_count"] == 1 and state.get("sheriff_id") is None:
             # 固定第一名存活狼人（悍跳）和预言家
-            wolves = [p.id for p in state["players"] if p.role == "werewolf" and p.is_alive]
-            seer = next((p for p in state["players"] if p.role == "seer" and p.is_alive), None)
-            candidates = []
-            if wolves:
-                candidates.append(min(wolves))
-            if seer:
-                candidates.append(seer.id)
+            candidates = first_day_candidates(state)
             
             return {
                 "players": updated_players,
@@ -410,9 +381,10 @@ def action_handler_node(state: GameState, config: RunnableConfig) -> Dict[str, A
                 "election_candidates": sorted(candidates),
                 "turn_type": "sheriff_discussion", # 跳过 nomination 直接进 discussion
                 "discussion_queue": sorted(candidates),
+                "witch_potions": witch_potions,
+                "last_guarded_id": guard_protect,
                 "night_actions": {},
                 "votes": {},
-                "game_summary": new_summary,
                 "parallel_player_ids": None
             }
 
@@ -424,9 +396,11 @@ def action_handler_node(state: GameState, config: RunnableConfig) -> Dict[str, A
             "pending_last_words": sorted(pending_last_words),
             "pending_sheriff_transfer": pending_sheriff_transfer,
             "phase": "day",
-            "game_summary": new_summary,
-            "turn_type": "sheriff_nomination" if state["day_count"] == 1 and state.get("sheriff_id") is None else "day_announcement",
+            # 保持 night_settle，由 GM 切到 day_announcement 后再交给本节点发布天亮公告
+            "turn_type": "sheriff_nomination" if state["day_count"] == 1 and state.get("sheriff_id") is None else "night_settle",
             "discussion_queue": sorted(state["alive_players"]) if state["day_count"] == 1 and state.get("sheriff_id") is None else [],
+            "witch_potions": witch_potions,
+            "last_guarded_id": guard_protect,
             "night_actions": {},
             "votes": {},
             "parallel_player_ids": None
@@ -434,15 +408,12 @@ def action_handler_node(state: GameState, config: RunnableConfig) -> Dict[str, A
         
     if turn_type == "day_announcement":
         dead_ids = state.get("last_night_dead", [])
+        dead_set = set(dead_ids)
         
         # 应用死亡状态更新 (重要：这里才是真正结算生死的地方)
-        updated_players = state["players"]
-        new_alive = list(state["alive_players"])
-        for p in updated_players:
-            if p.id in dead_ids:
-                p.is_alive = False
-                if p.id in new_alive:
-                    new_alive.remove(p.id)
+        # 写时复制：不原地修改共享的玩家对象，分叉出的多个对局可以安全共享同一份状态
+        updated_players = [p.model_copy(update={"is_alive": False}) for p in state["players"] if p.id in dead_set]
+        new_alive = [p_id for p_id in state["alive_players"] if p_id not in dead_set]
         
         # 生成公告消息
         dead_info = "平安夜" if not dead_ids else f"玩家 {', '.join(map(str, dead_ids))} 死亡"
@@ -481,11 +452,12 @@ def action_handler_node(state: GameState, config: RunnableConfig) -> Dict[str, A
         messages = [Message(role="system", content=f"【系统公告】警长投票详情：{vote_detail}")]
         
         updates = {"votes": {}, "pk_candidates": [], "turn_type": "sheriff_announcement"}
+        tied = []
         
         if not counts:
             # 无人投票的情况下，从全员上警名单中随机选一个
-            candidates = state.get("election_candidates", [])
-            winner = random.choice(candidates) if candidates else None
+            candidates = sorted(state.get("election_candidates", []))
+            winner = get_rng(state, state["day_count"], "sheriff_settle").choice(candidates) if candidates else None
             updates["sheriff_id"] = winner
         else:
             max_votes = max(counts.values())
@@ -495,15 +467,15 @@ def action_handler_node(state: GameState, config: RunnableConfig) -> Dict[str, A
                 winner = winners[0]
                 updates["sheriff_id"] = winner
             else:
-                # 平票处理：进入 PK 公告
-                updates["pk_candidates"] = winners
+                # 平票：警长竞选没有 PK 轮，无人当选
                 updates["sheriff_id"] = None
+                tied = sorted(winners)
 
         # 整合原本 announcer 的逻辑：产生结果公告
         if updates.get("sheriff_id") is not None:
             messages.append(Message(role="system", content=f"【上帝公告】玩家 {updates['sheriff_id']} 当选警长！"))
-        elif updates.get("pk_candidates"):
-            messages.append(Message(role="system", content=f"【上帝公告】警长竞选出现平票，玩家 {', '.join(map(str, updates['pk_candidates']))} 进入 PK 环节。"))
+        elif tied:
+            messages.append(Message(role="system", content=f"【上帝公告】警长竞选出现平票（玩家 {', '.join(map(str, tied))}），无人当选，本局没有警长。"))
             
         updates["history"] = messages
         return updates
@@ -548,13 +520,14 @@ def action_handler_node(state: GameState, config: RunnableConfig) -> Dict[str, A
             
             if len(winners) == 1:
                 winner = winners[0]
-                # 正常处决结算
-                updated_players = [p.model_copy(deep=True) for p in state["players"]]
+                # 正常处决结算 (仅拷贝被处决者，merge_players 按 ID 覆盖)
+                updated_players = []
                 pending_hunter = None
                 pending_sheriff_transfer = False
-                for p in updated_players:
+                for p in state["players"]:
                     if p.id == winner:
-                        p.is_alive = False
+                        p = p.model_copy(update={"is_alive": False})
+                        updated_players.append(p)
                         if p.role == "hunter" and state.get("hunter_can_shoot"):
                             pending_hunter = p.id
                         if p.id == state.get("sheriff_id"):
@@ -569,6 +542,10 @@ def action_handler_node(state: GameState, config: RunnableConfig) -> Dict[str, A
                     "pending_last_words": [winner], 
                     "pending_sheriff_transfer": pending_sheriff_transfer,
                 })
+            elif state.get("pk_candidates"):
+                # PK 后再次平票：本轮无人出局
+                updates["last_execution_id"] = None
+                messages.append(Message(role="system", content="【上帝公告】PK 投票再次平票，本轮无人出局。"))
             else:
                 # 平票处理
                 updates["pk_candidates"] = winners
@@ -588,10 +565,7 @@ def action_handler_node(state: GameState, config: RunnableConfig) -> Dict[str, A
     if turn_type == "hunter_announcement":
         shoot_target = state["night_actions"].get("hunter_shoot")
         if shoot_target:
-            updated_players = [p.model_copy(deep=True) for p in state["players"]]
-            for p in updated_players:
-                if p.id == shoot_target:
-                    p.is_alive = False
+            updated_players = [p.model_copy(update={"is_alive": False}) for p in state["players"] if p.id == shoot_target]
             new_alive = [p_id for p_id in state["alive_players"] if p_id != shoot_target]
             content = f"【上帝公告】猎人发动反击，玩家 {shoot_target} 被射杀！"
             return {
@@ -611,7 +585,8 @@ def action_handler_node(state: GameState, config: RunnableConfig) -> Dict[str, A
                 "turn_type": "hunter_announcement"
             }
 
-    if turn_type == "sheriff_transfer":
+    # GM 在警长做出决定后切到公告环节，由这里统一结算移交
+    if turn_type in ("sheriff_transfer", "sheriff_transfer_announcement"):
         transfer_target = state["night_actions"].get("sheriff_transfer")
         updates = {"pending_sheriff_transfer": False, "last_transfer_target": transfer_target, "turn_type": "sheriff_transfer_announcement", "parallel_player_ids": None}
         
@@ -629,12 +604,10 @@ def action_handler_node(state: GameState, config: RunnableConfig) -> Dict[str, A
         target_id = state["night_actions"].get("seer_check")
         if target_id:
             target_p = next(p for p in state["players"] if p.id == target_id)
-            updated_players = state["players"]
-            seer = next(p for p in updated_players if p.role == "seer")
+            seer = next(p for p in state["players"] if p.role == "seer")
             res = "狼人" if target_p.role == "werewolf" else "好人"
             msg = Message(role="system", content=f"查验反馈：{target_id}号玩家的身份是【{res}】。")
-            seer.private_history.append(msg)
-            return {"players": updated_players}
+            return {"players": [remember_private(seer, msg)]}
 
 
             
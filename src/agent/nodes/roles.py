@@ -1,10 +1,23 @@
-import os
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
+from typing import Dict, Any, Optional
+from pydantic import BaseModel
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableConfig
+from langgraph.errors import GraphBubbleUp
+from src.agent.batch import request_model_call
+from src.agent.budget import apply_budget, metered_usage
+from src.agent.opening_book import learn_opening, opening_decision
+from src.agent.configuration import Configuration
 from src.agent.state import GameState, Message, PlayerState
-from src.agent.schema import AgentOutput, NightAction
+from src.agent.schema import TurnOutputSpec, fallback_output, get_output_spec
+from src.agent.facts import render_vote_matrix
+from src.agent.memory import recent_thoughts, remember_thought
+from src.agent.model_pool import run_model_call
+from src.agent.endpoints import call_with_endpoints
+from src.agent.model_tiers import tracked_structured_call
+from src.agent.retrieval import retrieve_context
+from src.agent.streaming import SPEECH_STREAM_TURNS, SpeechStreamer, emit_speech_end, get_writer, stream_structured_call
+from src.agent.policies import get_policy, register_policy
+from src.agent.validation import Verdict, decide_validated
 from src.agent.prompts.base import (
     BASE_SYSTEM_PROMPT,
     WOLF_INSTRUCTIONS,
@@ -20,17 +33,9 @@ from src.agent.prompts.base import (
 from dotenv import load_dotenv
 from langfuse.langchain import CallbackHandler
 
-# 加载环境变量
+# 加载环境变量 (模型按分层配置懒加载，见 src.agent.model_tiers)
 load_dotenv()
 
-# 初始化 DeepSeek 模型
-llm = ChatOpenAI(
-    model="deepseek-chat", 
-    openai_api_key=os.getenv("DEEPSEEK_API_KEY"),
-    openai_api_base="https://api.deepseek.com/v1",
-    temperature=0.7
-)
-
 def get_role_instructions(player: PlayerState, state: GameState) -> str:
     
     # 基础角色指令
@@ -42,6 +47,8 @@ def get_role_instructions(player: PlayerState, state: GameState) -> str:
         instructions = VILLAGER_INSTRUCTIONS
     elif role == "seer":
         history_msgs = [m.content for m in player.private_history if m.role == "system"]
+        if player.history_digest:
+            history_msgs.insert(0, f"早前查验：{player.history_digest}")
         check_history = "\n - " + "\n - ".join(history_msgs) if history_msgs else "暂无记录"
         instructions = SEER_INSTRUCTIONS.format(check_history=check_history)
     elif role == "witch":
@@ -56,7 +63,8 @@ def get_role_instructions(player: PlayerState, state: GameState) -> str:
     elif role == "hunter":
         instructions = HUNTER_INSTRUCTIONS
     elif role == "guard":
-        instructions = GUARD_INSTRUCTIONS
+        last_guarded = state.get("last_guarded_id")
+        instructions = GUARD_INSTRUCTIONS.format(last_guarded=f"{last_guarded}号" if last_guarded is not None else "无")
     
     # 追加环节特定指令
     turn_type = state["turn_type"]
@@ -69,111 +77,195 @@ def get_role_instructions(player: PlayerState, state: GameState) -> str:
         
     return instructions
 
-def player_agent_node(state: GameState, config: RunnableConfig) -> Dict[str, Any]:
-    """
-    智能体执行节点 (Player_Agent)：LLM 驱动。
-    职责：根据当前身份、公共历史和私有想法，生成发言、内心思考或结构化动作。
-    """
-    current_id = state.get("current_player_id")
-    if current_id is None:
-        return {}
+class LLMPolicy:
+    """大模型玩家：按身份、公共历史与私有记忆构造提示词，输出结构化决策。"""
 
-    player = next(p for p in state["players"] if p.id == current_id)
-    phase = state["phase"]
-    turn_type = state["turn_type"]
+    name = "llm"
+
+    def decide(self, player: PlayerState, state: GameState, config: RunnableConfig, spec: TurnOutputSpec) -> Optional[BaseModel]:
+        phase = state["phase"]
+        turn_type = state["turn_type"]
 
-    # 构造 Prompt
-    role_instr = get_role_instructions(player, state)
-    sys_prompt = BASE_SYSTEM_PROMPT.format(
-        role=player.role,
-        player_id=player.id,
-        personality=player.personality or "理性思考",
-        role_specific_instructions=role_instr
-    )
+        # 构造 Prompt
+        role_instr = get_role_instructions(player, state)
+        sys_prompt = BASE_SYSTEM_PROMPT.format(
+            role=player.role,
+            player_id=player.id,
+            personality=player.personality or "理性思考",
+            role_specific_instructions=role_instr
+        )
     
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "{system_instructions}"),
-        ("human", "当前对局状态：\n阶段：{phase}\n环节：{turn_type}\n游戏历史大纲（长期记忆）：{game_summary}\n最近发言记录（短期记忆）：\n{history}\n你的私有想法：{private_thoughts}\n请输出你的决策。")
-    ])
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", "{system_instructions}"),
+            ("human", "当前对局状态：\n阶段：{phase}\n环节：{turn_type}\n游戏历史大纲（长期记忆）：{game_summary}\n全局票型（投票者→被投者×次数）：\n{vote_matrix}\n相关的早前发言（检索）：\n{retrieved}\n最近发言记录（短期记忆）：\n{history}\n你的私有想法：{private_thoughts}\n请输出你的决策。")
+        ])
     
-    # 结构化输出
-    if phase == "night" or turn_type in ["hunter_shoot", "sheriff_transfer"]:
-        structured_llm = llm.with_structured_output(NightAction, method="function_calling")
-    else:
-        structured_llm = llm.with_structured_output(AgentOutput, method="function_calling")
+        configuration = Configuration.from_runnable_config(config)
         
-    # 构造历史字符串：显示玩家 ID 而非角色名，防止混淆发言者
-    history_lines = []
-    for m in state["history"][-20:]: # 稍微增加记忆长度
-        prefix = f"【玩家 {m.player_id}】" if m.player_id else "【系统公告】"
-        history_lines.append(f"{prefix}: {m.content}")
-    history_str = "\n".join(history_lines)
+        # 构造历史字符串：显示玩家 ID 而非角色名，防止混淆发言者
+        history_lines = []
+        for m in state["history"][-configuration.history_window:]:
+            prefix = f"【玩家 {m.player_id}】" if m.player_id else "【系统公告】"
+            history_lines.append(f"{prefix}: {m.content}")
+        history_str = "\n".join(history_lines)
+        # 窗口之外的早前发言按相关度检索补回（本地 BM25 索引，不访问外部服务）
+        retrieved_str = retrieve_context(state, config, configuration.retrieval_top_k, configuration.history_window)
     
-    private_thoughts_str = "\n".join(player.private_thoughts[-5:])
+        private_thoughts_str = recent_thoughts(player)
     
-    # Langfuse 局部观测
-    langfuse_handler = CallbackHandler()
+        # Langfuse 局部观测
+        langfuse_handler = CallbackHandler()
     
-    # 翻译环节名称，减少 AI 混淆
-    type_map = {
-        "night": "夜晚",
-        "day": "白天",
-        "wolf_kill": "狼人杀人",
-        "seer_check": "预言家验人",
-        "witch_action": "女巫行动",
-        "guard_action": "守卫行动",
-        "day_announcement": "天亮公告",
-        "sheriff_nomination": "警长竞选报名",
-        "sheriff_discussion": "警长竞选发言",
-        "sheriff_voting": "警长投票",
-        "sheriff_settle": "警长产生结果公布",
-        "discussion": "自由发言",
-        "voting": "处决投票",
-        "voting_settle": "处决结果公布",
-        "last_words": "发表遗言",
-        "pk_discussion": "PK发言",
-        "pk_voting": "PK投票"
-    }
-    cn_phase = type_map.get(phase, phase)
-    cn_turn_type = type_map.get(turn_type, turn_type)
+        # 翻译环节名称，减少 AI 混淆
+        type_map = {
+            "night": "夜晚",
+            "day": "白天",
+            "wolf_kill": "狼人杀人",
+            "seer_check": "预言家验人",
+            "witch_action": "女巫行动",
+            "guard_action": "守卫行动",
+            "day_announcement": "天亮公告",
+            "sheriff_nomination": "警长竞选报名",
+            "sheriff_discussion": "警长竞选发言",
+            "sheriff_voting": "警长投票",
+            "sheriff_settle": "警长产生结果公布",
+            "discussion": "自由发言",
+            "voting": "处决投票",
+            "voting_settle": "处决结果公布",
+            "last_words": "发表遗言",
+            "pk_discussion": "PK发言",
+            "pk_voting": "PK投票"
+        }
+        cn_phase = type_map.get(phase, phase)
+        cn_turn_type = type_map.get(turn_type, turn_type)
 
-    # 执行调用
-    chain = prompt | structured_llm
-    try:
-        response = chain.invoke({
+        prompt_value = prompt.invoke({
             "system_instructions": sys_prompt,
             "phase": cn_phase,
             "turn_type": cn_turn_type,
             "game_summary": state.get("game_summary", ""),
+            "vote_matrix": render_vote_matrix(state.get("vote_matrix")),
+            "retrieved": retrieved_str,
             "history": history_str,
             "private_thoughts": private_thoughts_str
-        }, config={"callbacks": [langfuse_handler]})
-    except Exception as e:
-        print(f"Error calling LLM: {e}")
-        response = None
+        })
+        stream = configuration.stream_speech and turn_type in SPEECH_STREAM_TURNS
+        return self._generate(player, state, config, spec, prompt_value, stream, callbacks=[langfuse_handler])
 
-    # 处理 None 响应（兜底逻辑）
-    if response is None:
-        if phase == "night" or turn_type in ["hunter_shoot", "sheriff_transfer"]:
-            response = NightAction(thought="系统异常，选择跳过行动。", action_type="pass", target_id=None)
+    def reask(self, player: PlayerState, state: GameState, config: RunnableConfig, spec: TurnOutputSpec, verdict: Verdict) -> Optional[BaseModel]:
+        """输出不合法且无法本地修复时的一次简短重问：只带身份、错误原因与合法选项"""
+        prompt_value = REASK_PROMPT.invoke({
+            "role": player.role,
+            "player_id": player.id,
+            "turn_type": state["turn_type"],
+            "reason": verdict.reason or "输出不合法",
+            "options": verdict.options or "请按输出结构重新给出",
+        })
+        short_spec = spec.model_copy(update={"max_tokens": min(spec.max_tokens, REASK_MAX_TOKENS)})
+        return self._generate(player, state, config, short_spec, prompt_value, stream=False, callbacks=[CallbackHandler()])
+
+    def _generate(
+        self, player: PlayerState, state: GameState, config: RunnableConfig, spec: TurnOutputSpec, prompt_value: Any, stream: bool, callbacks: list
+    ) -> Optional[BaseModel]:
+        turn_type = state["turn_type"]
+        # 模型分层：按角色与环节路由到对应层级的模型
+        configuration = Configuration.from_runnable_config(config)
+        tier = configuration.resolve_tier(player.role, turn_type)
+        tier_params = configuration.tier_params(tier)
+        call_config = {"callbacks": callbacks}
+
+        # 离线批处理：在模型调用前沿暂停对局，由 BatchRunner 合批提交后恢复（见 `src.agent.batch`）
+        if configuration.batch_mode:
+            try:
+                return request_model_call(config, tier, tier_params, spec.output_schema, prompt_value, spec.max_tokens, player.id)
+            except GraphBubbleUp:
+                raise
+            except Exception as e:
+                print(f"Error in batch LLM call: {e}")
+                return None
+
+        # 串行发言环节边生成边推送 speech（自定义流事件），其余环节一次性生成
+        writer = get_writer() if stream else None
+        if writer is not None:
+            streamer = SpeechStreamer(writer, player.id, turn_type, state.get("day_count"))
+            invoke = lambda llm: stream_structured_call(llm, spec.output_schema, prompt_value, streamer, call_config)  # noqa: E731
         else:
-            response = AgentOutput(thought="思考中...", speech="我暂时没有什么想说的。", action=None, target_id=None)
+            invoke = lambda llm: llm.with_structured_output(spec.output_schema, method="function_calling", include_raw=True).invoke(prompt_value, config=call_config)  # noqa: E731
+        # 层级配置了多个端点时在端点间均衡，端点失败自动转移（见 `src.agent.endpoints`）
+        generate = lambda: call_with_endpoints(config, tier_params, spec.max_tokens, invoke)  # noqa: E731
+
+        # 执行调用 (多桌托管时经共享模型池调度，按层级记录延迟与用量)
+        try:
+            return run_model_call(config, lambda: tracked_structured_call(config, tier, tier_params, generate), player_id=player.id)
+        except Exception as e:
+            print(f"Error calling LLM: {e}")
+            return None
+
+# 重问提示词：不再携带历史与记忆，只说明哪里不合法、可以怎么选
+REASK_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "你是狼人杀玩家 {player_id}号，身份：{role}。当前环节：{turn_type}。"),
+    ("human", "你刚才的决策不合法：{reason}。\n合法选项：{options}\n请只在合法选项中重新决策，思考从简。"),
+])
+REASK_MAX_TOKENS = 256
+
+register_policy(LLMPolicy())
+
+def player_agent_node(state: GameState, config: RunnableConfig) -> Dict[str, Any]:
+    """
+    智能体执行节点 (Player_Agent)：按座位派发给大模型或规则机器人。
+    职责：根据当前身份、公共历史和私有想法，生成发言、内心思考或结构化动作。
+    """
+    current_id = state.get("current_player_id")
+    if current_id is None:
+        return {}
+
+    player = next(p for p in state["players"] if p.id == current_id)
+    phase = state["phase"]
+    turn_type = state["turn_type"]
+
+    # 结构化输出：按环节选择输出结构与 token 上限（投票 / 报名环节不生成发言）
+    spec = get_output_spec(phase, turn_type, is_sheriff=player.id == state.get("sheriff_id"))
+
+    # 按座位派发给决策后端（大模型 / 规则机器人）
+    # 超出单局预算时降级：缩短上下文、改走便宜层级或交给规则机器人（见 `src.agent.budget`）
+    seat_policy = Configuration.from_runnable_config(config).resolve_policy(player.id)
+    config, budget_level = apply_budget(config, state)
+
+    # 输出先按当前局面的规则校验：能本地修复的就地修复，否则重问一次（见 `src.agent.validation`）
+    policy = get_policy(Configuration.from_runnable_config(config).resolve_policy(player.id))
+    with metered_usage() as usage:
+        # 首日的常见局面先查开局库，命中则不调用模型（见 `src.agent.opening_book`）
+        response = opening_decision(player, state, config, spec) if policy.name == "llm" else None
+        if response is None:
+            response = decide_validated(policy, player, state, config, spec)
+            if policy.name == "llm":
+                learn_opening(player, state, config, response)
+
+    # 仍不合法 / 调用失败时兜底
+    if response is None:
+        response = fallback_output(spec.output_schema)
     
     # 更新 Player 私有状态
     # 为了并行合并，只返回被修改的玩家对象
-    current_player = next(p for p in state["players"] if p.id == current_id)
-    # 使用 model_copy 确保在并行环境下状态隔离
-    new_player = current_player.model_copy(deep=True)
-    new_player.private_thoughts.append(response.thought)
+    # 写时复制确保在并行环境下状态隔离；私有记忆有上限，旧想法压缩进摘要
+    new_player = remember_thought(player, response.thought, day=state.get("day_count"))
             
     updates: Dict[str, Any] = {
         "players": [new_player],
         "last_thought": response.thought,
-        "last_action": response.action if hasattr(response, 'action') else (response.action_type if hasattr(response, 'action_type') else None),
-        "last_target": response.target_id if hasattr(response, 'target_id') else None
+        "last_action": getattr(response, "action", None) or getattr(response, "action_type", None),
+        "last_target": getattr(response, "target_id", None)
     }
+    if usage:
+        updates["token_usage"] = usage
+    if budget_level != "ok" and seat_policy == "llm":
+        updates["budget_degraded"] = {budget_level: 1}
     
-    if phase == "night" or turn_type == "hunter_shoot":
+    if turn_type == "witch_action":
+        # 女巫的解药 / 毒药分别记录，供夜间结算与药水消耗使用
+        key = {"save": "witch_save", "poison": "witch_poison"}.get(response.action_type, turn_type)
+        updates["night_actions"] = {key: response.target_id}
+    elif phase == "night" or turn_type == "hunter_shoot":
         updates["night_actions"] = {turn_type: response.target_id}
     elif turn_type == "sheriff_transfer":
         # 复用 night_actions 存储移交决策
@@ -183,14 +275,17 @@ def player_agent_node(state: GameState, config: RunnableConfig) -> Dict[str, Any
         # 白天发言 (仅在非并行环节且有发言内容时记录)
         # 并行环节（如投票、上警报名）仅执行决策和内心思考，不产生公屏发言
         parallel_types = ["voting", "pk_voting", "sheriff_nomination", "sheriff_voting"]
-        if response.speech and turn_type not in parallel_types:
-            msg = Message(role=player.role, content=response.speech, player_id=player.id)
+        speech = getattr(response, "speech", None)
+        if speech and turn_type not in parallel_types:
+            msg = Message(role=player.role, content=speech, player_id=player.id)
             updates["history"] = [msg] 
+        if turn_type in SPEECH_STREAM_TURNS:
+            # 通知观战端本段发言结束；完整发言随本节点的返回值一次性提交
+            emit_speech_end(get_writer(), player.id, turn_type, state.get("day_count"), speech or "")
         
         # 处理投票 (含 PK 投票)
         if turn_type in ["voting", "pk_voting"]:
-            target_id = response.target_id if hasattr(response, 'target_id') else None
-            updates["votes"] = {player.id: target_id}
+            updates["votes"] = {player.id: getattr(response, "target_id", None)}
 
         # 处理警长竞选
         if turn_type == "sheriff_nomination":
@@ -208,12 +303,11 @@ def player_agent_node(state: GameState, config: RunnableConfig) -> Dict[str, Any
 
         # 处理投警长
         if turn_type == "sheriff_voting":
-            target_id = response.target_id if hasattr(response, 'target_id') else None
-            updates["votes"] = {player.id: target_id}
+            updates["votes"] = {player.id: getattr(response, "target_id", None)}
 
         # 处理发言顺序指定 (警长权力)
         if turn_type == "discussion" and player.id == state.get("sheriff_id"):
-            if response.action in ["clockwise", "counter_clockwise"]:
+            if getattr(response, "action", None) in ["clockwise", "counter_clockwise"]:
                 updates["speech_order_preference"] = response.action
 
     return updates
@@ -0,0 +1,323 @@
+"""开局库：复用录制对局中的首日决策与发言。
+
+首夜已由规则自动化（见 `policies.first_night_actions`），但首日的上警发言（狼人悍跳、
+预言家首验报告）、警长投票、遗言、首轮发言与投票每局都要付出完整的大模型延迟，
+而这些局面在同一板子下高度重复。开局库把这些决策按
+
+    (身份, 性格, 环节, 规范化的公开事实)
+
+存起来，后续对局命中时直接取用，不再调用模型。
+
+规范化：座位号换成相对标签——自己 `self`、狼队友 `mate0..`、查验过的人 `chk0..`、
+警长 `sheriff`、上警候选人 `cand0..`、PK 候选人 `pk0..`、昨夜死亡 `dead0..`、
+起跳 / 报验涉及的玩家 `clm0..` / `ref0..`（同类按座位号排序）。公开事实（人数、死亡、
+候选人、身份声明与报出的查验、自己的查验结果）也用标签表示；输出中的目标与发言里
+出现的“N号”同样换成标签存储，取用时按当前对局的座位映射回去。发言里提到无法标注的
+座位时该输出不入库。取出的决策仍经过 `validation` 校验，不合法时视为未命中。
+
+多样性控制：每个键最多保留 `max_variants` 个变体；变体数不足 `min_variants` 时不取用；
+命中后以 `serve_rate` 的概率取用（其余照常调用模型并入库，持续补充变体）；
+变体与是否取用都由对局种子决定，录制的对局可以重放（取用的决策记入磁带）。
+
+构建：`build_opening_book(["games/g1.jsonl", ...])` 在无网络的情况下重放录制的对局并收录
+其中的开局决策；也可以在线对局中开启 `learn` 边打边收录。
+
+示例：
+    book = build_opening_book(glob.glob("games/*.jsonl"))
+    book.save("books/classic_12.jsonl")
+    host = GameHost(opening_book=OpeningBook.load("books/classic_12.jsonl"))
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.runnables import Runnable, RunnableConfig
+from pydantic import BaseModel
+
+from src.agent import schema
+from src.agent.facts import parse_claim
+from src.agent.memory import check_results
+from src.agent.replay import ModelTape, get_model_tape
+from src.agent.schema import TurnOutputSpec
+from src.agent.state import GameState, PlayerState
+from src.agent.validation import validate_output
+from src.utils.helpers import get_rng
+
+# 开局库覆盖的环节（首夜已由规则自动化）
+OPENING_TURNS = frozenset({
+    "sheriff_nomination", "sheriff_discussion", "sheriff_voting", "last_words", "discussion", "voting", "pk_discussion", "pk_voting",
+})
+DEFAULT_MAX_VARIANTS = 4
+
+_SEAT_MENTION = re.compile(r"(\d+)号")
+_LABEL_MENTION = re.compile(r"\{(\w+)\}号")
+_TEXT_FIELDS = ("thought", "speech")
+
+
+@dataclass
+class OpeningBookStats:
+    """开局库的命中统计"""
+
+    hits: int = 0
+    misses: int = 0
+    learned: int = 0
+    rejected: int = 0  # 无法规范化（提到无法标注的座位）而未入库
+
+
+def seat_labels(player: PlayerState, state: GameState) -> Dict[int, str]:
+    """当前局面下座位号到相对标签的映射（先到先得）"""
+    labels: Dict[int, str] = {player.id: "self"}
+
+    def assign(prefix: str, seats: Iterable[int]) -> None:
+        for i, seat in enumerate(sorted(s for s in set(seats) if s not in labels)):
+            labels[seat] = f"{prefix}{i}"
+
+    if player.role == "werewolf":
+        assign("mate", (p.id for p in state["players"] if p.role == "werewolf"))
+    if player.role == "seer":
+        assign("chk", check_results(player))
+    if state.get("sheriff_id") is not None and state["sheriff_id"] not in labels:
+        labels[state["sheriff_id"]] = "sheriff"
+    assign("cand", state.get("election_candidates") or [])
+    assign("pk", state.get("pk_candidates") or [])
+    assign("dead", state.get("last_night_dead") or [])
+    claims = public_claims(state)
+    assign("clm", claims)
+    assign("ref", (t for claim in claims.values() for t in claim["checks"]))
+    return labels
+
+
+def public_claims(state: GameState) -> Dict[int, Dict[str, Any]]:
+    """公屏发言中的身份声明与报出的查验（开局阶段历史很短，直接扫描）"""
+    claims: Dict[int, Dict[str, Any]] = {}
+    for m in state["history"]:
+        if m.player_id is None:
+            continue
+        claim = parse_claim(m.content)
+        if claim is not None:
+            prev = claims.get(m.player_id)
+            checks = {**prev["checks"], **claim["checks"]} if prev and prev["role"] == claim["role"] else claim["checks"]
+            claims[m.player_id] = {"role": claim["role"], "checks": checks}
+    return claims
+
+
+def opening_key(player: PlayerState, state: GameState, labels: Dict[int, str]) -> str:
+    """开局库键：(身份, 性格, 环节, 规范化的公开事实)"""
+    label = lambda seat: labels.get(seat, "other")  # noqa: E731
+    facts = {
+        "n": len(state["players"]),
+        "alive": len(state["alive_players"]),
+        "dead": sorted(label(s) for s in state.get("last_night_dead") or []),
+        "cands": sorted(label(s) for s in state.get("election_candidates") or []),
+        "pk": sorted(label(s) for s in state.get("pk_candidates") or []),
+        "sheriff": label(state["sheriff_id"]) if state.get("sheriff_id") is not None else None,
+        "checks": sorted((label(s), res) for s, res in check_results(player).items()) if player.role == "seer" else [],
+        "claims": sorted(
+            (label(pid), claim["role"], sorted((label(t), res) for t, res in claim["checks"].items()))
+            for pid, claim in public_claims(state).items()
+        ),
+    }
+    return json.dumps([player.role, player.personality, state["turn_type"], facts], ensure_ascii=False, sort_keys=True)
+
+
+def _template(output: BaseModel, labels: Dict[int, str]) -> Optional[Dict[str, Any]]:
+    """把输出中的座位号换成标签；出现无法标注的座位时返回 None"""
+    data = output.model_dump(mode="json")
+    target = data.get("target_id")
+    if target is not None:
+        if target not in labels:
+            return None
+        data["target_id"] = labels[target]
+    for name in _TEXT_FIELDS:
+        text = data.get(name)
+        if not text:
+            continue
+        seats = {int(s) for s in _SEAT_MENTION.findall(text)}
+        if any(s not in labels for s in seats):
+            return None
+        data[name] = _SEAT_MENTION.sub(lambda m: f"{{{labels[int(m.group(1))]}}}号", text.replace("{", "(").replace("}", ")"))
+    return data
+
+
+def _instantiate(type_: str, data: Dict[str, Any], labels: Dict[int, str]) -> Optional[BaseModel]:
+    """按当前对局的座位映射把标签换回座位号；需要的标签不存在时返回 None"""
+    seats = {label: seat for seat, label in labels.items()}
+    filled = dict(data)
+    target = filled.get("target_id")
+    if target is not None:
+        if target not in seats:
+            return None
+        filled["target_id"] = seats[target]
+    for name in _TEXT_FIELDS:
+        text = filled.get(name)
+        if not text:
+            continue
+        if any(label not in seats for label in _LABEL_MENTION.findall(text)):
+            return None
+        filled[name] = _LABEL_MENTION.sub(lambda m: f"{seats[m.group(1)]}号", text)
+    cls = getattr(schema, type_, None)
+    if not (isinstance(cls, type) and issubclass(cls, BaseModel)):
+        return None
+    return cls.model_validate(filled)
+
+
+class OpeningBook:
+    """开局决策库（线程安全）。"""
+
+    def __init__(
+        self,
+        max_variants: int = DEFAULT_MAX_VARIANTS,
+        min_variants: int = 1,
+        serve_rate: float = 1.0,
+        max_day: int = 1,
+        learn: bool = False,
+    ) -> None:
+        self.max_variants = max_variants
+        self.min_variants = min_variants
+        self.serve_rate = serve_rate
+        self.max_day = max_day
+        self.learn = learn
+        self.serve = True
+        self.entries: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        self.stats = OpeningBookStats()
+        self._lock = threading.Lock()
+
+    def covers(self, state: GameState) -> bool:
+        """当前环节是否属于开局"""
+        return state["day_count"] <= self.max_day and state["turn_type"] in OPENING_TURNS
+
+    def lookup(self, player: PlayerState, state: GameState) -> Optional[BaseModel]:
+        """按当前局面取一个变体；未命中（或按 `serve_rate` 不取用）时返回 None"""
+        if not self.serve or not self.covers(state):
+            return None
+        labels = seat_labels(player, state)
+        with self._lock:
+            variants = list(self.entries.get(opening_key(player, state, labels), []))
+        rng = get_rng(state, state["day_count"], state["turn_type"], "opening_book", player.id)
+        output = None
+        if len(variants) >= max(self.min_variants, 1) and rng.random() < self.serve_rate:
+            output = _instantiate(*rng.choice(variants), labels)
+        with self._lock:
+            if output is None:
+                self.stats.misses += 1
+            else:
+                self.stats.hits += 1
+        return output
+
+    def add(self, player: PlayerState, state: GameState, output: BaseModel) -> bool:
+        """收录一个开局决策；重复或无法规范化时返回 False"""
+        if not self.covers(state):
+            return False
+        labels = seat_labels(player, state)
+        data = _template(output, labels)
+        with self._lock:
+            if data is None:
+                self.stats.rejected += 1
+                return False
+            variants = self.entries.setdefault(opening_key(player, state, labels), [])
+            entry = (type(output).__name__, data)
+            if entry in variants or len(variants) >= self.max_variants:
+                return False
+            variants.append(entry)
+            self.stats.learned += 1
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(v) for v in self.entries.values())
+
+    def save(self, path: str) -> None:
+        """保存为 JSONL：每行一个变体"""
+        with self._lock:
+            items = sorted(self.entries.items())
+        with open(path, "w", encoding="utf-8") as f:
+            for key, variants in items:
+                for type_, data in variants:
+                    f.write(json.dumps({"key": key, "type": type_, "data": data}, ensure_ascii=False) + "\n")
+
+    @classmethod
+    def load(cls, path: str, **kwargs: Any) -> OpeningBook:
+        """从 JSONL 文件加载"""
+        book = cls(**kwargs)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    variants = book.entries.setdefault(item["key"], [])
+                    if len(variants) < book.max_variants:
+                        variants.append((item["type"], item["data"]))
+        return book
+
+    def report(self) -> str:
+        """文本形式的命中统计"""
+        s = self.stats
+        total = s.hits + s.misses
+        rate = s.hits / total if total else 0.0
+        return f"开局库：{len(self.entries)} 个局面 / {len(self)} 个变体，命中 {s.hits}/{total}（{rate:.0%}），新收录 {s.learned}，未入库 {s.rejected}"
+
+
+def get_opening_book(config: Optional[RunnableConfig]) -> Optional[OpeningBook]:
+    """从 config 中获取开局库，未配置时返回 None"""
+    configurable = (config or {}).get("configurable") or {}
+    book: Any = configurable.get("opening_book")
+    return book if isinstance(book, OpeningBook) else None
+
+
+def opening_decision(player: PlayerState, state: GameState, config: RunnableConfig, spec: TurnOutputSpec) -> Optional[BaseModel]:
+    """大模型座位的开局库决策；未命中返回 None。
+
+    录制对局时取用的决策记入磁带，重放时即使没有配置开局库也按磁带还原。
+    """
+    book = get_opening_book(config)
+
+    def lookup() -> Optional[BaseModel]:
+        output = book.lookup(player, state) if book is not None else None
+        if not isinstance(output, spec.output_schema):
+            return None
+        verdict = validate_output(output, state, player, spec)
+        return verdict.output if verdict.ok else None
+
+    tape = get_model_tape(config)
+    if tape is None:
+        return lookup()
+    return tape.call_optional(config, lookup, kind="opening_book", player_id=player.id)
+
+
+def learn_opening(player: PlayerState, state: GameState, config: RunnableConfig, output: Optional[BaseModel]) -> None:
+    """开启 `learn` 时收录一个大模型座位的开局决策"""
+    book = get_opening_book(config)
+    if book is not None and book.learn and output is not None:
+        book.add(player, state, output)
+
+
+def build_opening_book(
+    paths: Iterable[str], book: Optional[OpeningBook] = None, *, graph: Optional[Runnable] = None, recursion_limit: int = 2000
+) -> OpeningBook:
+    """无网络重放录制的对局（见 `replay`），收录其中大模型座位的开局决策"""
+    if graph is None:
+        from src.agent.graph import graph as default_graph
+
+        graph = default_graph
+    book = book or OpeningBook()
+    learn, serve = book.learn, book.serve
+    book.learn, book.serve = True, False
+    try:
+        for path in paths:
+            tape = ModelTape.load(path)
+            game_id = tape.game_id or f"seed-{tape.seed}"
+            config: RunnableConfig = {
+                "recursion_limit": recursion_limit,
+                "configurable": {
+                    "thread_id": game_id, **tape.configurable, "game_id": game_id, "seed": tape.seed,
+                    "model_tape": tape, "opening_book": book,
+                },
+            }
+            graph.invoke({}, config)
+    finally:
+        book.learn, book.serve = learn, serve
+    return book
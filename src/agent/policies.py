@@ -0,0 +1,227 @@
+"""玩家决策策略 (Player Policy)。
+
+`player_agent_node` 按座位把每次决策派发给一个策略后端：
+- `llm`：提示词 + 结构化输出的大模型玩家（定义在 `nodes/roles.py`）；
+- `bot`：本模块中的规则机器人，零延迟、不访问网络，结果由对局种子决定。
+
+通过 `configurable` 选择：`player_policy` 设置默认后端，`seat_policies` 按座位覆盖，
+例如 `{"player_policy": "bot", "seat_policies": {3: "llm"}}` 得到只有 3 号是大模型的混合桌。
+全机器人对局可用于引擎压测和策略基线，速度比大模型对局快几个数量级。
+
+首夜自动化（狼人随机刀、守卫自守、预言家验下一位、女巫必救）与首日上警候选人
+同样是规则策略，放在这里由引擎调用。
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel
+
+from src.agent.memory import check_results
+from src.agent.schema import (
+    AgentOutput,
+    DiscussionOutput,
+    NightAction,
+    NominationOutput,
+    TurnOutputSpec,
+    VotingOutput,
+)
+from src.agent.state import GameState, Message, PlayerState
+from src.utils.helpers import get_rng
+
+
+class PlayerPolicy(Protocol):
+    """玩家决策后端：返回符合 `spec.output_schema` 的结构化输出，失败时返回 None 走兜底"""
+
+    name: str
+
+    def decide(
+        self, player: PlayerState, state: GameState, config: RunnableConfig, spec: TurnOutputSpec
+    ) -> Optional[BaseModel]:
+        ...
+
+
+_POLICIES: Dict[str, PlayerPolicy] = {}
+
+
+def register_policy(policy: PlayerPolicy) -> PlayerPolicy:
+    """注册（或替换）一个策略后端"""
+    _POLICIES[policy.name] = policy
+    return policy
+
+
+def get_policy(name: str) -> PlayerPolicy:
+    """按名称取得策略后端；未注册时抛出 ValueError"""
+    if name not in _POLICIES:
+        raise ValueError(f"未知玩家策略：{name}，可选：{sorted(_POLICIES)}")
+    return _POLICIES[name]
+
+
+# --- 首夜 / 首日规则（引擎调用） ---
+
+def first_night_actions(state: GameState) -> Tuple[Dict[str, Optional[int]], Optional[Tuple[PlayerState, Message]]]:
+    """首夜的固定行动，返回 (night_actions, (预言家, 查验反馈) 或 None)"""
+    players = state["players"]
+    alive_ids = state["alive_players"]
+    role_by_id = {p.id: p.role for p in players}
+    night_actions: Dict[str, Optional[int]] = {}
+
+    # 1. 狼人随机刀一个非狼玩家
+    wolves = {p.id for p in players if p.role == "werewolf" and p.is_alive}
+    non_wolves = [p_id for p_id in alive_ids if p_id not in wolves]
+    wolf_kill = get_rng(state, state["day_count"], "wolf_kill").choice(non_wolves) if non_wolves else None
+    night_actions["wolf_kill"] = wolf_kill
+
+    # 2. 守卫固定守自己
+    guard = next((p for p in players if p.role == "guard" and p.is_alive), None)
+    night_actions["guard_protect"] = guard.id if guard else None
+
+    # 3. 预言家验下一位（环形）
+    seer = next((p for p in players if p.role == "seer" and p.is_alive), None)
+    feedback = None
+    if seer:
+        alive_sorted = sorted(alive_ids)
+        idx = bisect_left(alive_sorted, seer.id)
+        seer_check = alive_sorted[(idx + 1) % len(alive_sorted)]
+        night_actions["seer_check"] = seer_check
+        res = "狼人" if role_by_id[seer_check] == "werewolf" else "好人"
+        feedback = (seer, Message(role="system", content=f"查验反馈：{seer_check}号玩家的身份是【{res}】。"))
+
+    # 4. 女巫肯定救人
+    witch = next((p for p in players if p.role == "witch" and p.is_alive), None)
+    if witch and state["witch_potions"].get("save"):
+        night_actions["witch_save"] = wolf_kill
+    return night_actions, feedback
+
+
+def first_day_candidates(state: GameState) -> List[int]:
+    """首日上警候选人：第一名存活狼人（悍跳）与预言家"""
+    wolves = [p.id for p in state["players"] if p.role == "werewolf" and p.is_alive]
+    seer = next((p for p in state["players"] if p.role == "seer" and p.is_alive), None)
+    candidates = []
+    if wolves:
+        candidates.append(min(wolves))
+    if seer:
+        candidates.append(seer.id)
+    return sorted(candidates)
+
+
+# --- 规则机器人 ---
+
+_SEER_CLAIM = re.compile(r"查验(\d+)号是狼人")
+
+
+class HeuristicBotPolicy:
+    """规则机器人：只使用该座位可见的信息（自身身份、狼队友、查验结果、公屏发言）。
+
+    - 夜晚：狼人优先刀跳预言家的玩家，守卫守警长（不连守），预言家验未验过的人，女巫有解药就救；
+    - 上警：预言家与第一名狼人上警；
+    - 发言：预言家报查验，其余玩家表态并点一名怀疑对象；
+    - 投票：优先投已知 / 被报出的狼人，否则随机投一名其他存活玩家（狼人不投队友）。
+    随机选择由对局种子、天数、环节与座位派生，同一对局可以完全复现。
+    """
+
+    name = "bot"
+
+    def decide(
+        self, player: PlayerState, state: GameState, config: RunnableConfig, spec: TurnOutputSpec
+    ) -> Optional[BaseModel]:
+        turn_type = state["turn_type"]
+        rng = get_rng(state, state["day_count"], turn_type, player.id)
+        wolves = {p.id for p in state["players"] if p.role == "werewolf"} if player.role == "werewolf" else set()
+        checks = check_results(player) if player.role == "seer" else {}
+        others = [p_id for p_id in state["alive_players"] if p_id != player.id]
+        suspects = [p_id for p_id in others if p_id not in wolves and checks.get(p_id) != "好人"] or others
+        known_wolves = [p_id for p_id in others if checks.get(p_id) == "狼人" or p_id in self._claimed_wolves(state)]
+        known_wolves = [p_id for p_id in known_wolves if p_id not in wolves]
+        target = known_wolves[0] if known_wolves else (rng.choice(suspects) if suspects else None)
+        schema = spec.output_schema
+
+        if schema is NightAction:
+            return self._night_action(player, state, rng, others, wolves, checks)
+        if schema is NominationOutput:
+            alive_wolves = wolves & set(state["alive_players"])
+            run = player.role == "seer" or (player.role == "werewolf" and player.id == min(alive_wolves))
+            return NominationOutput(thought="规则：预言家与首狼上警", action="run" if run else "not_run")
+        if schema is VotingOutput:
+            pool = self._vote_pool(state, player, others)
+            choice = target if target in pool else (rng.choice(pool) if pool else None)
+            return VotingOutput(thought="规则投票", target_id=choice)
+        speech = self._speech(player, checks, target)
+        if schema is DiscussionOutput:
+            return DiscussionOutput(thought="规则发言", speech=speech)
+        return AgentOutput(thought="规则发言", speech=speech, action=None, target_id=target)
+
+    @staticmethod
+    def _claimed_wolves(state: GameState) -> List[int]:
+        claimed = []
+        for m in state["history"][-40:]:
+            if m.player_id is not None:
+                claimed.extend(int(x) for x in _SEER_CLAIM.findall(m.content))
+        return claimed
+
+    @staticmethod
+    def _vote_pool(state: GameState, player: PlayerState, others: List[int]) -> List[int]:
+        turn_type = state["turn_type"]
+        if turn_type == "sheriff_voting":
+            return sorted(c for c in state.get("election_candidates", []) if c != player.id)
+        if turn_type == "pk_voting":
+            return sorted(c for c in state.get("pk_candidates", []) if c != player.id)
+        return others
+
+    @staticmethod
+    def _speech(player: PlayerState, checks: Dict[int, str], target: Optional[int]) -> str:
+        if player.role == "seer" and checks:
+            reports = "，".join(f"查验{pid}号是{res}" for pid, res in sorted(checks.items()))
+            return f"我是预言家，{reports}。"
+        if target is None:
+            return "我是好人，过。"
+        return f"我是好人，我怀疑{target}号。"
+
+    def _night_action(
+        self,
+        player: PlayerState,
+        state: GameState,
+        rng: Any,
+        others: List[int],
+        wolves: set,
+        checks: Dict[int, str],
+    ) -> NightAction:
+        turn_type = state["turn_type"]
+        if turn_type == "wolf_kill":
+            prey = [p_id for p_id in others if p_id not in wolves]
+            seer_claims = [m.player_id for m in state["history"] if m.player_id in prey and "我是预言家" in m.content]
+            target = seer_claims[-1] if seer_claims else (rng.choice(prey) if prey else None)
+            return NightAction(thought="规则刀人", action_type="kill" if target else "pass", target_id=target)
+        if turn_type == "guard_protect":
+            # 优先守警长，其次自守；不可连守同一人
+            sheriff = state.get("sheriff_id")
+            last = state.get("last_guarded_id")
+            choices = [p_id for p_id in (sheriff, player.id) if p_id in state["alive_players"] and p_id != last]
+            target = choices[0] if choices else None
+            return NightAction(thought="规则守护", action_type="protect" if target is not None else "pass", target_id=target)
+        if turn_type == "seer_check":
+            unchecked = [p_id for p_id in others if p_id not in checks]
+            target = rng.choice(unchecked) if unchecked else None
+            return NightAction(thought="规则查验", action_type="check" if target else "pass", target_id=target)
+        if turn_type == "witch_action":
+            killed = state.get("night_actions", {}).get("wolf_kill")
+            if killed is not None and state["witch_potions"].get("save"):
+                return NightAction(thought="规则用解药", action_type="save", target_id=killed)
+            return NightAction(thought="规则不用药", action_type="pass", target_id=None)
+        if turn_type == "hunter_shoot":
+            voters = [v for v, t in state.get("votes", {}).items() if t == player.id and v in others]
+            target = rng.choice(sorted(voters)) if voters else None
+            return NightAction(thought="规则开枪", action_type="shoot" if target else "pass", target_id=target)
+        if turn_type == "sheriff_transfer":
+            goods = [p_id for p_id in others if checks.get(p_id) == "好人"] or others
+            target = rng.choice(goods) if goods else None
+            return NightAction(thought="规则移交警徽", action_type="transfer_badge" if target else "rip_badge", target_id=target)
+        return NightAction(thought="规则跳过", action_type="pass", target_id=None)
+
+
+register_policy(HeuristicBotPolicy())
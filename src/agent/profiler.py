@@ -0,0 +1,245 @@
+"""按需开启的对局性能剖析（每局一份火焰图）。
+
+单元测试不覆盖引擎，`make test_profile` 看不到真实对局的热点。开启后：
+
+- 图节点（`game_master` / `action_handler` / `player_agent`）与 `GameState` 的合并 / 追加 reducer
+  都被登记为剖析区间，记录调用次数、墙钟时间与线程 CPU 时间（确定性统计）；
+- 后台采样线程每隔 `interval` 秒抓取处于区间内的线程调用栈，并按该线程在采样间隔内
+  是否消耗 CPU 分类：`cpu`（计算）、`model_io`（等待模型返回）、`pool_wait`
+  （在共享模型池排队）、`wait`（其他阻塞）；
+- 对局结束时写出 `<目录>/<game_id>.collapsed`（collapsed-stack 格式，可直接用
+  flamegraph.pl / speedscope / inferno 打开）与 `<game_id>.summary.json`。
+
+开启方式：
+- 环境变量 `WEREWOLF_PROFILE=<输出目录>` 或 `configurable.profile_dir`，由 `GameHost` 按桌开启；
+- 直接调用图时用 `with profile_game("g1", "profiles"): graph.invoke(...)`。
+
+未开启时包装层只多一次 ContextVar 读取，开销可忽略。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+PROFILE_ENV = "WEREWOLF_PROFILE"
+DEFAULT_INTERVAL = 0.005
+# 采样间隔内线程 CPU 时间占比超过该值视为在计算
+CPU_BUSY_RATIO = 0.5
+
+_ACTIVE: ContextVar[Optional["GameProfiler"]] = ContextVar("werewolf_profiler", default=None)
+
+# 用于区分等待类型的函数名
+_MODEL_IO_FUNCS = frozenset({"run_model_call"})
+_POOL_WAIT_FUNCS = frozenset({"_acquire"})
+
+
+@dataclass
+class RegionStats:
+    """单个剖析区间的确定性统计"""
+
+    calls: int = 0
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+
+
+def _thread_cpu_clock(ident: int) -> Optional[int]:
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError):  # 非 Linux / 线程已退出
+        return None
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class GameProfiler:
+    """单局剖析器：确定性区间统计 + 采样调用栈。"""
+
+    def __init__(self, game_id: str, directory: Optional[str] = None, interval: float = DEFAULT_INTERVAL) -> None:
+        self.game_id = game_id
+        self.directory = directory
+        self.interval = interval
+        self.stacks: Dict[str, int] = {}
+        self.regions: Dict[str, RegionStats] = {}
+        self.categories: Dict[str, int] = {}
+        self._tracked: Dict[int, List[Tuple[str, Any]]] = {}
+        self._clocks: Dict[int, Tuple[Optional[int], float, float]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    # --- 区间登记 ---
+
+    @contextmanager
+    def track(self, label: str, entry_frame: Any = None) -> Iterator[None]:
+        """把当前线程登记为处于 `label` 区间；`entry_frame` 以下的栈帧计入采样"""
+        ident = threading.get_ident()
+        entry = entry_frame or sys._getframe(2)
+        with self._lock:
+            self._tracked.setdefault(ident, []).append((label, entry))
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            with self._lock:
+                regions = self._tracked.get(ident)
+                if regions:
+                    regions.pop()
+                    if not regions:
+                        del self._tracked[ident]
+                        self._clocks.pop(ident, None)
+                stats = self.regions.setdefault(label, RegionStats())
+                stats.calls += 1
+                stats.wall_s += wall
+                stats.cpu_s += cpu
+
+    # --- 采样 ---
+
+    def start(self) -> None:
+        """启动采样线程"""
+        self._sampler = threading.Thread(target=self._run, name=f"profiler-{self.game_id}", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """停止采样"""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        """抓取一次所有登记线程的调用栈"""
+        frames = sys._current_frames()
+        now = time.perf_counter()
+        with self._lock:
+            tracked = {ident: regions[-1] for ident, regions in self._tracked.items() if regions}
+        for ident, (label, entry) in tracked.items():
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            chain = []
+            while frame is not None and frame is not entry:
+                chain.append(frame)
+                frame = frame.f_back
+            if frame is None:  # 线程已离开该区间
+                continue
+            chain.reverse()
+            category = self._classify(ident, now, chain)
+            stack = ";".join([self.game_id, category, label, *(_frame_label(f) for f in chain)])
+            with self._lock:
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+                self.categories[category] = self.categories.get(category, 0) + 1
+
+    def _classify(self, ident: int, now: float, chain: List[Any]) -> str:
+        names = {f.f_code.co_name for f in chain}
+        clock, last_wall, last_cpu = self._clocks.get(ident) or (_thread_cpu_clock(ident), now - self.interval, None)
+        busy = None
+        if clock is not None:
+            try:
+                cpu = time.clock_gettime(clock)
+            except OSError:
+                cpu = None
+            if cpu is not None:
+                if last_cpu is not None:
+                    busy = (cpu - last_cpu) >= CPU_BUSY_RATIO * max(now - last_wall, 1e-9)
+                self._clocks[ident] = (clock, now, cpu)
+        if busy:
+            return "cpu"
+        if names & _POOL_WAIT_FUNCS:
+            return "pool_wait"
+        if names & _MODEL_IO_FUNCS:
+            return "model_io"
+        # 无法取得线程 CPU 时钟时，非等待类栈帧一律视为计算
+        return "cpu" if busy is None else "wait"
+
+    # --- 输出 ---
+
+    def summary(self) -> Dict[str, Any]:
+        """确定性统计与采样分类汇总"""
+        with self._lock:
+            return {
+                "game_id": self.game_id,
+                "interval_s": self.interval,
+                "samples": dict(sorted(self.categories.items())),
+                "regions": {k: vars(v).copy() for k, v in sorted(self.regions.items())},
+            }
+
+    def collapsed(self) -> str:
+        """collapsed-stack 文本（每行“栈;帧 样本数”）"""
+        with self._lock:
+            return "".join(f"{stack} {n}\n" for stack, n in sorted(self.stacks.items()))
+
+    def write(self) -> Optional[str]:
+        """写出火焰图与统计文件，返回火焰图路径"""
+        if not self.directory:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, self.game_id.replace(os.sep, "_"))
+        with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        with open(f"{base}.summary.json", "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+        return f"{base}.collapsed"
+
+
+@contextmanager
+def profile_game(game_id: str, directory: Optional[str] = None, interval: float = DEFAULT_INTERVAL) -> Iterator[GameProfiler]:
+    """在该上下文内运行的图（含线程池中的节点与 reducer）都记入同一个剖析器"""
+    profiler = GameProfiler(game_id, directory, interval)
+    token = _ACTIVE.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _ACTIVE.reset(token)
+        profiler.write()
+
+
+def resolve_profile_dir(configurable: Dict[str, Any]) -> Optional[str]:
+    """按配置 / 环境变量决定是否剖析，返回输出目录"""
+    return configurable.get("profile_dir") or os.getenv(PROFILE_ENV) or None
+
+
+def profiled(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    """包装图节点：剖析开启时登记为 `node:<name>` 区间"""
+
+    @wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        profiler = _ACTIVE.get()
+        if profiler is None:
+            return fn(*args, **kwargs)
+        with profiler.track(f"node:{name}", sys._getframe()):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def profiled_reducer(reducer: Callable[[Any, Any], Any], name: Optional[str] = None) -> Callable[[Any, Any], Any]:
+    """包装状态 reducer：剖析开启时登记为 `reducer:<name>` 区间（可作装饰器使用）"""
+    label = f"reducer:{name or reducer.__name__}"
+
+    @wraps(reducer)
+    def wrapper(left: Any, right: Any) -> Any:
+        profiler = _ACTIVE.get()
+        if profiler is None:
+            return reducer(left, right)
+        with profiler.track(label, sys._getframe()):
+            return reducer(left, right)
+
+    return wrapper
@@ -17,7 +17,7 @@ BASE_SYSTEM_PROMPT = """### 第一人称角色准则：
 
 ### 动作与思考规范：
 - **内心思考 (thought)**：
-  1. **票型分析**：必须根据【系统公告】中的投票详情，分析谁在跟风投票（拉）、谁在带头质疑（踩），识别出场上的对立面和潜在小团体。
+  1. **票型分析**：必须根据“全局票型”表与【系统公告】中的投票详情，分析谁在跟风投票（拉）、谁在带头质疑（踩），识别出场上的对立面和潜在小团体。
   2. **战术制定**：根据分析结果制定本轮发言目标。
 - **发言 (speech)**：仅在【讨论环节】使用。
   1. **禁止公式化**：严禁仅复述“1号是真预言家，12号是狼”。你必须给出**基于票型或发言逻辑**的证据，例如：“3号和5号票型高度一致，明显在抱团拉踩”。
@@ -52,7 +52,8 @@ HUNTER_INSTRUCTIONS = """你是猎人。
 要求：被杀或处决时（非毒）可开枪。发言强势点狼，不超过50字。"""
 
 GUARD_INSTRUCTIONS = """你是守卫。
-要求：不可连守。发言极其简练，隐藏身份，守护核心角色。"""
+上一晚守护：{last_guarded}
+要求：不可连守（不能守护上一晚守护过的玩家）。发言极其简练，隐藏身份，守护核心角色。"""
 
 SHERIFF_NOMINATION_INSTRUCTIONS = """现在是【警长竞选报名】环节（举手环节）。
 - 目标：决定是否上警。此时不进行详细发言，仅输出你的决定和内心考量。
@@ -0,0 +1,271 @@
+"""模型决策的录制与重放。
+
+录制模式下，每次模型调用的结构化输出按 (对局, 步数, 玩家, 调用类型) 记入磁带，
+连同对局随机种子与配置一起保存为 JSONL 文件；重放模式下节点不再访问网络，
+而是按相同的键从磁带取回输出。引擎内的随机决策都由对局种子派生（见 `get_rng`），
+因此修改 `game_master_node` / `action_handler_node` 后可以在毫秒级重跑一局真实对局，
+并逐字节比较终局状态。
+
+节点通过 `run_model_call` 自动接入，磁带从 `config["configurable"]["model_tape"]` 读取。
+
+示例：
+    final = record_game({"preset": "classic_9"}, "games/g1.jsonl")
+    replayed = replay_game("games/g1.jsonl")   # 无网络，终局状态摘要与录制时一致
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple, TypeVar
+
+from langchain_core.runnables import Runnable, RunnableConfig
+from pydantic import BaseModel
+
+from src.agent import schema
+from src.agent.budget import meter_merge, metered_usage
+
+T = TypeVar("T")
+
+TapeMode = Literal["record", "replay"]
+TAPE_VERSION = 1
+
+# (步数, 玩家 ID, 调用类型, 同键第几次调用)
+TapeKey = Tuple[Optional[int], Optional[int], str, int]
+
+
+class ReplayMissError(LookupError):
+    """重放时磁带中没有对应的调用记录（对局已偏离录制路径）"""
+
+
+class ReplayedModelError(RuntimeError):
+    """重放录制时发生过的模型调用异常"""
+
+
+class ReplayDivergenceError(RuntimeError):
+    """重放结果与录制不一致"""
+
+
+@dataclass
+class TapeEntry:
+    """磁带中的一条模型调用记录"""
+
+    step: Optional[int]
+    player_id: Optional[int]
+    kind: str
+    seq: int
+    type: str
+    data: Any = None
+    error: Optional[str] = None
+    usage: Optional[Dict[str, Dict[str, float]]] = None  # 该次调用计入单局预算的用量（见 `budget`）
+
+    @property
+    def key(self) -> TapeKey:
+        """磁带键"""
+        return (self.step, self.player_id, self.kind, self.seq)
+
+
+def _encode_output(value: Any) -> Tuple[str, Any]:
+    if isinstance(value, BaseModel):
+        return type(value).__name__, value.model_dump(mode="json")
+    if value is None or isinstance(value, (str, int, float, bool, list, dict)):
+        return "json", value
+    raise TypeError(f"无法录制的模型输出类型：{type(value)!r}")
+
+
+def _decode_output(type_: str, data: Any) -> Any:
+    if type_ == "json":
+        return data
+    cls = getattr(schema, type_, None)
+    if not (isinstance(cls, type) and issubclass(cls, BaseModel)):
+        raise ValueError(f"未知的模型输出类型：{type_}")
+    return cls.model_validate(data)
+
+
+def _is_json(value: Any) -> bool:
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def get_step(config: Optional[RunnableConfig]) -> Optional[int]:
+    """从节点 config 中取得当前 super-step 编号"""
+    step = ((config or {}).get("metadata") or {}).get("langgraph_step")
+    return int(step) if step is not None else None
+
+
+class ModelTape:
+    """一局对局的模型调用磁带（线程安全）。"""
+
+    def __init__(
+        self,
+        mode: TapeMode = "record",
+        *,
+        game_id: Optional[str] = None,
+        seed: Optional[int] = None,
+        configurable: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.mode = mode
+        self.game_id = game_id
+        self.seed = seed
+        self.configurable = dict(configurable or {})
+        self.final_digest: Optional[str] = None
+        self.entries: Dict[TapeKey, TapeEntry] = {}
+        self.misses: List[TapeKey] = []
+        self._seq: Dict[Tuple[Optional[int], Optional[int], str], int] = {}
+        self._lock = threading.Lock()
+
+    def _next_key(self, step: Optional[int], player_id: Optional[int], kind: str) -> TapeKey:
+        with self._lock:
+            base = (step, player_id, kind)
+            seq = self._seq.get(base, 0)
+            self._seq[base] = seq + 1
+            return (step, player_id, kind, seq)
+
+    def call(self, config: Optional[RunnableConfig], fn: Callable[[], T], kind: str, player_id: Optional[int]) -> T:
+        """录制模式下执行并记录 `fn`；重放模式下直接返回磁带中的输出"""
+        key = self._next_key(get_step(config), player_id, kind)
+        if self.mode == "replay":
+            entry = self.entries.get(key)
+            if entry is None:
+                with self._lock:
+                    self.misses.append(key)
+                raise ReplayMissError(f"磁带中没有调用记录：{key}")
+            # 还原录制时的预算用量，使降级决策与状态摘要和录制一致
+            meter_merge(entry.usage)
+            if entry.error is not None:
+                raise ReplayedModelError(entry.error)
+            return _decode_output(entry.type, entry.data)  # type: ignore[no-any-return]
+
+        step, pid, kind_, seq = key
+        try:
+            with metered_usage() as usage:
+                result = fn()
+        except Exception as e:
+            entry = TapeEntry(step=step, player_id=pid, kind=kind_, seq=seq, type="error", error=f"{type(e).__name__}: {e}", usage=usage or None)
+            with self._lock:
+                self.entries[key] = entry
+            raise
+        finally:
+            meter_merge(usage)
+        type_, data = _encode_output(result)
+        with self._lock:
+            self.entries[key] = TapeEntry(step=step, player_id=pid, kind=kind_, seq=seq, type=type_, data=data, usage=usage or None)
+        return result
+
+    def call_optional(self, config: Optional[RunnableConfig], fn: Callable[[], Optional[T]], kind: str, player_id: Optional[int]) -> Optional[T]:
+        """可选的本地决策（如开局库）：录制时只记录非空结果，重放时有记录才返回，不计入未命中"""
+        key = self._next_key(get_step(config), player_id, kind)
+        if self.mode == "replay":
+            entry = self.entries.get(key)
+            return _decode_output(entry.type, entry.data) if entry is not None else None  # type: ignore[no-any-return]
+        result = fn()
+        if result is not None:
+            type_, data = _encode_output(result)
+            step, pid, kind_, seq = key
+            with self._lock:
+                self.entries[key] = TapeEntry(step=step, player_id=pid, kind=kind_, seq=seq, type=type_, data=data)
+        return result
+
+    def save(self, path: str) -> None:
+        """保存为 JSONL：首行为对局信息，其后每行一条调用记录"""
+        header = {
+            "version": TAPE_VERSION,
+            "game_id": self.game_id,
+            "seed": self.seed,
+            # 运行期对象（模型池、开局库等）不写入磁带
+            "configurable": {k: v for k, v in self.configurable.items() if _is_json(v)},
+            "final_digest": self.final_digest,
+        }
+        ordered = sorted(self.entries.values(), key=lambda e: (e.step if e.step is not None else -1, e.player_id or 0, e.kind, e.seq))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            for e in ordered:
+                f.write(json.dumps(vars(e), ensure_ascii=False) + "\n")
+
+    @classmethod
+    def load(cls, path: str, mode: TapeMode = "replay") -> ModelTape:
+        """从 JSONL 文件加载磁带"""
+        with open(path, encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != TAPE_VERSION:
+                raise ValueError(f"不支持的磁带版本：{header.get('version')}")
+            tape = cls(mode, game_id=header.get("game_id"), seed=header.get("seed"), configurable=header.get("configurable"))
+            tape.final_digest = header.get("final_digest")
+            for line in f:
+                if line.strip():
+                    entry = TapeEntry(**json.loads(line))
+                    tape.entries[entry.key] = entry
+        return tape
+
+
+def get_model_tape(config: Optional[RunnableConfig]) -> Optional[ModelTape]:
+    """从 config 中获取模型调用磁带，未配置时返回 None"""
+    configurable = (config or {}).get("configurable") or {}
+    tape: Any = configurable.get("model_tape")
+    return tape if isinstance(tape, ModelTape) else None
+
+
+def state_digest(state: Dict[str, Any]) -> str:
+    """对局状态的稳定摘要（基于紧凑序列化），用于逐字节比较重放结果"""
+    from src.agent.serde import GameStateSerializer
+
+    serde = GameStateSerializer()
+    h = hashlib.sha256()
+    for key in sorted(state):
+        type_, payload = serde.dumps_typed(state[key])
+        h.update(f"{key}\0{type_}\0".encode())
+        h.update(payload)
+    return h.hexdigest()
+
+
+def _run(graph: Optional[Runnable], tape: ModelTape, recursion_limit: int) -> Dict[str, Any]:
+    if graph is None:
+        from src.agent.graph import graph as default_graph
+
+        graph = default_graph
+    game_id = tape.game_id or f"seed-{tape.seed}"
+    config: RunnableConfig = {
+        "recursion_limit": recursion_limit,
+        "configurable": {"thread_id": game_id, **tape.configurable, "game_id": game_id, "seed": tape.seed, "model_tape": tape},
+    }
+    result: Dict[str, Any] = graph.invoke({}, config)
+    return result
+
+
+def record_game(
+    configurable: Optional[Dict[str, Any]] = None,
+    path: Optional[str] = None,
+    *,
+    graph: Optional[Runnable] = None,
+    game_id: Optional[str] = None,
+    recursion_limit: int = 1000,
+) -> Dict[str, Any]:
+    """录制一局对局：运行图、记录所有模型输出与种子，可选保存到 `path`"""
+    from src.utils.helpers import new_seed
+
+    configurable = dict(configurable or {})
+    seed = configurable.pop("seed", None)
+    tape = ModelTape("record", game_id=game_id, seed=seed if seed is not None else new_seed(), configurable=configurable)
+    final = _run(graph, tape, recursion_limit)
+    tape.final_digest = state_digest(final)
+    if path:
+        tape.save(path)
+    return final
+
+
+def replay_game(tape_or_path: Any, *, graph: Optional[Runnable] = None, recursion_limit: int = 1000, strict: bool = True) -> Dict[str, Any]:
+    """无网络重放一局录制的对局；`strict` 时若偏离录制路径则抛出 ReplayDivergenceError"""
+    tape = tape_or_path if isinstance(tape_or_path, ModelTape) else ModelTape.load(tape_or_path)
+    tape.mode = "replay"
+    final = _run(graph, tape, recursion_limit)
+    if strict:
+        if tape.misses:
+            raise ReplayDivergenceError(f"重放偏离录制路径，缺失 {len(tape.misses)} 次调用，首个：{tape.misses[0]}")
+        if tape.final_digest is not None and state_digest(final) != tape.final_digest:
+            raise ReplayDivergenceError("重放终局状态与录制不一致")
+    return final
@@ -0,0 +1,189 @@
+"""对局全文的本地检索索引（BM25）。
+
+提示词只带最近 20 条历史，第 4 天的玩家看不到第 1 天的跳身份发言。这里为每局维护一个
+进程内倒排索引，覆盖 `history` 中的全部 `Message`（按发言者与天数标注），
+随历史追加增量更新；构造玩家上下文时检索与当前环节最相关的若干条早前发言
+（如 PK 环节只检索 PK 候选人的发言），以少量 token 补回窗口外的关键信息。
+
+- 分词：连续汉字切为二元组，数字与字母连续串为一个词，“N号”单独成词；不依赖外部分词库；
+- 天数：按顺序扫描系统公告“第N天”得出，只依赖历史本身，重放 / 分叉时结果一致；
+- 索引按 `game_id`（缺省用 `thread_id`）缓存在进程内，不写入状态与 checkpoint；
+  历史前缀与已索引内容不一致时（如从 checkpoint 分叉）自动重建；两者都没有时不缓存，每次临时建索引。
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+
+from src.agent.state import GameState, Message
+
+# BM25 参数
+BM25_K1 = 1.5
+BM25_B = 0.75
+# 构造检索查询时使用的最近消息条数
+QUERY_MESSAGES = 5
+# 进程内缓存的对局索引数
+INDEX_CACHE_SIZE = 256
+
+_TOKEN = re.compile(r"\d+号|[0-9A-Za-z]+|[一-鿿]+")
+_DAY_MARK = re.compile(r"第(\d+)天")
+
+
+def tokenize(text: str) -> List[str]:
+    """切词：汉字串切为二元组（单字保留原样），数字 / 字母串与“N号”各为一个词"""
+    tokens: List[str] = []
+    for run in _TOKEN.findall(text):
+        if run.endswith("号") and run[:-1].isdigit():
+            tokens.append(run)
+        elif "一" <= run[0] <= "鿿":
+            tokens.extend(run[i : i + 2] for i in range(max(1, len(run) - 1)))
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+
+@dataclass(frozen=True)
+class Hit:
+    """一条检索结果"""
+
+    doc_id: int
+    day: int
+    speaker: Optional[int]
+    content: str
+    score: float
+
+
+class TranscriptIndex:
+    """单局历史的增量 BM25 倒排索引（线程安全）。"""
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: List[int] = []
+        self._days: List[int] = []
+        self._speakers: List[Optional[int]] = []
+        self._contents: List[str] = []
+        self._total_len = 0
+        self._day = 1
+        self._first: Optional[Message] = None
+        self._last: Optional[Message] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def _add(self, message: Message) -> None:
+        if message.player_id is None:
+            mark = _DAY_MARK.search(message.content)
+            if mark:
+                self._day = int(mark.group(1))
+        doc_id = len(self._lengths)
+        counts = Counter(tokenize(message.content))
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        length = sum(counts.values())
+        self._lengths.append(length)
+        self._total_len += length
+        self._days.append(self._day)
+        self._speakers.append(message.player_id)
+        self._contents.append(message.content)
+        if self._first is None:
+            self._first = message
+        self._last = message
+
+    def matches(self, history: Sequence[Message]) -> bool:
+        """已索引的内容是否为 `history` 的前缀"""
+        n = len(self._lengths)
+        if n == 0:
+            return True
+        return len(history) >= n and history[0] == self._first and history[n - 1] == self._last
+
+    def sync(self, history: Sequence[Message]) -> None:
+        """把 `history` 中尚未索引的消息追加进索引"""
+        with self._lock:
+            for message in history[len(self._lengths) :]:
+                self._add(message)
+
+    def search(
+        self,
+        query: str,
+        k: int = 4,
+        speakers: Optional[Iterable[int]] = None,
+        before: Optional[int] = None,
+    ) -> List[Hit]:
+        """BM25 检索：可限定发言者，`before` 只检索该位置之前的消息；结果按得分降序"""
+        speaker_set = set(speakers) if speakers is not None else None
+        with self._lock:
+            n = len(self._lengths) if before is None else min(before, len(self._lengths))
+            if n == 0 or k <= 0:
+                return []
+            avg_len = self._total_len / len(self._lengths)
+            scores: Dict[int, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (len(self._lengths) - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if doc_id >= n or (speaker_set is not None and self._speakers[doc_id] not in speaker_set):
+                        continue
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc_id] / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+            ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:k]
+            return [Hit(d, self._days[d], self._speakers[d], self._contents[d], s) for d, s in ranked]
+
+
+_INDEXES: "OrderedDict[str, TranscriptIndex]" = OrderedDict()
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_transcript_index(config: Optional[RunnableConfig], history: Sequence[Message]) -> TranscriptIndex:
+    """取得本局的索引（按 game_id / thread_id 缓存）并同步到最新历史；没有对局键时每次临时建索引"""
+    configurable = (config or {}).get("configurable") or {}
+    game_key = configurable.get("game_id") or configurable.get("thread_id")
+    if not game_key:
+        # 无法区分对局（如未配置 checkpointer 的并发 invoke），共享缓存会互相重建甚至读到别局的索引
+        index = TranscriptIndex()
+        index.sync(history)
+        return index
+    key = str(game_key)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None or not index.matches(history):
+            index = TranscriptIndex()
+            _INDEXES[key] = index
+        _INDEXES.move_to_end(key)
+        while len(_INDEXES) > INDEX_CACHE_SIZE:
+            _INDEXES.popitem(last=False)
+    index.sync(history)
+    return index
+
+
+def retrieve_context(state: GameState, config: Optional[RunnableConfig], k: int, window: int) -> str:
+    """为当前环节检索最近 `window` 条之外的相关早前发言，渲染为提示词文本"""
+    history = state.get("history", [])
+    before = len(history) - window
+    if k <= 0 or before <= 0:
+        return "暂无"
+    turn_type = state.get("turn_type")
+    speakers: Optional[List[int]] = None
+    if turn_type in ("pk_discussion", "pk_voting"):
+        speakers = list(state.get("pk_candidates") or [])
+    elif turn_type in ("sheriff_discussion", "sheriff_voting"):
+        speakers = list(state.get("election_candidates") or [])
+    # 查询：最近几条消息 + 重点发言者编号；未限定发言者时只检索玩家发言
+    query = " ".join(m.content for m in history[-QUERY_MESSAGES:])
+    if speakers:
+        query += " " + " ".join(f"{p}号" for p in speakers)
+    else:
+        speakers = [p.id for p in state.get("players", [])]
+    hits = get_transcript_index(config, history).search(query, k=k, speakers=speakers, before=before)
+    if not hits:
+        return "暂无"
+    return "\n".join(f"[第{h.day}天 玩家 {h.speaker}] {h.content}" for h in sorted(hits, key=lambda h: h.doc_id))
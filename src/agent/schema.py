@@ -1,4 +1,4 @@
-from typing import Literal, Optional
+from typing import Dict, Literal, Optional, Type
 from pydantic import BaseModel, Field
 
 class AgentOutput(BaseModel):
@@ -23,3 +23,56 @@ class VotingOutput(BaseModel):
     """投票阶段的输出结构"""
     thought: str = Field(description="投票理由")
     target_id: Optional[int] = Field(description="投票给哪个玩家的 ID，弃票则为 None")
+
+class NominationOutput(BaseModel):
+    """警长竞选报名的输出结构"""
+    thought: str = Field(description="是否上警的考量")
+    action: Literal["run", "not_run"] = Field(description="run 参加竞选，not_run 不参加")
+
+# --- 按环节选择输出结构 ---
+# 并行的投票 / 报名环节只需要目标或决定，不再强制生成随后被丢弃的 speech；
+# 每个环节同时限制最大输出 token，避免多路并行时被个别长输出拖慢。
+
+class TurnOutputSpec(BaseModel):
+    """某个环节的结构化输出配置"""
+    output_schema: Type[BaseModel]
+    max_tokens: int
+
+VOTE_SPEC = TurnOutputSpec(output_schema=VotingOutput, max_tokens=256)
+SPEECH_SPEC = TurnOutputSpec(output_schema=DiscussionOutput, max_tokens=1024)
+ACTION_SPEC = TurnOutputSpec(output_schema=NightAction, max_tokens=384)
+# 需要附带动作的发言（警长指定发言方向、竞选发言退水）
+SPEECH_ACTION_SPEC = TurnOutputSpec(output_schema=AgentOutput, max_tokens=1024)
+
+TURN_OUTPUT_SPECS: Dict[str, TurnOutputSpec] = {
+    "voting": VOTE_SPEC,
+    "pk_voting": VOTE_SPEC,
+    "sheriff_voting": VOTE_SPEC,
+    "sheriff_nomination": TurnOutputSpec(output_schema=NominationOutput, max_tokens=192),
+    "discussion": SPEECH_SPEC,
+    "pk_discussion": SPEECH_SPEC,
+    "last_words": TurnOutputSpec(output_schema=DiscussionOutput, max_tokens=768),
+    "sheriff_discussion": SPEECH_ACTION_SPEC,
+    "hunter_shoot": ACTION_SPEC,
+    "sheriff_transfer": ACTION_SPEC,
+}
+
+def get_output_spec(phase: str, turn_type: str, is_sheriff: bool = False) -> TurnOutputSpec:
+    """返回当前环节使用的输出结构与 token 上限"""
+    if phase == "night":
+        return ACTION_SPEC
+    if turn_type == "discussion" and is_sheriff:
+        return SPEECH_ACTION_SPEC
+    return TURN_OUTPUT_SPECS.get(turn_type, SPEECH_ACTION_SPEC)
+
+def fallback_output(output_schema: Type[BaseModel]) -> BaseModel:
+    """模型调用失败时的兜底输出（跳过行动 / 弃票 / 不发言）"""
+    if output_schema is NightAction:
+        return NightAction(thought="系统异常，选择跳过行动。", action_type="pass", target_id=None)
+    if output_schema is VotingOutput:
+        return VotingOutput(thought="系统异常，选择弃票。", target_id=None)
+    if output_schema is NominationOutput:
+        return NominationOutput(thought="系统异常，选择不上警。", action="not_run")
+    if output_schema is DiscussionOutput:
+        return DiscussionOutput(thought="思考中...", speech="我暂时没有什么想说的。")
+    return AgentOutput(thought="思考中...", speech="我暂时没有什么想说的。", action=None, target_id=None)
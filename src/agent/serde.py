@@ -0,0 +1,143 @@
+"""对局状态的紧凑 checkpoint 序列化。
+
+默认的 `JsonPlusSerializer` 会把每个 pydantic 对象编码为
+(模块名, 类名, {字段名: 值}) 的扩展类型，`history` 与每个玩家的 `private_history`
+中每条 `Message` 都重复携带这些元数据，长对局的 checkpoint 因此越来越大。
+
+`GameStateSerializer` 对 `Message` / `PlayerState` 使用按 schema 固定顺序的
+msgpack 数组编码，并把角色名、性格等高频字符串替换为固定编号：
+- `Message`   -> [role, content, player_id?]
+- `PlayerState` -> [id, role, personality, is_alive, private_history, private_thoughts, history_digest?, thought_digest?]
+- `Send`        -> [node, arg]（并行派发时携带整份状态，同样走紧凑编码）
+其余类型（以及含有未知对象的值）整体交给 `JsonPlusSerializer` 处理，
+整数键字典（如 `votes`）按原样保留整数键。
+
+用法：
+    from langgraph.checkpoint.memory import InMemorySaver
+    app = workflow.compile(checkpointer=InMemorySaver(serde=GameStateSerializer()))
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import ormsgpack
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.types import Send
+
+from src.agent.configuration import KNOWN_ROLES
+from src.agent.state import Message, PlayerState
+from src.utils.helpers import PERSONALITIES
+
+SERDE_TYPE = "werewolf-v1"
+
+EXT_MESSAGE = 40
+EXT_PLAYER = 41
+EXT_SEND = 42
+
+# 编号表只能在末尾追加，否则旧 checkpoint 无法解码
+_ROLE_TABLE: Tuple[str, ...] = ("system",) + KNOWN_ROLES
+_ROLE_CODES: Dict[str, int] = {r: i for i, r in enumerate(_ROLE_TABLE)}
+_PERSONALITY_CODES: Dict[str, int] = {p: i for i, p in enumerate(PERSONALITIES)}
+
+# dataclass / datetime / enum / uuid 不由 ormsgpack 原生展开，而是进入 `_default`
+# 并触发整体回退，保证这些类型仍由 JsonPlusSerializer 按原类型还原
+_PACK_OPTIONS = (
+    ormsgpack.OPT_NON_STR_KEYS
+    | ormsgpack.OPT_PASSTHROUGH_DATACLASS
+    | ormsgpack.OPT_PASSTHROUGH_DATETIME
+    | ormsgpack.OPT_PASSTHROUGH_ENUM
+    | ormsgpack.OPT_PASSTHROUGH_UUID
+)
+_UNPACK_OPTIONS = ormsgpack.OPT_NON_STR_KEYS
+
+
+def _intern(value: Optional[str], codes: Dict[str, int]) -> Any:
+    if value is None:
+        return None
+    return codes.get(value, value)
+
+
+def _lookup(value: Any, table: Any) -> Any:
+    return table[value] if isinstance(value, int) else value
+
+
+def _encode_message(m: Message) -> List[Any]:
+    fields: List[Any] = [_intern(m.role, _ROLE_CODES), m.content]
+    if m.player_id is not None:
+        fields.append(m.player_id)
+    return fields
+
+
+def _decode_message(fields: List[Any]) -> Message:
+    return Message(
+        role=_lookup(fields[0], _ROLE_TABLE),
+        content=fields[1],
+        player_id=fields[2] if len(fields) > 2 else None,
+    )
+
+
+def _default(obj: Any) -> ormsgpack.Ext:
+    if isinstance(obj, Message):
+        return ormsgpack.Ext(EXT_MESSAGE, ormsgpack.packb(_encode_message(obj)))
+    if isinstance(obj, PlayerState):
+        payload = [
+            obj.id,
+            _intern(obj.role, _ROLE_CODES),
+            _intern(obj.personality, _PERSONALITY_CODES),
+            obj.is_alive,
+            [_encode_message(m) for m in obj.private_history],
+            obj.private_thoughts,
+        ]
+        if obj.history_digest or obj.thought_digest:
+            payload += [obj.history_digest, obj.thought_digest]
+        return ormsgpack.Ext(EXT_PLAYER, ormsgpack.packb(payload))
+    if isinstance(obj, Send):
+        return ormsgpack.Ext(EXT_SEND, ormsgpack.packb([obj.node, obj.arg], default=_default, option=_PACK_OPTIONS))
+    raise TypeError(f"unsupported type: {type(obj)!r}")
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == EXT_MESSAGE:
+        return _decode_message(ormsgpack.unpackb(data))
+    if code == EXT_PLAYER:
+        pid, role, personality, is_alive, history, thoughts, *digests = ormsgpack.unpackb(data)
+        history_digest, thought_digest = digests or ("", "")
+        return PlayerState(
+            id=pid,
+            role=_lookup(role, _ROLE_TABLE),
+            personality=_lookup(personality, PERSONALITIES),
+            is_alive=is_alive,
+            private_history=[_decode_message(m) for m in history],
+            private_thoughts=thoughts,
+            history_digest=history_digest,
+            thought_digest=thought_digest,
+        )
+    if code == EXT_SEND:
+        node, arg = ormsgpack.unpackb(data, ext_hook=_ext_hook, option=_UNPACK_OPTIONS)
+        return Send(node, arg)
+    return ormsgpack.Ext(code, data)
+
+
+class GameStateSerializer(SerializerProtocol):
+    """`GameState` 专用的紧凑序列化器，其他类型回退到 `JsonPlusSerializer`。"""
+
+    def __init__(self, fallback: Optional[SerializerProtocol] = None) -> None:
+        self.fallback = fallback or JsonPlusSerializer()
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        """序列化：能完全用紧凑格式表示的值编码为 `werewolf-v1`，否则交给回退序列化器"""
+        if obj is None or isinstance(obj, (bytes, bytearray)):
+            return self.fallback.dumps_typed(obj)
+        try:
+            return SERDE_TYPE, ormsgpack.packb(obj, default=_default, option=_PACK_OPTIONS)
+        except (TypeError, ormsgpack.MsgpackEncodeError):
+            return self.fallback.dumps_typed(obj)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        """反序列化"""
+        type_, payload = data
+        if type_ == SERDE_TYPE:
+            return ormsgpack.unpackb(payload, ext_hook=_ext_hook, option=_UNPACK_OPTIONS)
+        return self.fallback.loads_typed(data)
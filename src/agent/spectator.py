@@ -0,0 +1,230 @@
+"""观战服务：把对局的状态增量通过 Server-Sent Events 推送给大量观众。
+
+每局只订阅一次图的 `values` 流（通常由 `GameHost` 转发），在服务端计算相邻两步之间的增量：
+新增的 `history` 消息、死亡、警长变化、阶段 / 天数 / 环节变化，以及上帝视角的
+`last_thought` / `last_action` / `last_target`。每个增量只编码一次 SSE 帧，
+再原样分发给该局的所有观众，因此每名观众的开销是 O(增量) 而不是 O(状态)。
+新观众连入时先收到一次当前局面的快照帧，之后只收增量。
+
+只依赖标准库（asyncio 上的最小 HTTP 实现），仅用于本地 / 内网观战：
+- `GET /games`：对局列表与最新进度（JSON）；
+- `GET /games/<game_id>/events`：该局的 SSE 流，事件类型为 `snapshot` / `delta` / `end`。
+
+只有已登记（`open`，`GameHost.add_game` 时自动登记）或已开始推送的对局可以订阅，
+未知的对局返回 404；对局结束并通知完观众后即移除其分发器，不再常驻终局状态。
+
+示例：
+    server = SpectatorServer(port=8765)
+    await server.start()
+    host = GameHost(spectators=server)
+    host.add_game("table-1", {"preset": "classic_9", "player_policy": "bot"})
+    await host.run()
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import unquote
+
+from src.agent.state import Message
+
+# 单名观众允许积压的帧数；跟不上的观众会被断开，避免拖慢整局推送
+VIEWER_QUEUE_SIZE = 256
+# 快照中携带的最近历史条数
+SNAPSHOT_HISTORY = 50
+
+_GOD_VIEW_FIELDS = ("last_thought", "last_action", "last_target", "current_player_id")
+_SCALAR_FIELDS = ("phase", "day_count", "turn_type", "sheriff_id", "game_over", "winner_side")
+
+
+def _message(m: Message) -> Dict[str, Any]:
+    return {"role": m.role, "content": m.content, "player_id": m.player_id}
+
+
+def compute_delta(prev: Optional[Dict[str, Any]], cur: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """计算两次状态快照之间的增量；没有可见变化时返回 None"""
+    prev = prev or {}
+    delta: Dict[str, Any] = {}
+    for key in _SCALAR_FIELDS + _GOD_VIEW_FIELDS:
+        if key in cur and cur.get(key) != prev.get(key):
+            delta[key] = cur.get(key)
+
+    history = cur.get("history") or []
+    seen = len(prev.get("history") or [])
+    if len(history) > seen:
+        delta["messages"] = [_message(m) for m in history[seen:]]
+
+    prev_alive = set(prev.get("alive_players") or [])
+    alive = set(cur.get("alive_players") or [])
+    if prev_alive - alive:
+        delta["deaths"] = sorted(prev_alive - alive)
+    return delta or None
+
+
+def snapshot(values: Dict[str, Any]) -> Dict[str, Any]:
+    """当前局面的完整快照（仅发送给新连入的观众）"""
+    return {
+        **{key: values.get(key) for key in _SCALAR_FIELDS + _GOD_VIEW_FIELDS},
+        "alive_players": sorted(values.get("alive_players") or []),
+        "players": [{"id": p.id, "role": p.role, "personality": p.personality, "is_alive": p.is_alive} for p in values.get("players") or []],
+        "messages": [_message(m) for m in (values.get("history") or [])[-SNAPSHOT_HISTORY:]],
+    }
+
+
+def encode_event(event: str, data: Dict[str, Any], seq: Optional[int] = None) -> bytes:
+    """编码一个 SSE 帧"""
+    head = f"id: {seq}\n" if seq is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+
+
+class GameFeed:
+    """单局的增量计算与观众分发。"""
+
+    def __init__(self, game_id: str) -> None:
+        self.game_id = game_id
+        self.seq = 0
+        self.values: Optional[Dict[str, Any]] = None
+        self.finished = False
+        self.viewers: Set[asyncio.Queue] = set()
+
+    def publish(self, values: Dict[str, Any]) -> None:
+        """接收一次状态快照，计算增量并分发给所有观众"""
+        delta = compute_delta(self.values, values)
+        self.values = values
+        if delta is None:
+            return
+        self.seq += 1
+        self._fan_out(encode_event("delta", delta, self.seq))
+
+    def finish(self, error: Optional[str] = None) -> None:
+        """对局结束：通知观众并关闭连接"""
+        self.finished = True
+        self.seq += 1
+        values = self.values or {}
+        self._fan_out(encode_event("end", {"winner_side": values.get("winner_side"), "error": error}, self.seq))
+        self._fan_out(None)
+
+    def subscribe(self) -> asyncio.Queue:
+        """新增一名观众：队列中先放入当前快照"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=VIEWER_QUEUE_SIZE)
+        if self.values is not None:
+            queue.put_nowait(encode_event("snapshot", snapshot(self.values), self.seq))
+        if self.finished:
+            queue.put_nowait(None)
+        else:
+            self.viewers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """移除一名观众"""
+        self.viewers.discard(queue)
+
+    def _fan_out(self, frame: Optional[bytes]) -> None:
+        for queue in list(self.viewers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # 观众跟不上：断开，由客户端按 Last-Event-ID 重连后重新拿快照
+                self.viewers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+        if frame is None:
+            self.viewers.clear()
+
+
+class SpectatorServer:
+    """基于 asyncio 的最小 SSE 观战服务。"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765) -> None:
+        self.host = host
+        self.port = port
+        self.feeds: Dict[str, GameFeed] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def open(self, game_id: str) -> GameFeed:
+        """登记（或取得）某局的分发器，登记后观众即可在开局前连入等待"""
+        if game_id not in self.feeds:
+            self.feeds[game_id] = GameFeed(game_id)
+        return self.feeds[game_id]
+
+    def publish(self, game_id: str, values: Dict[str, Any]) -> None:
+        """转发一次状态快照（在事件循环线程中调用）"""
+        self.open(game_id).publish(values)
+
+    def finish(self, game_id: str, error: Optional[str] = None) -> None:
+        """标记对局结束：通知观众后移除该局的分发器（观众队列中剩余的帧照常送达）"""
+        feed = self.feeds.pop(game_id, None)
+        if feed is not None:
+            feed.finish(error)
+
+    async def start(self) -> None:
+        """开始监听；`port=0` 时由系统分配端口，实际端口写回 `self.port`"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        """停止监听"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def games(self) -> List[Dict[str, Any]]:
+        """对局列表"""
+        result = []
+        for game_id, feed in self.feeds.items():
+            values = feed.values or {}
+            result.append({
+                "game_id": game_id,
+                "viewers": len(feed.viewers),
+                "finished": feed.finished,
+                **{key: values.get(key) for key in ("phase", "day_count", "turn_type", "winner_side")},
+            })
+        return result
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  # 忽略请求头
+            if len(request_line) < 2 or request_line[0] != "GET":
+                await self._respond(writer, "405 Method Not Allowed", "text/plain", b"method not allowed")
+                return
+            parts = [unquote(p) for p in request_line[1].split("?")[0].split("/") if p]
+            if parts == ["games"]:
+                body = json.dumps(self.games(), ensure_ascii=False).encode()
+                await self._respond(writer, "200 OK", "application/json; charset=utf-8", body)
+            elif len(parts) == 3 and parts[0] == "games" and parts[2] == "events" and parts[1] in self.feeds:
+                await self._stream(writer, self.feeds[parts[1]])
+            else:
+                await self._respond(writer, "404 Not Found", "text/plain", b"not found")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: str, content_type: str, body: bytes) -> None:
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"Access-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+    @staticmethod
+    async def _stream(writer: asyncio.StreamWriter, feed: GameFeed) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n"
+            b"Cache-Control: no-cache\r\nAccess-Control-Allow-Origin: *\r\nConnection: keep-alive\r\n\r\n"
+        )
+        queue = feed.subscribe()
+        try:
+            while True:
+                frame = await queue.get()
+                if frame is None:
+                    break
+                writer.write(frame)
+                await writer.drain()
+        finally:
+            feed.unsubscribe(queue)
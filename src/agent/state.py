@@ -1,28 +1,55 @@
+import sys
+from dataclasses import dataclass
 from typing import Annotated, List, Optional, Dict, Literal, Any
 from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
 import operator
-from pydantic import BaseModel, Field
 
-class Message(BaseModel):
+from src.agent.profiler import profiled_reducer
+
+# 不超过该长度的系统消息内容会被驻留（同一公告在各局、各玩家间共享一份字符串）
+INTERN_CONTENT_MAX_CHARS = 256
+
+@dataclass(frozen=True, slots=True)
+class Message:
+    """一条公屏 / 私有消息。
+
+    多桌托管时 `history` 与每名玩家的 `private_history` 中的消息数量可观，pydantic 对象
+    （实例字典 + 字段集合）的固定开销远大于内容本身。这里用不可变的 slots dataclass：
+    没有实例字典；角色名驻留、短系统公告的内容驻留，重复的公告只占一份字符串。
+    不可变意味着同一条消息可以在历史、私有记忆与各 checkpoint 之间安全共享。
+    pydantic 字段（`PlayerState.private_history`）与默认的 checkpoint 序列化都原生支持 dataclass。
+    """
+
     role: str
     content: str
     player_id: Optional[int] = None
 
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "role", sys.intern(self.role))
+        if self.role == "system" and len(self.content) <= INTERN_CONTENT_MAX_CHARS:
+            object.__setattr__(self, "content", sys.intern(self.content))
+
 class PlayerState(BaseModel):
     id: int
     role: str  # werewolf, villager, seer, witch, hunter, guard
     personality: Optional[str] = None # 玩家性格特点
     is_alive: bool = True
-    private_history: List[Message] = Field(default_factory=list)
-    private_thoughts: List[str] = Field(default_factory=list)
+    private_history: List[Message] = Field(default_factory=list) # 最近的私有消息 (有上限，见 src.agent.memory)
+    private_thoughts: List[str] = Field(default_factory=list)     # 最近的内心想法 (有上限)
+    history_digest: str = ""  # 被淘汰私有消息的滚动摘要
+    thought_digest: str = ""  # 被淘汰内心想法的滚动摘要
 
+@profiled_reducer
 def merge_dict(left: Dict[Any, Any], right: Dict[Any, Any]) -> Dict[Any, Any]:
-    """合并字典的 Reducer"""
+    """合并字典的 Reducer；写入空字典表示清空（引擎结算后重置投票 / 夜间行动）"""
+    if not right:
+        return {}
     new_dict = left.copy()
     new_dict.update(right)
     return new_dict
 
+@profiled_reducer
 def merge_players(left: List[PlayerState], right: List[PlayerState]) -> List[PlayerState]:
     """合并玩家列表的 Reducer，根据 ID 覆盖更新"""
     player_map = {p.id: p for p in left}
@@ -30,12 +57,30 @@ def merge_players(left: List[PlayerState], right: List[PlayerState]) -> List[Pla
         player_map[p.id] = p
     return sorted(list(player_map.values()), key=lambda x: x.id)
 
+@profiled_reducer
 def merge_list(left: List[Any], right: List[Any]) -> List[Any]:
-    """合并列表的 Reducer（去重并合并）"""
+    """合并列表的 Reducer（去重并合并）；写入空列表表示清空"""
+    if not right:
+        return []
     return list(set(left) | set(right))
 
+@profiled_reducer
+def add_usage(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """累加用量的 Reducer：按键求和，值为字典时逐项求和（单局预算记账）"""
+    merged = dict(left or {})
+    for key, value in right.items():
+        if isinstance(value, dict):
+            inner = dict(merged.get(key) or {})
+            for k, v in value.items():
+                inner[k] = inner.get(k, 0) + v
+            merged[key] = inner
+        else:
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
 class GameState(TypedDict):
     # 基础信息
+    seed: Optional[int]       # 对局随机种子 (身份分配与引擎内的随机决策均由其派生)
     players: Annotated[List[PlayerState], merge_players]
     alive_players: List[int]
     
@@ -48,8 +93,14 @@ class GameState(TypedDict):
     day_count: int
     
     # 公共信息 (追加模式)
-    history: Annotated[List[Message], operator.add]
-    game_summary: str  # 对局总结（长期记忆）
+    history: Annotated[List[Message], profiled_reducer(operator.add, "history")]
+    game_summary: str  # 对局总结（长期记忆，由事实账本渲染，见 src.agent.facts）
+    fact_log: Annotated[List[str], profiled_reducer(operator.add, "fact_log")]  # 公开事件账本（只追加）
+    role_claims: Dict[int, Dict[str, Any]]        # 发言中的身份声明 {玩家ID: {"role": 身份, "checks": {玩家ID: 结果}}}
+    fact_cursor: int                              # 已扫描身份声明的历史位置
+    vote_matrix: Dict[int, Dict[int, int]]        # 全局票型矩阵 {投票者ID: {被投者ID: 累计票数}}
+    vote_log: Annotated[List[Dict[str, Any]], profiled_reducer(operator.add, "vote_log")]   # 逐票记录 {day, kind, voter, target}（只追加）
+    night_log: Annotated[List[Dict[str, Any]], profiled_reducer(operator.add, "night_log")]  # 夜间 / 技能行动记录 {day, action, target}（只追加）
     
     # 临时决策数据 (Action 消费点)
     night_actions: Annotated[Dict[str, Any], merge_dict] # {"wolf_kill": 5, ...}
@@ -73,6 +124,11 @@ class GameState(TypedDict):
     election_candidates: Annotated[List[int], merge_list]
     game_over: bool
     winner_side: Optional[Literal["werewolf", "villager"]]
+
+    # 单局预算 (见 src.agent.budget)
+    token_usage: Annotated[Dict[str, Dict[str, float]], add_usage]  # 按层级累计 {层级: {calls, input_tokens, output_tokens, cost_usd}}
+    budget_degraded: Annotated[Dict[str, int], add_usage]           # 降级后做出的决策数 {"soft": n, "hard": n}
+    budget_report: Optional[Dict[str, Any]]                        # 对局结束时的预算报告
     
     # 上帝视角增强字段 (非对局核心状态，仅用于可视化显示)
     # 并行环节下，我们使用 lambda x, y: y 来允许覆盖而不报错（只取并行中最后一个完成的）
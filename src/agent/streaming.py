@@ -0,0 +1,97 @@
+"""发言流式输出：把串行发言环节的 `speech` 字段边生成边推送给观战端。
+
+讨论、警长竞选发言、遗言与 PK 发言都是一人接一人地串行进行，观战端的体感延迟
+主要由这些发言决定。这里在大模型生成结构化输出（函数调用参数）的同时，
+增量解析已收到的 JSON 片段，把 `speech` 的新增部分作为 LangGraph 自定义流事件写出：
+
+    for mode, chunk in graph.stream(inputs, config, stream_mode=["custom", "updates"]):
+        if mode == "custom" and chunk["type"] == "speech_delta":
+            print(chunk["delta"], end="")
+
+事件格式：
+- `{"type": "speech_delta", "player_id", "turn_type", "day", "delta"}`：发言的新增片段；
+- `{"type": "speech_end", "player_id", "turn_type", "day", "speech"}`：发言结束，
+  `speech` 为最终提交进 `history` 的完整文本（校验失败走兜底时可能与已推送的片段不同）。
+
+流式只影响推送，最终的结构化输出仍完整解析、校验后由节点一次性提交进状态。
+未以 `custom` 模式订阅时，写出的事件被直接丢弃。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional, Type
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.output_parsers.openai_tools import PydanticToolsParser
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_core.utils.json import parse_partial_json
+from langgraph.config import get_stream_writer
+from pydantic import BaseModel
+
+# 逐字推送发言的环节（均为串行发言）
+SPEECH_STREAM_TURNS = ("discussion", "sheriff_discussion", "last_words", "pk_discussion")
+
+
+def get_writer() -> Optional[Callable[[Any], None]]:
+    """取得当前图运行的自定义流写入器；不在图运行上下文中时返回 None"""
+    try:
+        return get_stream_writer()
+    except (KeyError, RuntimeError):
+        return None
+
+
+class SpeechStreamer:
+    """从累积的函数调用参数（部分 JSON）中提取 `speech` 字段，推送新增片段。"""
+
+    def __init__(self, writer: Callable[[Any], None], player_id: int, turn_type: str, day: Optional[int]) -> None:
+        self.writer = writer
+        self.meta = {"player_id": player_id, "turn_type": turn_type, "day": day}
+        self.sent = ""
+
+    def feed(self, args: str) -> None:
+        """传入截至目前收到的完整参数字符串"""
+        try:
+            partial = parse_partial_json(args) if args else None
+        except ValueError:
+            return
+        speech = partial.get("speech") if isinstance(partial, dict) else None
+        # 部分 JSON 解析出的字符串只会变长；前缀不一致（极少见的转义回退）时不推送
+        if isinstance(speech, str) and len(speech) > len(self.sent) and speech.startswith(self.sent):
+            self.writer({"type": "speech_delta", **self.meta, "delta": speech[len(self.sent) :]})
+            self.sent = speech
+
+
+def emit_speech_end(writer: Optional[Callable[[Any], None]], player_id: int, turn_type: str, day: Optional[int], speech: str) -> None:
+    """推送发言结束事件（携带最终提交的完整发言）"""
+    if writer is not None:
+        writer({"type": "speech_end", "player_id": player_id, "turn_type": turn_type, "day": day, "speech": speech})
+
+
+def stream_structured_call(
+    llm: BaseChatModel,
+    schema: Type[BaseModel],
+    prompt_value: Any,
+    streamer: SpeechStreamer,
+    config: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """以流式函数调用生成结构化输出，边生成边推送发言。
+
+    返回值与 `with_structured_output(..., include_raw=True)` 相同：
+    `{"raw": 聚合后的消息, "parsed": 解析结果, "parsing_error": 异常或 None}`，
+    因此可直接交给 `tracked_structured_call` 记账。
+    """
+    tool_name = convert_to_openai_tool(schema)["function"]["name"]
+    bound = llm.bind_tools([schema], tool_choice=tool_name, parallel_tool_calls=False, stream_usage=True)
+    aggregated: Optional[AIMessageChunk] = None
+    for chunk in bound.stream(prompt_value, config=config):
+        aggregated = chunk if aggregated is None else aggregated + chunk
+        if aggregated.tool_call_chunks:
+            streamer.feed(aggregated.tool_call_chunks[0].get("args") or "")
+    if aggregated is None:
+        return {"raw": None, "parsed": None, "parsing_error": ValueError("模型未返回任何内容")}
+    try:
+        parsed = PydanticToolsParser(tools=[schema], first_tool_only=True).invoke(aggregated)
+        return {"raw": aggregated, "parsed": parsed, "parsing_error": None}
+    except Exception as e:
+        return {"raw": aggregated, "parsed": None, "parsing_error": e}
@@ -0,0 +1,290 @@
+"""结构化输出校验：按当前局面的规则检查玩家决策，能本地修复的就地修复，必要时追加一次简短重问。
+
+过去模型输出畸形（非法 `action_type`、已出局 / 非候选人的 `target_id`、解析失败为 None）时，
+节点直接换成“跳过 / 弃票”，这会悄悄改变对局走向。现在每个决策先经过 `validate_output`：
+
+- 合法：原样使用；
+- 可修复（意图明确）：例如狼人刀人环节把 `action_type` 写成 "check" 但目标合法 → 改为 "kill"；
+  放弃行动却带了目标 → 去掉目标；女巫用解药但目标写错 → 改为昨晚被刀的玩家；
+  发言环节附带了与环节无关的动作 → 去掉动作；
+- 不可修复：目标已出局 / 不是候选人 / 守卫连守 / 药已用完 / 缺少目标 / 发言为空 / 没有输出。
+  若策略支持 `reask`（大模型策略）且开启了 `output_reask`，带上错误原因与合法选项重问一次；
+  仍不合法才走兜底输出。
+
+每次校验的结果记入 `ValidationStats`（从 `config["configurable"]["validation_stats"]` 读取，
+未配置时记入进程级默认实例），使非法输出、修复与额外调用次数可度量。
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.errors import GraphBubbleUp
+from pydantic import BaseModel
+
+from src.agent.configuration import Configuration
+from src.agent.schema import AgentOutput, DiscussionOutput, NightAction, TurnOutputSpec, VotingOutput
+from src.agent.state import GameState, PlayerState
+
+Outcome = Literal["valid", "repaired", "reasked", "fallback"]
+
+# 各夜间 / 技能环节允许的行动，以及表示“放弃”的行动
+TURN_ACTIONS: Dict[str, Tuple[str, ...]] = {
+    "wolf_kill": ("kill",),
+    "guard_protect": ("protect",),
+    "seer_check": ("check",),
+    "witch_action": ("save", "poison"),
+    "hunter_shoot": ("shoot",),
+    "sheriff_transfer": ("transfer_badge",),
+}
+PASS_ACTIONS: Dict[str, str] = {
+    "wolf_kill": "pass",
+    "guard_protect": "pass",
+    "witch_action": "pass",
+    "hunter_shoot": "pass",
+    "sheriff_transfer": "rip_badge",
+}
+# 发言环节允许附带的动作与常见别名
+SPEECH_ACTIONS: Dict[str, Tuple[str, ...]] = {
+    "sheriff_discussion": ("quit_election",),
+    "discussion": ("clockwise", "counter_clockwise"),
+}
+_ACTION_ALIASES = {
+    "顺时针": "clockwise",
+    "逆时针": "counter_clockwise",
+    "counterclockwise": "counter_clockwise",
+    "anticlockwise": "counter_clockwise",
+    "退水": "quit_election",
+    "quit": "quit_election",
+}
+
+
+@dataclass
+class Verdict:
+    """一次校验的结论"""
+
+    output: Optional[BaseModel]
+    status: Literal["valid", "repaired", "invalid"]
+    reason: Optional[str] = None
+    options: Optional[str] = None  # 重问时提示的合法选项
+
+    @property
+    def ok(self) -> bool:
+        """输出可以直接使用"""
+        return self.status != "invalid"
+
+
+def legal_targets(state: GameState, player: PlayerState, action: Optional[str] = None) -> Optional[List[int]]:
+    """当前环节（及行动）允许的目标；不需要目标的环节返回 None"""
+    turn_type = state["turn_type"]
+    alive = sorted(state["alive_players"])
+    others = [p for p in alive if p != player.id]
+    if turn_type == "wolf_kill":
+        return alive
+    if turn_type == "guard_protect":
+        return [p for p in alive if p != state.get("last_guarded_id")]
+    if turn_type in ("seer_check", "hunter_shoot", "sheriff_transfer", "voting"):
+        return others
+    if turn_type == "witch_action":
+        potions = state.get("witch_potions") or {}
+        if action == "save":
+            victim = (state.get("night_actions") or {}).get("wolf_kill")
+            return [victim] if potions.get("save") and victim is not None else []
+        return others if potions.get("poison") else []
+    if turn_type == "pk_voting":
+        return sorted(c for c in state.get("pk_candidates") or [] if c != player.id and c in alive)
+    if turn_type == "sheriff_voting":
+        return sorted(c for c in state.get("election_candidates") or [] if c != player.id)
+    return None
+
+
+def _target_reason(state: GameState, player: PlayerState, target: int, action: Optional[str]) -> str:
+    turn_type = state["turn_type"]
+    if target == player.id and turn_type not in ("wolf_kill", "guard_protect"):
+        return f"不能以自己（{target}号）为目标"
+    if target not in state["alive_players"]:
+        return f"{target}号不在场（已出局或不存在）"
+    if turn_type == "guard_protect":
+        return f"不能连续两晚守护{target}号"
+    if turn_type == "witch_action":
+        return f"{'解药' if action == 'save' else '毒药'}已用完或不可用"
+    return f"{target}号不是本环节的候选人"
+
+
+def _options(state: GameState, player: PlayerState) -> str:
+    turn_type = state["turn_type"]
+    if turn_type == "witch_action":
+        save, poison = legal_targets(state, player, "save"), legal_targets(state, player, "poison")
+        parts = [f"save → {save[0]}号" if save else None, f"poison → {'/'.join(map(str, poison))}" if poison else None, "pass（不用药）"]
+        return "；".join(p for p in parts if p)
+    targets = legal_targets(state, player)
+    text = "、".join(f"{t}号" for t in targets or []) or "无"
+    if turn_type in TURN_ACTIONS:
+        give_up = PASS_ACTIONS.get(turn_type)
+        return f"action_type={TURN_ACTIONS[turn_type][0]}，target_id 可选：{text}" + (f"；或 action_type={give_up}" if give_up else "")
+    return f"target_id 可选：{text}" + ("；或 None 弃票" if turn_type.endswith("voting") else "")
+
+
+def _night(output: NightAction, state: GameState, player: PlayerState) -> Verdict:
+    turn_type = state["turn_type"]
+    allowed = TURN_ACTIONS.get(turn_type)
+    if allowed is None:
+        return Verdict(output, "valid")
+    action, target = output.action_type, output.target_id
+    give_up = PASS_ACTIONS.get(turn_type)
+    invalid = lambda reason: Verdict(output, "invalid", reason, _options(state, player))  # noqa: E731
+
+    if action in ("pass", "rip_badge"):
+        if give_up is None:
+            return invalid("本环节不能放弃行动")
+        if action != give_up or target is not None:
+            return Verdict(output.model_copy(update={"action_type": give_up, "target_id": None}), "repaired", "放弃行动时忽略目标")
+        return Verdict(output, "valid")
+
+    repaired: Dict[str, Any] = {}
+    if turn_type == "witch_action":
+        victim = (state.get("night_actions") or {}).get("wolf_kill")
+        if action not in allowed:
+            # 目标是昨晚被刀的人即为救人，否则视为用毒
+            inferred = "save" if target is not None and target == victim else "poison" if target is not None else None
+            if inferred is None:
+                return invalid(f"非法行动 {action}")
+            repaired["action_type"] = action = inferred
+        if action == "save" and target != victim and victim is not None and (state.get("witch_potions") or {}).get("save"):
+            repaired["target_id"] = target = victim
+    elif action not in allowed:
+        if target is None:
+            return invalid(f"非法行动 {action}")
+        repaired["action_type"] = action = allowed[0]
+
+    if target is None:
+        return invalid("缺少目标")
+    if target not in (legal_targets(state, player, action) or []):
+        return invalid(_target_reason(state, player, target, action))
+    if repaired:
+        return Verdict(output.model_copy(update=repaired), "repaired", "行动类型与环节不符")
+    return Verdict(output, "valid")
+
+
+def _speech(output: BaseModel, state: GameState, player: PlayerState) -> Verdict:
+    speech = (getattr(output, "speech", None) or "").strip()
+    if not speech:
+        return Verdict(output, "invalid", "发言为空", "请给出一段简短发言")
+    updates: Dict[str, Any] = {}
+    if speech != output.speech:
+        updates["speech"] = speech
+    if isinstance(output, AgentOutput) and output.action is not None:
+        action = _ACTION_ALIASES.get(output.action.strip().lower(), output.action.strip().lower())
+        allowed = SPEECH_ACTIONS.get(state["turn_type"], ())
+        if state["turn_type"] == "discussion" and player.id != state.get("sheriff_id"):
+            allowed = ()
+        # 发言的动作是可选的：无法识别的动作直接去掉
+        action = action if action in allowed else None
+        if action != output.action:
+            updates["action"] = action
+    if updates:
+        return Verdict(output.model_copy(update=updates), "repaired", "规范发言与附带动作")
+    return Verdict(output, "valid")
+
+
+def validate_output(output: Optional[BaseModel], state: GameState, player: PlayerState, spec: TurnOutputSpec) -> Verdict:
+    """按当前局面校验（并尽量修复）一次结构化输出"""
+    if output is None:
+        return Verdict(None, "invalid", "没有可解析的输出", _options(state, player) if legal_targets(state, player) is not None else None)
+    if isinstance(output, NightAction):
+        return _night(output, state, player)
+    if isinstance(output, VotingOutput):
+        target = output.target_id
+        if target is None or target in (legal_targets(state, player) or []):
+            return Verdict(output, "valid")
+        return Verdict(output, "invalid", _target_reason(state, player, target, None), _options(state, player))
+    if isinstance(output, (DiscussionOutput, AgentOutput)):
+        return _speech(output, state, player)
+    return Verdict(output, "valid")
+
+
+# --- 统计 ---
+
+
+@dataclass
+class TurnValidationStats:
+    """单个环节的校验统计"""
+
+    valid: int = 0
+    repaired: int = 0
+    reasked: int = 0  # 重问后合法
+    fallback: int = 0  # 最终走兜底
+    reask_calls: int = 0
+    reasons: Dict[str, int] = field(default_factory=dict)
+
+
+class ValidationStats:
+    """按环节汇总校验结果（线程安全）。"""
+
+    def __init__(self) -> None:
+        self._turns: Dict[str, TurnValidationStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, turn_type: str, outcome: Outcome, reasons: Sequence[str] = (), reask_calls: int = 0) -> None:
+        """记录一次决策的最终结果及途中遇到的问题"""
+        with self._lock:
+            stats = self._turns.setdefault(turn_type, TurnValidationStats())
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+            stats.reask_calls += reask_calls
+            for reason in reasons:
+                stats.reasons[reason] = stats.reasons.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, TurnValidationStats]:
+        """返回各环节统计的副本"""
+        with self._lock:
+            return {name: TurnValidationStats(**{**vars(s), "reasons": dict(s.reasons)}) for name, s in self._turns.items()}
+
+    def report(self) -> str:
+        """生成文本形式的校验统计"""
+        lines = [f"{'turn':<20}{'valid':>7}{'repair':>7}{'reask':>7}{'fallbk':>7}{'calls+':>7}  top reasons"]
+        for name, s in sorted(self.snapshot().items()):
+            top = "，".join(f"{r}×{n}" for r, n in sorted(s.reasons.items(), key=lambda kv: -kv[1])[:3])
+            lines.append(f"{name:<20}{s.valid:>7}{s.repaired:>7}{s.reasked:>7}{s.fallback:>7}{s.reask_calls:>7}  {top or '-'}")
+        return "\n".join(lines)
+
+
+DEFAULT_VALIDATION_STATS = ValidationStats()
+
+
+def get_validation_stats(config: Optional[RunnableConfig]) -> ValidationStats:
+    """从 config 中获取校验统计，未配置时返回进程级默认实例"""
+    configurable = (config or {}).get("configurable") or {}
+    stats: Any = configurable.get("validation_stats")
+    return stats if isinstance(stats, ValidationStats) else DEFAULT_VALIDATION_STATS
+
+
+def decide_validated(policy: Any, player: PlayerState, state: GameState, config: RunnableConfig, spec: TurnOutputSpec) -> Optional[BaseModel]:
+    """调用策略并校验输出；不可修复时按配置重问一次，仍不合法返回 None（由调用方兜底）"""
+    turn_type = state["turn_type"]
+    stats = get_validation_stats(config)
+    reasons: List[str] = []
+    try:
+        verdict = validate_output(policy.decide(player, state, config, spec), state, player, spec)
+        if verdict.reason:
+            reasons.append(verdict.reason)
+        if verdict.ok:
+            stats.record(turn_type, "valid" if verdict.status == "valid" else "repaired", reasons)
+            return verdict.output
+        reask = getattr(policy, "reask", None)
+        if reask is None or not Configuration.from_runnable_config(config).output_reask:
+            stats.record(turn_type, "fallback", reasons)
+            return None
+        verdict = validate_output(reask(player, state, config, spec, verdict), state, player, spec)
+    except GraphBubbleUp:
+        raise  # 批处理模式的暂停信号
+    except Exception as e:
+        print(f"Error in {policy.name} policy: {e}")
+        stats.record(turn_type, "fallback", reasons + [type(e).__name__])
+        return None
+    if verdict.reason and verdict.reason not in reasons:
+        reasons.append(verdict.reason)
+    stats.record(turn_type, "reasked" if verdict.ok else "fallback", reasons, reask_calls=1)
+    return verdict.output if verdict.ok else None
@@ -1,41 +1,68 @@
 import random
+from typing import Dict, List, Optional
+from src.agent.configuration import GAME_PRESETS, DEFAULT_PRESET, KNOWN_ROLES, validate_role_counts
 from src.agent.state import PlayerState, GameState
 
-def get_default_state() -> GameState:
-    """获取 12 人经典局的初始状态，并随机分配身份"""
-    # 定义 12 人标准局配置：4狼 4民 预女猎守
-    roles = (
-        ["werewolf"] * 4 + 
-        ["villager"] * 4 + 
-        ["seer", "witch", "hunter", "guard"]
-    )
+# 可选的性格特质 (checkpoint 序列化按下标引用，只能在末尾追加)
+PERSONALITIES = [
+    "逻辑严密、冷静分析票型，不容易被煽动",
+    "直觉敏锐、关注发言者的语气细节，敢于质疑",
+    "激进博弈、倾向于带节奏进行对抗，不怕被针对",
+    "稳健慎重、在信息不足时倾向于保守观察，不轻易站边",
+    "强势领导、喜欢作为警长带队，对不一致的逻辑零容忍",
+    "感性共情、容易信任表态诚恳的玩家，但也可能被欺骗"
+]
+
+def build_role_list(role_counts: Dict[str, int]) -> List[str]:
+    """按固定角色顺序展开角色数量配置，如 {"werewolf": 2, "seer": 1} -> ["werewolf", "werewolf", "seer"]"""
+    roles: List[str] = []
+    for role in KNOWN_ROLES:
+        roles.extend([role] * role_counts.get(role, 0))
+    return roles
+
+def new_seed() -> int:
+    """生成新的对局随机种子"""
+    return random.SystemRandom().randrange(2**32)
+
+def get_rng(state: GameState, *salt: object) -> random.Random:
+    """获取对局内的确定性随机数生成器。
+
+    由对局种子与调用点标识 (如天数、环节) 派生，同一状态下多次调用结果一致，
+    保证录制的对局可以逐字节重放；旧状态没有种子时退化为非确定性随机。
+    """
+    seed = state.get("seed")
+    if seed is None:
+        return random.Random()
+    return random.Random(":".join(str(x) for x in (seed, *salt)))
+
+def get_default_state(role_counts: Optional[Dict[str, int]] = None, seed: Optional[int] = None) -> GameState:
+    """获取初始对局状态，并随机分配身份。默认为 12 人经典局（4狼 4民 预女猎守）
+
+    相同的 `seed` 与角色配置总是产生相同的身份与性格分配。
+    """
+    counts = validate_role_counts(role_counts or GAME_PRESETS[DEFAULT_PRESET])
+    roles = build_role_list(counts)
+    if seed is None:
+        seed = new_seed()
+    rng = random.Random(seed)
     
     # 随机打乱身份
-    random.shuffle(roles)
+    rng.shuffle(roles)
     
 
-    # 定义可选的性格特质
-    personalities = [
-        "逻辑严密、冷静分析票型，不容易被煽动",
-        "直觉敏锐、关注发言者的语气细节，敢于质疑",
-        "激进博弈、倾向于带节奏进行对抗，不怕被针对",
-        "稳健慎重、在信息不足时倾向于保守观察，不轻易站边",
-        "强势领导、喜欢作为警长带队，对不一致的逻辑零容忍",
-        "感性共情、容易信任表态诚恳的玩家，但也可能被欺骗"
-    ]
-
     players = []
     for i, role in enumerate(roles):
         players.append(PlayerState(
             id=i + 1,
             role=role,
-            personality=random.choice(personalities),
+            personality=rng.choice(PERSONALITIES),
             is_alive=True,
             private_history=[],
             private_thoughts=[]
         ))
         
     return {
+        "seed": seed,
         "players": players,
         "alive_players": [p.id for p in players],
         "phase": "night",
@@ -45,16 +72,25 @@ def get_default_state() -> GameState:
         "discussion_queue": [],
         "history": [],
         "game_summary": "游戏刚刚开始，暂无历史总结。",
+        "fact_log": [],
+        "role_claims": {},
+        "fact_cursor": 0,
+        "vote_matrix": {},
+        "vote_log": [],
+        "night_log": [],
         "night_actions": {},
         "votes": {},
-        "witch_potions": {"save": True, "poison": True},
+        "witch_potions": {"save": "witch" in counts, "poison": "witch" in counts},
         "last_guarded_id": None,
-        "hunter_can_shoot": True,
+        "hunter_can_shoot": "hunter" in counts,
         "pending_hunter_shoot": None,
         "last_night_dead": [],
         "last_execution_id": None,
         "sheriff_id": None,
         "election_candidates": [],
         "game_over": False,
-        "winner_side": None
+        "winner_side": None,
+        "token_usage": {},
+        "budget_degraded": {},
+        "budget_report": None
     }
@@ -1,6 +1,27 @@
+from typing import Any, Callable, Dict
+
 import pytest
 
 
 @pytest.fixture(scope="session")
 def anyio_backend():
     return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def bot_config() -> Callable[..., Dict[str, Any]]:
+    """构造整局规则机器人对局的 graph config：`bot_config("classic_9", 3, validation_stats=stats)`"""
+
+    def build(preset: str, seed: int, **configurable: Any) -> Dict[str, Any]:
+        return {"recursion_limit": 2000, "configurable": {"preset": preset, "seed": seed, "player_policy": "bot", **configurable}}
+
+    return build
+
+
+@pytest.fixture(scope="session")
+def bot_game(bot_config) -> Callable[..., Dict[str, Any]]:
+    """跑完一局规则机器人对局并返回终局状态，参数同 `bot_config`"""
+    from src.agent.graph import workflow
+
+    graph = workflow.compile()
+    return lambda preset, seed, **configurable: graph.invoke({}, bot_config(preset, seed, **configurable))
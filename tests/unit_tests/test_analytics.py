@@ -0,0 +1,27 @@
+import pytest
+
+from src.agent.analytics import ColumnarExporter, game_rows
+
+
+def test_game_rows_cover_all_tables(bot_game) -> None:
+    final = bot_game("classic_9", 3)
+    rows = game_rows("g3", final)
+    assert rows["games"][0]["winner_side"] == final["winner_side"]
+    assert len(rows["players"]) == 9
+    assert sum(r["won"] for r in rows["players"]) == sum(1 for p in final["players"] if (p.role == "werewolf") == (final["winner_side"] == "werewolf"))
+    assert any(r["was_sheriff"] for r in rows["players"])
+    assert {r["kind"] for r in rows["votes"]} >= {"sheriff", "exile"}
+    assert all(r["voter_role"] for r in rows["votes"])
+    assert any(r["action"] == "wolf_kill" and r["day"] == 1 for r in rows["night_actions"])
+    assert [r["seq"] for r in rows["speeches"]] == sorted(r["seq"] for r in rows["speeches"])
+    assert max(r["day"] for r in rows["speeches"]) <= final["day_count"]
+
+
+def test_exporter_writes_row_groups(tmp_path, bot_game) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    with ColumnarExporter(str(tmp_path), row_group_size=2) as exporter:
+        for seed in range(3):
+            exporter.add(f"g{seed}", bot_game("classic_9", seed))
+    games = pq.ParquetFile(exporter.path("games"))
+    assert games.metadata.num_rows == 3 and games.metadata.num_row_groups == 2
+    assert pq.read_table(exporter.path("players")).num_rows == 27
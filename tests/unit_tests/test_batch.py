@@ -0,0 +1,52 @@
+import json
+
+from src.agent.batch import BATCH_COST_FACTOR, BatchRunner, LocalBatchClient
+from src.agent.configuration import DEFAULT_MODEL_TIERS
+from src.agent.mock_openai import MockBehavior, MockOpenAIServer
+from src.agent.model_tiers import ModelUsageStats
+
+
+class DroppingClient:
+    """模拟批任务结果全部缺失"""
+
+    def __init__(self) -> None:
+        self.requests = 0
+
+    def run(self, input_path: str, output_path: str) -> str:
+        with open(input_path, encoding="utf-8") as f:
+            self.requests += sum(1 for _ in f)
+        open(output_path, "w").close()
+        return output_path
+
+
+def test_games_pause_at_frontier_and_resume_from_batches(tmp_path) -> None:
+    server = MockOpenAIServer(port=0, behavior=MockBehavior(latency="fixed", median_s=0.0, seed=3))
+    server.start_in_thread()
+    usage = ModelUsageStats()
+    runner = BatchRunner(LocalBatchClient(server.base_url), workdir=str(tmp_path))
+    for i in range(3):
+        runner.add_game(f"g{i}", {"preset": "classic_6", "seed": i, "usage_stats": usage})
+    finals = runner.run()
+
+    assert all(state["game_over"] for state in finals.values())
+    requests = sum(r.requests for r in runner.rounds)
+    assert requests == server.stats.requests and len(runner.rounds) < requests
+
+    first = [json.loads(line) for line in (tmp_path / "round-0000.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert {line["custom_id"].split("::")[0] for line in first} == {"g0", "g1", "g2"}
+    assert first[0]["body"]["tools"][0]["function"]["name"] == first[0]["body"]["tool_choice"]["function"]["name"]
+
+    for tier, stats in usage.snapshot().items():
+        price = DEFAULT_MODEL_TIERS[tier]
+        full = (stats.input_tokens * price["input_cost_per_mtok"] + stats.output_tokens * price["output_cost_per_mtok"]) / 1e6
+        assert abs(stats.cost_usd - full * BATCH_COST_FACTOR) < 1e-9
+
+
+def test_missing_results_fall_back_and_games_still_finish(tmp_path) -> None:
+    client = DroppingClient()
+    runner = BatchRunner(client, workdir=str(tmp_path))
+    # 两个座位走大模型（结果缺失 → 兜底），其余为规则机器人，保证对局能结束
+    runner.add_game("g0", {"preset": "classic_6", "seed": 1, "player_policy": "bot", "seat_policies": {1: "llm", 2: "llm"}})
+    finals = runner.run()
+    assert finals["g0"]["game_over"]
+    assert client.requests == sum(r.failed for r in runner.rounds) > 0
@@ -0,0 +1,68 @@
+import pytest
+
+from src.agent.budget import apply_budget, budget_level, metered_usage, render_budget_report
+from src.agent.graph import workflow
+from src.agent.mock_openai import MockBehavior, MockOpenAIServer, mock_model_tiers
+from src.agent.model_tiers import ModelUsageStats
+from src.agent.replay import record_game, replay_game, state_digest
+
+
+def _usage(cost, tokens):
+    return {"full": {"calls": 1, "input_tokens": tokens, "output_tokens": 0, "cost_usd": cost}}
+
+
+def test_levels_and_degraded_config() -> None:
+    budget = {"soft_usd": 0.01, "hard_tokens": 1000}
+    assert budget_level(_usage(0.001, 10), budget) == "ok"
+    assert budget_level(_usage(0.02, 10), budget) == "soft"
+    assert budget_level(_usage(0.02, 5000), budget) == "hard"
+    assert budget_level(_usage(9.0, 10**9), None) == "ok"
+
+    config = {"configurable": {"budget": budget, "history_window": 20, "seat_policies": {3: "llm", 4: "scripted"}}}
+    soft, level = apply_budget(config, {"token_usage": _usage(0.02, 10)})
+    assert level == "soft" and soft["configurable"]["history_window"] == 8
+    assert "player_policy" not in soft["configurable"] and "tier_override" not in soft["configurable"]
+    hard, level = apply_budget(config, {"token_usage": _usage(0.02, 5000)})
+    assert level == "hard" and hard["configurable"]["player_policy"] == "bot"
+    assert hard["configurable"]["seat_policies"] == {3: "bot", 4: "scripted"}
+    assert apply_budget(config, {"token_usage": {}}) == (config, "ok")
+
+
+def test_soft_tier_must_be_cheaper() -> None:
+    budget = {"soft_usd": 0.01, "soft_tier": "fast"}
+    with pytest.raises(ValueError, match="soft_tier"):
+        apply_budget({"configurable": {"budget": budget}}, {"token_usage": {}})  # 默认 fast 与 full 同价
+    cheap = {"fast": {"model": "small", "input_cost_per_mtok": 0.05, "output_cost_per_mtok": 0.2}}
+    soft, level = apply_budget({"configurable": {"budget": budget, "model_tiers": cheap}}, {"token_usage": _usage(0.02, 10)})
+    assert level == "soft" and soft["configurable"]["tier_override"] == "fast"
+
+
+def test_usage_is_metered_per_node() -> None:
+    stats = ModelUsageStats()
+    with metered_usage() as usage:
+        stats.record("fast", {"input_cost_per_mtok": 1.0}, 0.1, input_tokens=1000, output_tokens=10)
+    stats.record("fast", {}, 0.1, input_tokens=5)  # 计量上下文之外不计入
+    assert usage == {"fast": {"calls": 1, "input_tokens": 1000, "output_tokens": 10, "cost_usd": 0.001}}
+
+
+def test_hard_budget_hands_llm_seats_to_bots_and_reports(tmp_path) -> None:
+    server = MockOpenAIServer(port=0, behavior=MockBehavior(latency="fixed", median_s=0.0, seed=6))
+    server.start_in_thread()
+    tiers = mock_model_tiers(server.base_url)
+    for params in tiers.values():
+        params.update(input_cost_per_mtok=1.0, output_cost_per_mtok=1.0)
+    configurable = {"preset": "classic_9", "seed": 6, "model_tiers": tiers, "budget": {"soft_tokens": 3000, "hard_tokens": 6000}}
+    graph = workflow.compile()
+    final = record_game(configurable, str(tmp_path / "g.jsonl"), graph=graph, recursion_limit=2000)
+
+    report = final["budget_report"]
+    assert final["game_over"] and report["level"] == "hard"
+    assert report["degraded_decisions"]["hard"] > 0
+    total = report["total"]
+    # 硬上限之后不再发出模型调用：只可能被最后一轮并行调用略微超出
+    assert total["input_tokens"] + total["output_tokens"] < 6000 + 9 * 2000
+    assert "预算级别：hard" in render_budget_report(report)
+
+    replayed = replay_game(str(tmp_path / "g.jsonl"), graph=graph, recursion_limit=2000)
+    assert replayed["token_usage"] == final["token_usage"]
+    assert state_digest(replayed) == state_digest(final)
@@ -0,0 +1,106 @@
+import sqlite3
+from typing import Optional, TypedDict
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+from src.agent.checkpointer import SQLiteCheckpointer
+
+
+class _DayState(TypedDict):
+    day_count: int
+    phase: str
+    turn_type: str
+    current_player_id: Optional[int]
+    acted: bool
+    game_over: bool
+
+
+def _tick(state: _DayState) -> dict:
+    # 每个阶段 4 个回合、每回合 2 步（GM 点名 + 玩家行动，后者不改变回合键），共 3 天
+    if state["current_player_id"] is not None and not state["acted"]:
+        return {"acted": True}
+    turn = state["current_player_id"] or 0
+    if turn < 4:
+        return {"current_player_id": turn + 1, "acted": False}
+    if state["phase"] == "night":
+        return {"phase": "day", "current_player_id": None}
+    if state["day_count"] == 3:
+        return {"game_over": True}
+    return {"phase": "night", "day_count": state["day_count"] + 1, "current_player_id": None}
+
+
+def _build(saver: SQLiteCheckpointer):
+    builder = StateGraph(_DayState)
+    builder.add_node("tick", _tick)
+    builder.add_edge(START, "tick")
+    builder.add_conditional_edges("tick", lambda s: END if s["game_over"] else "tick")
+    return builder.compile(checkpointer=saver)
+
+
+_START = {"day_count": 1, "phase": "night", "turn_type": "discussion", "current_player_id": None, "acted": False, "game_over": False}
+
+
+def _count(path: str, table: str) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+@pytest.mark.parametrize("durability", ["step", "turn", "phase"])
+def test_policies_persist_fewer_checkpoints_and_resume(tmp_path, durability: str) -> None:
+    path = str(tmp_path / "games.db")
+    saver = SQLiteCheckpointer(path, durability=durability, keep_last=1000)
+    config = {"configurable": {"thread_id": "g1"}, "recursion_limit": 200}
+    final = _build(saver).invoke(_START, config)
+    saver.close()
+    assert final["game_over"]
+    assert saver.stats.durable < saver.stats.puts or durability == "step"
+    assert saver.stats.flushes < saver.stats.durable or durability == "phase"
+    assert _count(path, "checkpoints") == saver.stats.durable
+
+    # 新进程：从磁盘恢复最新状态
+    reopened = SQLiteCheckpointer(path, durability=durability)
+    state = _build(reopened).get_state(config)
+    assert state.values == final
+    reopened.close()
+
+
+def test_phase_policy_writes_far_less_than_step(tmp_path) -> None:
+    counts = {}
+    for durability in ("step", "phase"):
+        saver = SQLiteCheckpointer(str(tmp_path / f"{durability}.db"), durability=durability)
+        _build(saver).invoke(_START, {"configurable": {"thread_id": "g"}, "recursion_limit": 200})
+        saver.close()
+        counts[durability] = saver.stats.durable
+    assert counts["phase"] * 5 < counts["step"]
+
+
+def test_old_checkpoints_are_pruned_per_thread(tmp_path) -> None:
+    path = str(tmp_path / "games.db")
+    saver = SQLiteCheckpointer(path, durability="step", keep_last=3, batch_size=4)
+    graph = _build(saver)
+    for thread in ("a", "b"):
+        graph.invoke(_START, {"configurable": {"thread_id": thread}, "recursion_limit": 200})
+    saver.close()
+    assert _count(path, "checkpoints") == 6
+    assert saver.stats.pruned > 0
+    # 保留下来的 checkpoint 所引用的通道值都还在
+    reopened = SQLiteCheckpointer(path)
+    assert _build(reopened).get_state({"configurable": {"thread_id": "a"}}).values["game_over"]
+    reopened.close()
+
+
+@pytest.mark.parametrize("durability", ["step", "turn"])
+def test_memory_is_pruned_with_disk(tmp_path, durability: str) -> None:
+    saver = SQLiteCheckpointer(str(tmp_path / "games.db"), durability=durability, keep_last=3, batch_size=4)
+    graph = _build(saver)
+    for thread in ("a", "b", "c"):
+        graph.invoke(_START, {"configurable": {"thread_id": thread}, "recursion_limit": 200})
+    # 每个线程在内存中只剩保留窗口内的 checkpoint，写入记录与通道值随之清理
+    kept = {(t, cid) for t, by_ns in saver.storage.items() for cid in by_ns[""]}
+    assert len(kept) <= 3 * (3 + 2)
+    assert all((t, cid) in kept for t, _, cid in saver.writes)
+    assert len(saver.blobs) <= len(kept) * len(_START)
+    assert saver.stats.puts > 3 * len(kept)
+    assert graph.get_state({"configurable": {"thread_id": "b"}}).values["game_over"]
+    saver.close()
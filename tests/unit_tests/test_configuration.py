@@ -1,9 +1,35 @@
+import pytest
 from langgraph.pregel import Pregel
 
-from agent.graph import graph
+from agent.configuration import GAME_PRESETS, Configuration, validate_role_counts
+from agent.graph import graph, init_node
 
 
 def test_placeholder() -> None:
     # TODO: You can add actual unit tests
     # for your graph and other logic here.
     assert isinstance(graph, Pregel)
+
+
+@pytest.mark.parametrize("preset", sorted(GAME_PRESETS))
+def test_presets_are_valid(preset: str) -> None:
+    counts = validate_role_counts(GAME_PRESETS[preset])
+    assert 6 <= sum(counts.values()) <= 30
+
+
+def test_init_node_uses_configured_roles() -> None:
+    config = {"configurable": {"role_counts": {"werewolf": 3, "villager": 4, "seer": 1}}}
+    state = init_node({}, config)
+    roles = sorted(p.role for p in state["players"])
+    assert roles == ["seer"] + ["villager"] * 4 + ["werewolf"] * 3
+    assert state["alive_players"] == list(range(1, 9))
+    assert state["witch_potions"] == {"save": False, "poison": False}
+
+
+def test_configuration_rejects_invalid_tables() -> None:
+    with pytest.raises(ValueError):
+        Configuration(role_counts={"werewolf": 3, "villager": 2, "seer": 1}).resolve_role_counts()
+    with pytest.raises(ValueError):
+        Configuration(role_counts={"werewolf": 2, "villager": 3, "seer": 2}).resolve_role_counts()
+    with pytest.raises(ValueError):
+        Configuration(preset="unknown").resolve_role_counts()
@@ -0,0 +1,113 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import openai
+import pytest
+
+from src.agent.endpoints import EndpointPool, NoHealthyEndpointError, call_with_endpoints
+from src.agent.graph import workflow
+from src.agent.mock_openai import MOCK_API_KEY, MockBehavior, MockOpenAIServer
+from src.agent.model_tiers import ModelUsageStats
+
+
+def _rate_limited() -> openai.RateLimitError:
+    response = httpx.Response(429, request=httpx.Request("POST", "http://x/v1/chat/completions"))
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_weighted_least_outstanding_selection() -> None:
+    pool = EndpointPool()
+    specs = [{"name": "a", "weight": 2}, {"name": "b"}]
+    held = [pool.acquire(specs)["name"] for _ in range(6)]
+    # 权重 2:1 → 未完成请求按 4:2 分布
+    assert held.count("a") == 4 and held.count("b") == 2
+
+
+def test_breaker_opens_fails_over_and_recovers_after_cooldown() -> None:
+    clock = FakeClock()
+    pool = EndpointPool(failure_threshold=2, cooldown_s=10.0, clock=clock)
+    specs = [{"name": "a", "weight": 4}, {"name": "b"}]
+    healthy = {"a": False, "b": True}
+
+    def fn(spec):
+        if not healthy[spec["name"]]:
+            raise _rate_limited()
+        return spec["name"]
+
+    assert [pool.call(specs, fn) for _ in range(4)] == ["b"] * 4
+    stats = pool.stats()
+    assert stats["a"].state == "open" and stats["a"].trips == 1 and stats["a"].failovers == 2
+
+    clock.now = 11.0
+    healthy["a"] = True
+    assert pool.call(specs, fn) == "a"  # 半开探测成功
+    assert pool.stats()["a"].state == "closed"
+
+
+def test_non_endpoint_errors_propagate_without_failover() -> None:
+    pool = EndpointPool()
+    with pytest.raises(ValueError):
+        pool.call([{"name": "a"}, {"name": "b"}], lambda spec: (_ for _ in ()).throw(ValueError("bad request")))
+    assert sum(s.calls for s in pool.stats().values()) == 1 and pool.stats()["a"].state == "closed"
+
+    with pytest.raises(NoHealthyEndpointError):
+        pool.call([{"name": "a"}, {"name": "b"}], lambda spec: (_ for _ in ()).throw(_rate_limited()))
+
+
+def test_llm_game_spreads_calls_and_survives_a_dead_endpoint() -> None:
+    server = MockOpenAIServer(port=0, behavior=MockBehavior(latency="fixed", median_s=0.0, seed=2))
+    server.start_in_thread()
+    pool = EndpointPool()
+    endpoints = [
+        {"name": "live-1", "openai_api_base": server.base_url, "api_key": MOCK_API_KEY},
+        {"name": "live-2", "openai_api_base": server.base_url, "api_key": MOCK_API_KEY},
+        {"name": "dead", "openai_api_base": "http://127.0.0.1:9/v1", "api_key": MOCK_API_KEY},
+    ]
+    tiers = {"full": {"endpoints": endpoints}, "fast": {"endpoints": endpoints}}
+    usage = ModelUsageStats()
+    config = {"recursion_limit": 2000, "configurable": {"preset": "classic_6", "seed": 4, "model_tiers": tiers, "endpoint_pool": pool, "usage_stats": usage}}
+    final = workflow.compile().invoke({}, config)
+
+    stats = pool.stats()
+    assert final["game_over"]
+    assert stats["live-1"].calls > 0 and stats["live-2"].calls > 0
+    assert stats["dead"].trips >= 1 and stats["dead"].calls < stats["live-1"].calls
+    assert all(s.failures == 0 for s in usage.snapshot().values())
+    assert call_with_endpoints(None, {"model": "m", "api_key": MOCK_API_KEY}, 16, lambda llm: llm.max_tokens) == 16
+
+
+def test_all_open_sheds_load_while_a_probe_is_in_flight() -> None:
+    clock = FakeClock()
+    pool = EndpointPool(failure_threshold=3, cooldown_s=100.0, clock=clock)
+    specs = [{"name": "only"}]
+    for _ in range(3):
+        with pytest.raises(NoHealthyEndpointError):
+            pool.call(specs, lambda spec: (_ for _ in ()).throw(_rate_limited()))
+    assert pool.stats()["only"].state == "open"
+
+    barrier = threading.Barrier(5)
+
+    def grab(_):
+        barrier.wait()
+        return pool.acquire(specs)
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        acquired = [spec for spec in executor.map(grab, range(5)) if spec is not None]
+    assert len(acquired) == 1 and pool.stats()["only"].in_flight == 1  # 只放行一个提前探测
+
+    calls = []
+    with pytest.raises(NoHealthyEndpointError):
+        pool.call(specs, calls.append)
+    assert calls == []
+
+    pool.release(acquired[0], ok=False)  # 探测失败：重新熔断，下一次仍只放行一个探测
+    assert pool.stats()["only"].state == "open" and pool.acquire(specs) is not None and pool.acquire(specs) is None
@@ -0,0 +1,73 @@
+from src.agent.facts import parse_claim, record_facts, render_vote_matrix, update_vote_matrix
+from src.agent.nodes.engine import action_handler_node
+from src.agent.state import Message, PlayerState
+
+
+def test_parse_claim() -> None:
+    assert parse_claim("我是预言家，昨晚查验3号是狼人，验了5号是金水。") == {"role": "预言家", "checks": {3: "狼人", 5: "好人"}}
+    assert parse_claim("我就是平民，过。") == {"role": "村民", "checks": {}}
+    assert parse_claim("验出7号查杀，大家跟我投。") == {"role": "预言家", "checks": {7: "狼人"}}
+    assert parse_claim("我是好人，我怀疑4号。") is None
+
+
+def test_voting_settle_records_votes_and_claims() -> None:
+    players = [PlayerState(id=i, role="werewolf" if i == 2 else "villager") for i in range(1, 5)]
+    state = {
+        "players": players,
+        "alive_players": [1, 2, 3, 4],
+        "phase": "day",
+        "turn_type": "voting_settle",
+        "day_count": 2,
+        "history": [
+            Message(role="system", content="【上帝公告】第2天。昨晚是平安夜。"),
+            Message(role="seer", content="我是预言家，查验2号是狼人。", player_id=1),
+        ],
+        "votes": {1: 2, 3: 2, 4: 1, 2: 1},
+        "sheriff_id": 1,
+        "fact_log": ["D2 天亮：平安夜"],
+        "fact_cursor": 1,
+    }
+    updates = action_handler_node(state, {})
+    assert updates["fact_log"] == ["D2 放逐投票（2,4→1，1,3→2），2号出局"]
+    assert updates["role_claims"] == {1: {"role": "预言家", "checks": {2: "狼人"}}}
+    assert updates["fact_cursor"] == 2
+    assert updates["vote_matrix"] == {1: {2: 1}, 3: {2: 1}, 4: {1: 1}, 2: {1: 1}}
+    assert "存活：1、3、4号" in updates["game_summary"]
+    assert "D2 天亮：平安夜；D2 放逐投票" in updates["game_summary"]
+
+    # 没有新发言与新事件时账本不变
+    again = record_facts({**state, "turn_type": "voting_announcement", "fact_cursor": 2, "role_claims": updates["role_claims"]}, {})
+    assert again["fact_log"] == [] and again["role_claims"] == updates["role_claims"]
+
+
+def test_bot_game_ledger_covers_every_morning(bot_game) -> None:
+    final = bot_game("classic_9", 3)
+    mornings = [f for f in final["fact_log"] if "天亮" in f]
+    assert [m.split()[0] for m in mornings] == [f"D{d}" for d in range(1, final["day_count"] + 1)]
+    assert final["game_summary"].startswith("存活：")
+
+
+def test_vote_matrix_accumulates_and_renders_co_votes() -> None:
+    matrix = update_vote_matrix({}, {1: 5, 2: 5, 3: None, 4: 1})
+    matrix = update_vote_matrix(matrix, {1: 4, 2: 4, 3: 4, 4: 1})
+    assert matrix == {1: {5: 1, 4: 1}, 2: {5: 1, 4: 1}, 3: {4: 1}, 4: {1: 2}}
+    assert render_vote_matrix(matrix) == "1号→4号、5号\n2号→4号、5号\n3号→4号\n4号→1号×2\n同票：1&2×2"
+    assert render_vote_matrix({}) == "暂无投票记录"
+
+
+def test_night_log_records_day_skills_once(bot_game) -> None:
+    final = bot_game("classic_12", 4)
+    transfers = [(r["day"], r["target"]) for r in final["night_log"] if r["action"] == "sheriff_transfer"]
+    announced = [m for m in final["history"] if "警徽移交" in m.content]
+    assert transfers == [(3, 4), (3, 11)] and len(announced) == 2
+    assert all(r["target"] is not None for r in final["night_log"])
+    night_keys = {"guard_protect", "wolf_kill", "seer_check", "witch_save", "witch_poison"}
+    assert {r["action"] for r in final["night_log"]} <= night_keys | {"sheriff_transfer", "hunter_shoot"}
+
+
+def test_sheriff_tie_announces_no_sheriff(bot_game) -> None:
+    final = bot_game("classic_6", 6)
+    notices = [m.content for m in final["history"] if "警长竞选" in m.content]
+    assert notices == ["【上帝公告】警长竞选出现平票（玩家 3, 6），无人当选，本局没有警长。"]
+    assert "D1 警长投票（1,4→3，2,5→6），3、6号平票，无人当选" in final["fact_log"]
+    assert not any("PK" in m.content for m in final["history"][:5])
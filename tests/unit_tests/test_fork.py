@@ -0,0 +1,87 @@
+import asyncio
+from typing import List, Optional, TypedDict
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Send
+
+from src.agent.fork import Branch, find_fork_points, fork_state, format_rollout_report, run_rollouts
+from src.agent.graph import resume_router
+from src.utils.helpers import get_default_state, get_rng
+
+
+class _TurnState(TypedDict):
+    seed: Optional[int]
+    players: List[int]
+    day_count: int
+    turn_type: str
+    game_over: bool
+    winner_side: Optional[str]
+
+
+def _game_master(state: _TurnState) -> dict:
+    if state["day_count"] >= 3:
+        winner = get_rng(state, "winner").choice(["werewolf", "villager"])
+        return {"game_over": True, "winner_side": winner}
+    return {"day_count": state["day_count"] + 1, "turn_type": "voting"}
+
+
+def _toy_graph(checkpointer=None):
+    builder = StateGraph(_TurnState)
+    builder.add_node("game_master", _game_master)
+    builder.add_node("player_agent", lambda s: {"turn_type": "voting_settle"})
+    builder.add_edge(START, "game_master")
+    builder.add_conditional_edges("game_master", lambda s: END if s["game_over"] else "player_agent")
+    builder.add_edge("player_agent", "game_master")
+    return builder.compile(checkpointer=checkpointer)
+
+
+_START = {"seed": 1, "players": [1, 2, 3], "day_count": 0, "turn_type": "night", "game_over": False, "winner_side": None}
+
+
+def test_find_fork_points_returns_decision_points_in_order() -> None:
+    app = _toy_graph(InMemorySaver())
+    config = {"configurable": {"thread_id": "g1"}}
+    app.invoke(_START, config)
+    points = find_fork_points(app, config, turn_type="voting")
+    assert [p.day_count for p in points] == [1, 2, 3]
+    assert all(p.resume_node == "dispatch" and p.checkpoint_id for p in points)
+    assert find_fork_points(app, config, turn_type="voting", day_count=2)[0].values["day_count"] == 2
+
+
+def test_fork_state_is_copy_on_write() -> None:
+    state = get_default_state(seed=3)
+    forked = fork_state(state, seed=9, personalities={1: "激进"})
+    assert forked["seed"] == 9 and state["seed"] == 3
+    assert forked["players"][0].personality == "激进"
+    assert forked["players"][0] is not state["players"][0]
+    assert forked["players"][1] is state["players"][1]
+    assert forked["history"] is state["history"]
+
+
+def test_resume_router_redispatches_parallel_turn() -> None:
+    state = get_default_state(seed=3)
+    state.update({"turn_type": "voting", "current_player_id": None, "parallel_player_ids": [1, 2, 3]})
+    sends = resume_router(state, {"configurable": {}})
+    assert [s.arg["current_player_id"] for s in sends if isinstance(s, Send)] == [1, 2, 3]
+    assert resume_router(state, {"configurable": {"resume_node": "game_master"}}) == "game_master"
+
+
+def test_run_rollouts_aggregates_win_rates_per_branch() -> None:
+    app = _toy_graph(InMemorySaver())
+    config = {"configurable": {"thread_id": "g1"}}
+    app.invoke(_START, config)
+    point = find_fork_points(app, config, turn_type="voting", day_count=2)[0]
+
+    resume = _toy_graph()  # 玩具图从 GM 开始，等价于 resume_node="game_master"
+    branches = [Branch("a", seed=1), Branch("b", seed=2)]
+    results = asyncio.run(run_rollouts(point, branches, k=10, graph=resume))
+    again = asyncio.run(run_rollouts(point, branches, k=10, graph=resume))
+
+    for name, result in results.items():
+        assert result.rollouts == 10 and result.failed == 0
+        assert sum(result.wins.values()) == 10
+        assert result.win_rate("werewolf") + result.win_rate("villager") == 1.0
+        assert result.wins == again[name].wins
+    assert "a" in format_rollout_report(results)
+
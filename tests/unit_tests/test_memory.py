@@ -0,0 +1,58 @@
+import re
+
+from src.agent.memory import (
+    DIGEST_MAX_CHARS,
+    PRIVATE_HISTORY_LIMIT,
+    THOUGHTS_LIMIT,
+    recent_thoughts,
+    remember_private,
+    remember_thought,
+)
+from src.agent.nodes.roles import get_role_instructions
+from src.agent.serde import GameStateSerializer
+from src.agent.state import Message, PlayerState
+from src.utils.helpers import get_default_state
+
+
+def test_private_memory_stays_bounded_for_whole_game() -> None:
+    player = PlayerState(id=1, role="villager")
+    for i in range(500):
+        before = player
+        player = remember_thought(player, f"第{i}轮想法：怀疑{i % 12}号。后面是很长的补充推理" * 3, day=i // 10)
+        assert before.private_thoughts is not player.private_thoughts
+    assert len(player.private_thoughts) == THOUGHTS_LIMIT
+    assert player.private_thoughts[-1].startswith("第499轮想法")
+    assert 0 < len(player.thought_digest) <= DIGEST_MAX_CHARS
+    assert "D49:" in player.thought_digest and "D0:" not in player.thought_digest
+    prompt = recent_thoughts(player)
+    assert prompt.startswith("（早前想法摘要）") and prompt.endswith(player.private_thoughts[-1])
+
+
+def test_prompt_thoughts_have_no_gap() -> None:
+    player = PlayerState(id=1, role="villager")
+    for i in range(1, 11):
+        player = remember_thought(player, f"想法{i}。补充", day=1)
+    prompt = recent_thoughts(player)
+    # 每条想法要么以原文、要么以摘要短句出现在提示词中
+    assert all(re.search(f"想法{i}(?!\\d)", prompt) for i in range(1, 11))
+
+
+def test_seer_keeps_compacted_check_results() -> None:
+    state = get_default_state(seed=5)
+    seer = next(p for p in state["players"] if p.role == "seer")
+    for target in range(1, PRIVATE_HISTORY_LIMIT + 4):
+        res = "狼人" if target % 3 == 0 else "好人"
+        seer = remember_private(seer, Message(role="system", content=f"查验反馈：{target}号玩家的身份是【{res}】。"))
+    assert len(seer.private_history) == PRIVATE_HISTORY_LIMIT
+    assert seer.history_digest == "1号=好人；2号=好人；3号=狼人"
+    state["players"] = [seer if p.id == seer.id else p for p in state["players"]]
+    instructions = get_role_instructions(seer, state)
+    assert "早前查验：1号=好人；2号=好人；3号=狼人" in instructions
+
+
+def test_digests_survive_compact_serde() -> None:
+    serde = GameStateSerializer()
+    player = PlayerState(id=2, role="seer", history_digest="1号=好人", thought_digest="D1:先观察")
+    assert serde.loads_typed(serde.dumps_typed([player])) == [player]
+    plain = PlayerState(id=3, role="villager")
+    assert serde.loads_typed(serde.dumps_typed(plain)) == plain
@@ -0,0 +1,39 @@
+import dataclasses
+import sys
+
+import pytest
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from src.agent.serde import GameStateSerializer
+from src.agent.state import Message, PlayerState
+
+
+def _dynamic(text: str) -> str:
+    return "".join(list(text))  # 运行期拼接，得到新的字符串对象
+
+
+def test_message_is_slotted_immutable_and_interned() -> None:
+    a = Message(role=_dynamic("system"), content=_dynamic("【上帝公告】昨晚是平安夜。"))
+    b = Message(role="system", content=_dynamic("【上帝公告】昨晚是平安夜。"))
+    assert not hasattr(a, "__dict__")
+    assert a.content is b.content and a.role is b.role
+    assert a == b and hash(a) == hash(b)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        a.content = "x"  # type: ignore[misc]
+
+    speech = Message(role=_dynamic("seer"), content=_dynamic("我是预言家，查杀3号。"), player_id=2)
+    assert speech.role is sys.intern("seer")
+    long_notice = _dynamic("公" * 300)
+    assert Message(role="system", content=long_notice).content is long_notice  # 过长的内容不驻留
+
+
+def test_player_state_and_checkpoints_keep_messages() -> None:
+    msg = Message(role="system", content="第1天私有记录")
+    player = PlayerState(id=1, role="seer", private_history=[msg, {"role": "system", "content": "查验：2号是好人"}])
+    assert player.private_history[0] is msg
+    assert all(isinstance(m, Message) for m in player.private_history)
+
+    for serde in (JsonPlusSerializer(allowed_msgpack_modules=[PlayerState, Message]), GameStateSerializer()):
+        restored = serde.loads_typed(serde.dumps_typed([player]))
+        assert restored == [player]
+        assert isinstance(restored[0].private_history[1], Message)
@@ -0,0 +1,60 @@
+import json
+import random
+import urllib.error
+import urllib.request
+
+import pytest
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.agent.graph import workflow
+from src.agent.mock_openai import MOCK_API_KEY, MockBehavior, MockOpenAIServer, fake_arguments, mock_model_tiers
+from src.agent.model_tiers import ModelUsageStats, get_tier_llm
+from src.agent.schema import DiscussionOutput, NightAction, VotingOutput
+from src.agent.streaming import SpeechStreamer, stream_structured_call
+
+
+@pytest.fixture(scope="module")
+def server() -> MockOpenAIServer:
+    server = MockOpenAIServer(port=0, behavior=MockBehavior(latency="fixed", median_s=0.0, seed=7))
+    server.start_in_thread()
+    return server
+
+
+def test_fake_arguments_follow_schema_and_prompt_targets() -> None:
+    parameters = convert_to_openai_tool(NightAction)["function"]["parameters"]
+    messages = [{"role": "system", "content": "- ID：3"}, {"role": "user", "content": "【玩家 3】: 我怀疑5号"}]
+    for seed in range(20):
+        action = NightAction(**fake_arguments(parameters, messages, random.Random(seed)))
+        assert action.target_id == 5
+
+
+def test_structured_calls_round_trip(server: MockOpenAIServer) -> None:
+    llm = get_tier_llm({"model": "deepseek-chat", "openai_api_base": server.base_url, "api_key": MOCK_API_KEY}, 256)
+    result = llm.with_structured_output(VotingOutput, method="function_calling", include_raw=True).invoke("【玩家 2】: 投1号")
+    assert result["parsing_error"] is None and result["parsed"].target_id in (1, 2)
+    assert result["raw"].usage_metadata["input_tokens"] > 0
+
+    deltas = []
+    streamer = SpeechStreamer(deltas.append, player_id=1, turn_type="discussion", day=1)
+    streamed = stream_structured_call(llm, DiscussionOutput, "请发言", streamer)
+    assert streamed["parsing_error"] is None
+    assert "".join(d["delta"] for d in deltas) == streamed["parsed"].speech
+    assert server.stats.streamed >= 1
+
+
+def test_injected_rate_limit() -> None:
+    server = MockOpenAIServer(port=0, behavior=MockBehavior(latency="fixed", median_s=0.0, rate_limit_rate=1.0))
+    server.start_in_thread()
+    request = urllib.request.Request(f"{server.base_url}/chat/completions", data=json.dumps({"messages": []}).encode())
+    with pytest.raises(urllib.error.HTTPError) as e:
+        urllib.request.urlopen(request, timeout=5)
+    assert e.value.code == 429 and server.stats.rate_limited == 1
+
+
+def test_llm_game_runs_against_mock(server: MockOpenAIServer) -> None:
+    usage = ModelUsageStats()
+    configurable = {"preset": "classic_6", "seed": 1, "model_tiers": mock_model_tiers(server.base_url), "usage_stats": usage}
+    final = workflow.compile().invoke({}, {"recursion_limit": 2000, "configurable": configurable})
+    assert final["game_over"]
+    assert sum(s.calls for s in usage.snapshot().values()) > 0
+    assert all(s.failures == 0 for s in usage.snapshot().values())
@@ -0,0 +1,137 @@
+import threading
+import time
+from typing import List, TypedDict
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+from src.agent.host import GameHost
+from src.agent.model_pool import ModelWorkerPool, run_model_call
+
+
+def test_pool_bounds_concurrency_and_round_robins_games() -> None:
+    pool = ModelWorkerPool(max_workers=1)
+    order: List[str] = []
+    gate = threading.Event()
+
+    def blocker() -> None:
+        gate.wait(timeout=5)
+
+    def call(game_id: str) -> None:
+        pool.submit(game_id, lambda: order.append(game_id))
+
+    # 占住唯一的 worker，然后让 a 桌排 6 个请求、b 桌排 2 个请求
+    holder = threading.Thread(target=pool.submit, args=("a", blocker))
+    holder.start()
+    while pool.in_flight == 0:
+        time.sleep(0.001)
+    threads = [threading.Thread(target=call, args=("a",)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    while pool.stats()["a"].queued < 6:
+        time.sleep(0.001)
+    threads += [threading.Thread(target=call, args=("b",)) for _ in range(2)]
+    for t in threads[6:]:
+        t.start()
+    while pool.stats().get("b") is None or pool.stats()["b"].queued < 2:
+        time.sleep(0.001)
+
+    gate.set()
+    for t in [holder, *threads]:
+        t.join(timeout=5)
+
+    # b 桌不会排在 a 桌全部 6 个请求之后
+    assert order.index("b") <= 1
+    assert order[:4].count("b") == 2
+    stats = pool.stats()
+    assert stats["a"].completed == 7 and stats["b"].completed == 2
+    assert pool.in_flight == 0
+
+
+def test_run_model_call_without_pool_calls_directly() -> None:
+    assert run_model_call({}, lambda: 42) == 42
+
+
+class _CounterState(TypedDict):
+    count: int
+    game_over: bool
+
+
+def _step(state: _CounterState, config) -> dict:
+    value = run_model_call(config, lambda: state["count"] + 1)
+    return {"count": value, "game_over": value >= 3}
+
+
+@pytest.mark.anyio
+async def test_host_runs_games_concurrently_through_shared_pool() -> None:
+    builder = StateGraph(_CounterState)
+    builder.add_node("step", _step)
+    builder.add_edge(START, "step")
+    builder.add_conditional_edges("step", lambda s: END if s["game_over"] else "step")
+    host = GameHost(graph=builder.compile(), max_workers=2)
+    for i in range(5):
+        host.add_game(f"t{i}", initial_state={"count": 0, "game_over": False})
+
+    results = await host.run()
+
+    assert all(r is not None and r["count"] == 3 for r in results.values())
+    progress = {p.game_id: p for p in host.progress()}
+    assert all(p.status == "finished" and p.model_calls == 3 for p in progress.values())
+
+
+def test_live_calls_jump_ahead_of_queued_batch_calls() -> None:
+    pool = ModelWorkerPool(max_workers=1)
+    order: List[str] = []
+    gate = threading.Event()
+    holder = threading.Thread(target=pool.submit, args=("batch-0", lambda: gate.wait(timeout=5)), kwargs={"priority": "batch"})
+    holder.start()
+    while pool.in_flight == 0:
+        time.sleep(0.001)
+
+    def call(game_id: str, priority: str) -> None:
+        pool.submit(game_id, lambda: order.append(priority), priority=priority)
+
+    threads = [threading.Thread(target=call, args=("batch-1", "batch")) for _ in range(4)]
+    for t in threads:
+        t.start()
+    while pool.class_stats()["batch"].queued < 4:
+        time.sleep(0.001)
+    live = threading.Thread(target=call, args=("live-0", "live"))
+    live.start()
+    while pool.class_stats()["live"].queued < 1:
+        time.sleep(0.001)
+
+    gate.set()
+    for t in [holder, live, *threads]:
+        t.join(timeout=5)
+
+    assert order[0] == "live"
+    stats = pool.class_stats()
+    assert stats["batch"].preempted >= 1
+    assert stats["live"].granted == 1 and stats["batch"].granted == 5
+
+
+def test_unknown_priority_class_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        ModelWorkerPool().submit("g", lambda: None, priority="vip")
+
+
+@pytest.mark.anyio
+async def test_host_leaves_loop_executor_alone_and_releases_threads() -> None:
+    import asyncio
+
+    builder = StateGraph(_CounterState)
+    builder.add_node("step", _step)
+    builder.add_edge(START, "step")
+    builder.add_conditional_edges("step", lambda s: END if s["game_over"] else "step")
+    graph = builder.compile()
+    loop = asyncio.get_running_loop()
+    default_executor = getattr(loop, "_default_executor", None)
+
+    for batch in range(3):
+        host = GameHost(graph=graph, max_workers=2)
+        for i in range(4):
+            host.add_game(f"b{batch}-t{i}", initial_state={"count": 0, "game_over": False})
+        assert all(r["count"] == 3 for r in (await host.run()).values())
+        assert not [t for t in threading.enumerate() if t.name.startswith("game-host")]
+    assert getattr(loop, "_default_executor", None) is default_executor
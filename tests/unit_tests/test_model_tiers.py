@@ -0,0 +1,51 @@
+import pytest
+from langchain_core.messages import AIMessage
+
+from src.agent.configuration import Configuration
+from src.agent.model_tiers import _LATENCY_SAMPLES, ModelUsageStats, tracked_structured_call
+from src.agent.schema import VotingOutput
+
+
+def test_tier_routing_precedence() -> None:
+    configuration = Configuration(tier_routes={"hunter:hunter_shoot": "fast", "seer": "fast", "voting": "full"})
+    assert configuration.resolve_tier("villager", "sheriff_nomination") == "fast"
+    assert configuration.resolve_tier("villager", "voting") == "full"
+    assert configuration.resolve_tier("hunter", "hunter_shoot") == "fast"
+    assert configuration.resolve_tier("werewolf", "hunter_shoot") == "full"
+    assert configuration.resolve_tier("seer", "discussion") == "fast"
+    assert configuration.resolve_tier("villager", "discussion") == "full"
+
+
+def test_tier_params_merge_and_validate() -> None:
+    configuration = Configuration(model_tiers={"fast": {"model": "small"}, "local": {"model": "qwen", "openai_api_base": "http://localhost:8000/v1"}})
+    assert configuration.tier_params("fast")["model"] == "small"
+    assert configuration.tier_params("fast")["temperature"] == 0.3
+    assert configuration.tier_params("local")["openai_api_base"].startswith("http://localhost")
+    with pytest.raises(ValueError):
+        configuration.tier_params("missing")
+
+
+def test_tracked_call_records_latency_tokens_and_cost() -> None:
+    stats = ModelUsageStats()
+    config = {"configurable": {"usage_stats": stats}}
+    params = {"input_cost_per_mtok": 1.0, "output_cost_per_mtok": 2.0}
+    raw = AIMessage(content="", usage_metadata={"input_tokens": 1000, "output_tokens": 100, "total_tokens": 1100})
+    parsed = VotingOutput(thought="x", target_id=3)
+    assert tracked_structured_call(config, "fast", params, lambda: {"raw": raw, "parsed": parsed, "parsing_error": None}) == parsed
+    with pytest.raises(ValueError):
+        tracked_structured_call(config, "fast", params, lambda: {"raw": raw, "parsed": None, "parsing_error": ValueError("bad")})
+
+    fast = stats.snapshot()["fast"]
+    assert fast.calls == 2 and fast.failures == 1
+    assert fast.input_tokens == 2000 and fast.output_tokens == 200
+    assert fast.cost_usd == pytest.approx(2 * (1000 * 1.0 + 100 * 2.0) / 1e6)
+    assert "fast" in stats.report()
+
+
+def test_latency_samples_are_capped() -> None:
+    stats = ModelUsageStats()
+    for i in range(_LATENCY_SAMPLES + 500):
+        stats.record("fast", {}, float(i))
+    fast = stats.snapshot()["fast"]
+    assert fast.calls == _LATENCY_SAMPLES + 500 and len(fast.latencies) == _LATENCY_SAMPLES
+    assert fast.latencies[0] == 500.0
@@ -0,0 +1,47 @@
+from src.agent.graph import workflow
+from src.agent.mock_openai import MockBehavior, MockOpenAIServer, mock_model_tiers
+from src.agent.opening_book import OpeningBook, _instantiate, _template, build_opening_book, seat_labels
+from src.agent.replay import ModelTape, record_game, replay_game, state_digest
+from src.agent.schema import DiscussionOutput
+from src.agent.state import Message, PlayerState
+
+
+def test_seats_are_normalized_to_relative_labels() -> None:
+    seer = PlayerState(id=4, role="seer", private_history=[Message(role="system", content="查验反馈：7号玩家的身份是【狼人】。")])
+    state = {
+        "players": [seer], "alive_players": [1, 4, 7, 9], "history": [Message(role="seer", content="我是预言家，查验2号是好人", player_id=9)],
+        "election_candidates": [4, 9], "pk_candidates": [], "last_night_dead": [1], "sheriff_id": None,
+    }
+    labels = seat_labels(seer, state)
+    assert labels == {4: "self", 7: "chk0", 9: "cand0", 1: "dead0", 2: "ref0"}
+
+    output = DiscussionOutput(thought="9号悍跳", speech="我才是预言家，7号查杀，9号是狼。")
+    data = _template(output, labels)
+    assert data["speech"] == "我才是预言家，{chk0}号查杀，{cand0}号是狼。"
+    assert _template(DiscussionOutput(thought="", speech="3号很可疑"), labels) is None
+
+    other = {5: "self", 8: "chk0", 2: "cand0"}
+    assert _instantiate("DiscussionOutput", data, other).speech == "我才是预言家，8号查杀，2号是狼。"
+
+
+def test_book_serves_day_one_and_replays_without_it(tmp_path) -> None:
+    server = MockOpenAIServer(port=0, behavior=MockBehavior(latency="fixed", median_s=0.0, seed=8))
+    server.start_in_thread()
+    configurable = {"preset": "classic_9", "seed": 8, "model_tiers": mock_model_tiers(server.base_url)}
+    graph = workflow.compile()
+    record_game(configurable, str(tmp_path / "source.jsonl"), graph=graph, recursion_limit=2000)
+
+    book = build_opening_book([str(tmp_path / "source.jsonl")], graph=graph)
+    assert len(book) > 0 and book.stats.hits == 0
+    book.save(str(tmp_path / "book.jsonl"))
+    book = OpeningBook.load(str(tmp_path / "book.jsonl"))
+
+    final = record_game({**configurable, "opening_book": book}, str(tmp_path / "served.jsonl"), graph=graph, recursion_limit=2000)
+    assert final["game_over"] and book.stats.hits > 0
+    served = ModelTape.load(str(tmp_path / "served.jsonl"))
+    assert sum(1 for e in served.entries.values() if e.kind == "opening_book") == book.stats.hits
+    assert "命中" in book.report()
+
+    # 磁带不含开局库对象：取用的决策按磁带还原，重放结果一致
+    replayed = replay_game(str(tmp_path / "served.jsonl"), graph=graph, recursion_limit=2000)
+    assert state_digest(replayed) == state_digest(final)
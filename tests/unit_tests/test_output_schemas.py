@@ -0,0 +1,50 @@
+from src.agent.model_tiers import get_tier_llm
+from src.agent.nodes.roles import player_agent_node
+from src.agent.replay import ModelTape, TapeEntry
+from src.agent.schema import (
+    AgentOutput,
+    DiscussionOutput,
+    NightAction,
+    NominationOutput,
+    VotingOutput,
+    get_output_spec,
+)
+from src.utils.helpers import get_default_state
+
+
+def test_turn_types_map_to_minimal_schemas() -> None:
+    assert get_output_spec("day", "voting").output_schema is VotingOutput
+    assert get_output_spec("day", "sheriff_voting").output_schema is VotingOutput
+    assert get_output_spec("day", "sheriff_nomination").output_schema is NominationOutput
+    assert get_output_spec("day", "discussion").output_schema is DiscussionOutput
+    assert get_output_spec("day", "discussion", is_sheriff=True).output_schema is AgentOutput
+    assert get_output_spec("night", "wolf_kill").output_schema is NightAction
+    assert get_output_spec("day", "hunter_shoot").output_schema is NightAction
+    assert get_output_spec("day", "voting").max_tokens < get_output_spec("day", "discussion").max_tokens
+    assert get_tier_llm({"model": "deepseek-chat", "api_key": "test-key"}, 256).max_tokens == 256  # 只构建客户端，不发请求
+
+
+def _turn_state(turn_type: str) -> dict:
+    state = get_default_state(seed=1)
+    state.update({"phase": "day", "day_count": 1, "turn_type": turn_type, "current_player_id": 2})
+    return state
+
+
+def _tape(output) -> dict:
+    tape = ModelTape("replay")
+    type_ = type(output).__name__
+    tape.entries[(None, 2, "player", 0)] = TapeEntry(step=None, player_id=2, kind="player", seq=0, type=type_, data=output.model_dump())
+    return {"configurable": {"model_tape": tape}}
+
+
+def test_vote_turn_uses_vote_only_output() -> None:
+    updates = player_agent_node(_turn_state("voting"), _tape(VotingOutput(thought="3号可疑", target_id=3)))
+    assert updates["votes"] == {2: 3}
+    assert "history" not in updates
+    assert updates["players"][0].private_thoughts[-1] == "3号可疑"
+
+
+def test_failed_nomination_falls_back_to_not_running() -> None:
+    updates = player_agent_node(_turn_state("sheriff_nomination"), {"configurable": {"model_tape": ModelTape("replay")}})
+    assert "election_candidates" not in updates
+    assert updates["last_action"] == "not_run"
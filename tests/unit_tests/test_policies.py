@@ -0,0 +1,39 @@
+import pytest
+
+from src.agent.configuration import Configuration
+from src.agent import policies
+from src.agent.policies import get_policy
+from src.agent.replay import state_digest
+from src.agent.schema import fallback_output
+
+
+def test_resolve_policy_per_seat() -> None:
+    configuration = Configuration(player_policy="bot", seat_policies={"3": "llm"})
+    assert configuration.resolve_policy(3) == "llm"
+    assert configuration.resolve_policy(4) == "bot"
+    assert Configuration().resolve_policy(1) == "llm"
+    with pytest.raises(ValueError):
+        get_policy("missing")
+
+
+def test_bot_game_finishes_deterministically(bot_game) -> None:
+    first = bot_game("classic_9", 7)
+    second = bot_game("classic_9", 7)
+    assert first["game_over"] and first["winner_side"] in ("villager", "werewolf")
+    assert state_digest(first) == state_digest(second)
+
+
+def test_mixed_table_dispatches_by_seat(bot_game, monkeypatch) -> None:
+    seen = []
+
+    class ScriptedPolicy:
+        name = "scripted"
+
+        def decide(self, player, state, config, spec):
+            seen.append(player.id)
+            return fallback_output(spec.output_schema)
+
+    monkeypatch.setitem(policies._POLICIES, "scripted", ScriptedPolicy())  # 只在本测试内注册
+    final = bot_game("classic_6", 1, seat_policies={1: "scripted"})
+    assert final["game_over"]
+    assert seen and set(seen) == {1}
@@ -0,0 +1,54 @@
+import json
+import threading
+import time
+
+from src.agent.profiler import GameProfiler, profile_game
+
+
+def run_model_call(seconds: float) -> None:
+    """与 `model_pool.run_model_call` 同名，模拟等待模型返回"""
+    time.sleep(seconds)
+
+
+def busy(seconds: float) -> None:
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+
+
+def test_samples_split_model_io_from_cpu() -> None:
+    profiler = GameProfiler("g", interval=0.01)
+
+    def worker(label: str, fn, done: threading.Event) -> None:
+        with profiler.track(label):
+            fn(0.3)
+        done.set()
+
+    for label, fn in (("node:player_agent", run_model_call), ("node:action_handler", busy)):
+        done = threading.Event()
+        thread = threading.Thread(target=worker, args=(label, fn, done))
+        thread.start()
+        while not done.is_set():
+            time.sleep(0.02)
+            profiler.sample()
+        thread.join()
+
+    stacks = profiler.collapsed().splitlines()
+    assert any(s.startswith("g;model_io;node:player_agent;") and "run_model_call" in s for s in stacks)
+    assert any(s.startswith("g;cpu;node:action_handler;") and "busy" in s for s in stacks)
+    assert profiler.regions["node:player_agent"].calls == 1
+    assert profiler.regions["node:player_agent"].cpu_s < profiler.regions["node:player_agent"].wall_s
+
+
+def test_profile_game_writes_per_game_files(tmp_path, bot_game) -> None:
+    with profile_game("table-1", str(tmp_path)) as profiler:
+        bot_game("classic_6", 1)
+
+    summary = json.loads((tmp_path / "table-1.summary.json").read_text(encoding="utf-8"))
+    assert (tmp_path / "table-1.collapsed").exists()
+    for label in ("node:game_master", "node:action_handler", "node:player_agent", "reducer:merge_players", "reducer:history"):
+        assert summary["regions"][label]["calls"] > 0
+
+    # 上下文之外不再记录
+    bot_game("classic_6", 1)
+    assert profiler.summary()["regions"] == summary["regions"]
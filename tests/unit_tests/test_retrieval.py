@@ -0,0 +1,64 @@
+from src.agent.retrieval import _INDEXES, TranscriptIndex, get_transcript_index, retrieve_context, tokenize
+from src.agent.state import Message, PlayerState
+
+
+def _history():
+    return [
+        Message(role="seer", content="我是预言家，昨晚查验3号是狼人。", player_id=1),
+        Message(role="villager", content="我是平民，先听后置位。", player_id=2),
+        Message(role="system", content="【上帝公告】第2天。昨晚是平安夜。"),
+        Message(role="werewolf", content="1号是悍跳的，我才是预言家，5号金水。", player_id=3),
+        Message(role="villager", content="天气不错，过。", player_id=4),
+    ]
+
+
+def test_tokenize_mixes_bigrams_and_seat_numbers() -> None:
+    assert tokenize("查验3号是狼人") == ["查验", "3号", "是狼", "狼人"]
+    assert tokenize("过。OK") == ["过", "ok"]
+
+
+def test_index_is_incremental_and_tags_day_and_speaker() -> None:
+    history = _history()
+    index = TranscriptIndex()
+    index.sync(history[:2])
+    index.sync(history)
+    assert len(index) == 5
+
+    hits = index.search("预言家 查验", k=2)
+    assert [h.speaker for h in hits] == [1, 3]
+    assert [h.day for h in hits] == [1, 2]
+    assert [h.speaker for h in index.search("预言家", k=5, speakers=[3])] == [3]
+    assert [h.speaker for h in index.search("预言家", k=5, before=2)] == [1]
+
+
+def test_cached_index_rebuilds_on_diverged_history() -> None:
+    config = {"configurable": {"game_id": "retrieval-test"}}
+    history = _history()
+    first = get_transcript_index(config, history[:3])
+    assert get_transcript_index(config, history) is first and len(first) == 5
+    forked = [Message(role="villager", content="另一个分支", player_id=2)]
+    rebuilt = get_transcript_index(config, forked)
+    assert rebuilt is not first and len(rebuilt) == 1
+
+
+def test_games_without_a_key_are_not_cached() -> None:
+    history = _history()
+    other = [history[0], Message(role="villager", content="别局的发言", player_id=4), history[-1]]
+    for cfg in (None, {"configurable": {}}):
+        index = get_transcript_index(cfg, history)
+        assert index is not get_transcript_index(cfg, history) and len(index) == 5
+        assert len(get_transcript_index(cfg, other)) == 3
+    assert "default" not in _INDEXES
+
+
+def test_retrieve_context_limits_pk_turns_to_candidates() -> None:
+    state = {
+        "history": _history() + [Message(role="system", content="【上帝公告】投票出现平票，玩家 1, 3 进入 PK 环节。")],
+        "players": [PlayerState(id=i, role="villager") for i in range(1, 5)],
+        "turn_type": "pk_discussion",
+        "pk_candidates": [1, 3],
+    }
+    text = retrieve_context(state, {"configurable": {"game_id": "retrieval-pk"}}, k=4, window=1)
+    assert "[第1天 玩家 1]" in text and "[第2天 玩家 3]" in text
+    assert "玩家 2" not in text and "玩家 4" not in text
+    assert retrieve_context(state, None, k=4, window=20) == "暂无"
@@ -0,0 +1,37 @@
+from langgraph.types import Send
+
+from src.agent.serde import SERDE_TYPE, GameStateSerializer
+from src.agent.state import Message, PlayerState
+from src.utils.helpers import get_default_state
+
+
+def test_game_state_channels_round_trip_compactly() -> None:
+    serde = GameStateSerializer()
+    state = get_default_state()
+    state["players"][0].private_history.append(Message(role="system", content="查验反馈：2号玩家的身份是【好人】。"))
+    state["players"][0].private_thoughts.append("先观察")
+    state["history"] = [
+        Message(role="system", content="【上帝公告】第1天。昨晚是平安夜。"),
+        Message(role="seer", content="我是预言家，2号金水。", player_id=3),
+        Message(role="custom-role", content="x", player_id=0),
+    ]
+    state["votes"] = {1: 2, 3: None, 4: 2}
+
+    for key, value in state.items():
+        type_, payload = serde.dumps_typed(value)
+        restored = serde.loads_typed((type_, payload))
+        assert restored == value, key
+
+    type_, _ = serde.dumps_typed(state["players"])
+    assert type_ == SERDE_TYPE
+    restored_votes = serde.loads_typed(serde.dumps_typed(state["votes"]))
+    assert all(isinstance(k, int) for k in restored_votes)
+
+
+def test_send_packets_and_unknown_types() -> None:
+    serde = GameStateSerializer()
+    packet = Send("player_agent", {"players": [PlayerState(id=1, role="witch")], "votes": {2: 1}})
+    assert serde.loads_typed(serde.dumps_typed(packet)) == packet
+    # 未知类型整体回退到默认序列化器
+    assert serde.loads_typed(serde.dumps_typed({1, 2})) == {1, 2}
+    assert serde.loads_typed(serde.dumps_typed(None)) is None
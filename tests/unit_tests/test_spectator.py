@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+from src.agent.host import GameHost
+from src.agent.spectator import SpectatorServer, compute_delta
+from src.agent.state import Message
+
+
+def test_compute_delta_only_carries_changes() -> None:
+    prev = {"phase": "night", "day_count": 1, "alive_players": [1, 2, 3], "history": [Message(role="system", content="a")], "sheriff_id": None}
+    cur = {**prev, "phase": "day", "alive_players": [1, 3], "history": prev["history"] + [Message(role="system", content="b")], "last_thought": "x"}
+    assert compute_delta(prev, cur) == {
+        "phase": "day",
+        "last_thought": "x",
+        "messages": [{"role": "system", "content": "b", "player_id": None}],
+        "deaths": [2],
+    }
+    assert compute_delta(cur, cur) is None
+
+
+async def _read_events(port: int, game_id: str):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /games/{game_id}/events HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    body = raw.split(b"\r\n\r\n", 1)[1].decode()
+    events = []
+    for frame in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_viewers_rebuild_history_from_deltas() -> None:
+    async def scenario():
+        server = SpectatorServer(port=0)
+        await server.start()
+        host = GameHost(spectators=server)
+        host.add_game("t1", {"preset": "classic_6", "seed": 4, "player_policy": "bot"})
+        viewers = [asyncio.create_task(_read_events(server.port, "t1")) for _ in range(3)]
+        while len(server.feeds["t1"].viewers) < 3:
+            await asyncio.sleep(0.01)
+        finals = await host.run()
+        results = await asyncio.gather(*viewers)
+        assert server.feeds == {}  # 结束后不再常驻终局状态
+        await server.close()
+        return finals["t1"], results
+
+    final, results = asyncio.run(scenario())
+    expected = [m.content for m in final["history"]]
+    for events in results:
+        assert events[-1] == ("end", {"winner_side": final["winner_side"], "error": None})
+        messages = [m["content"] for kind, data in events if kind == "delta" for m in data.get("messages", [])]
+        assert messages == expected
+
+
+def test_unknown_games_are_not_found() -> None:
+    async def scenario():
+        server = SpectatorServer(port=0)
+        await server.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(b"GET /games/typo/events HTTP/1.1\r\nHost: x\r\n\r\n")
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.read(), timeout=5)
+        writer.close()
+        await server.close()
+        return raw, server.games()
+
+    raw, games = asyncio.run(scenario())
+    assert raw.startswith(b"HTTP/1.1 404") and games == []
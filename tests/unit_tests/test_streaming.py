@@ -0,0 +1,65 @@
+import json
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.agent.graph import workflow
+from src.agent.schema import DiscussionOutput
+from src.agent.streaming import SpeechStreamer, stream_structured_call
+
+
+class FakeToolStreamModel(BaseChatModel):
+    """按固定片段流式返回一次函数调用参数"""
+
+    pieces: List[str]
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-tool-stream"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> Any:
+        return self.bind(**kwargs)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=""))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for i, piece in enumerate(self.pieces):
+            chunk = AIMessageChunk(
+                content="",
+                tool_call_chunks=[{"name": "DiscussionOutput" if i == 0 else None, "args": piece, "id": "call_1" if i == 0 else None, "index": 0}],
+            )
+            if i == len(self.pieces) - 1:
+                chunk.usage_metadata = {"input_tokens": 50, "output_tokens": 20, "total_tokens": 70}
+            yield ChatGenerationChunk(message=chunk)
+
+
+def test_stream_structured_call_pushes_speech_deltas() -> None:
+    args = json.dumps({"thought": "先听听", "speech": "我是好人，我怀疑3号。"}, ensure_ascii=False)
+    pieces = [args[i : i + 7] for i in range(0, len(args), 7)]
+    events = []
+    streamer = SpeechStreamer(events.append, player_id=2, turn_type="discussion", day=1)
+    result = stream_structured_call(FakeToolStreamModel(pieces=pieces), DiscussionOutput, "prompt", streamer)
+
+    assert result["parsing_error"] is None
+    assert result["parsed"] == DiscussionOutput(thought="先听听", speech="我是好人，我怀疑3号。")
+    assert result["raw"].usage_metadata["output_tokens"] == 20
+    assert len(events) > 1 and all(e["type"] == "speech_delta" and e["player_id"] == 2 for e in events)
+    assert "".join(e["delta"] for e in events) == "我是好人，我怀疑3号。"
+
+
+def test_speech_end_events_precede_history_commit(bot_config) -> None:
+    config = bot_config("classic_6", 2)
+    pending = None
+    ends = 0
+    for mode, chunk in workflow.compile().stream({}, config, stream_mode=["custom", "updates"]):
+        if mode == "custom" and chunk["type"] == "speech_end":
+            pending = chunk
+            ends += 1
+        elif mode == "updates" and pending is not None and "player_agent" in chunk:
+            committed = chunk["player_agent"].get("history", [])
+            assert [(m.player_id, m.content) for m in committed] == [(pending["player_id"], pending["speech"])]
+            pending = None
+    assert ends > 0 and pending is None
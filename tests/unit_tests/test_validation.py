@@ -0,0 +1,115 @@
+from src.agent.graph import workflow
+from src.agent.mock_openai import MockBehavior, MockOpenAIServer, mock_model_tiers
+from src.agent.schema import ACTION_SPEC, SPEECH_ACTION_SPEC, VOTE_SPEC, AgentOutput, NightAction, VotingOutput
+from src.agent.state import PlayerState
+from src.agent.validation import ValidationStats, decide_validated, validate_output
+
+
+def _state(turn_type, **extra):
+    state = {
+        "phase": "night",
+        "turn_type": turn_type,
+        "day_count": 2,
+        "alive_players": [1, 2, 3, 4, 5, 6],
+        "sheriff_id": None,
+        "last_guarded_id": None,
+        "witch_potions": {"save": True, "poison": True},
+        "night_actions": {},
+        "election_candidates": [],
+        "pk_candidates": [],
+    }
+    state.update(extra)
+    return state
+
+
+def _night(action, target):
+    return NightAction(thought="t", action_type=action, target_id=target)
+
+
+def test_live_rules_reject_illegal_targets() -> None:
+    guard = PlayerState(id=2, role="guard")
+    state = _state("guard_protect", last_guarded_id=3)
+    assert validate_output(_night("protect", 4), state, guard, ACTION_SPEC).status == "valid"
+    verdict = validate_output(_night("protect", 3), state, guard, ACTION_SPEC)
+    assert verdict.status == "invalid" and "连续" in verdict.reason and "3号" not in verdict.options
+
+    witch = PlayerState(id=5, role="witch")
+    no_save = _state("witch_action", witch_potions={"save": False, "poison": True}, night_actions={"wolf_kill": 1})
+    assert validate_output(_night("save", 1), no_save, witch, ACTION_SPEC).status == "invalid"
+
+    voter = PlayerState(id=1, role="villager")
+    assert validate_output(VotingOutput(thought="t", target_id=9), _state("voting"), voter, VOTE_SPEC).status == "invalid"
+    assert validate_output(VotingOutput(thought="t", target_id=None), _state("voting"), voter, VOTE_SPEC).status == "valid"
+    sheriff_vote = _state("sheriff_voting", election_candidates=[3, 4])
+    assert validate_output(VotingOutput(thought="t", target_id=5), sheriff_vote, voter, VOTE_SPEC).status == "invalid"
+
+
+def test_clear_intent_is_repaired_locally() -> None:
+    wolf = PlayerState(id=1, role="werewolf")
+    verdict = validate_output(_night("check", 4), _state("wolf_kill"), wolf, ACTION_SPEC)
+    assert verdict.status == "repaired" and verdict.output.action_type == "kill" and verdict.output.target_id == 4
+
+    assert validate_output(_night("pass", 4), _state("wolf_kill"), wolf, ACTION_SPEC).output.target_id is None
+    transfer = validate_output(_night("pass", None), _state("sheriff_transfer"), wolf, ACTION_SPEC)
+    assert transfer.output.action_type == "rip_badge"
+
+    witch = PlayerState(id=5, role="witch")
+    state = _state("witch_action", night_actions={"wolf_kill": 2})
+    assert validate_output(_night("save", 3), state, witch, ACTION_SPEC).output.target_id == 2
+    assert validate_output(_night("kill", 2), state, witch, ACTION_SPEC).output.action_type == "save"
+
+    sheriff = PlayerState(id=3, role="villager")
+    speech = AgentOutput(thought="t", speech=" 过 ", action="顺时针", target_id=None)
+    repaired = validate_output(speech, _state("discussion", phase="day", sheriff_id=3), sheriff, SPEECH_ACTION_SPEC)
+    assert repaired.status == "repaired" and repaired.output.action == "clockwise" and repaired.output.speech == "过"
+
+
+def test_reask_once_then_fallback() -> None:
+    class Flaky:
+        name = "flaky"
+
+        def __init__(self, second):
+            self.second = second
+            self.reasks = []
+
+        def decide(self, player, state, config, spec):
+            return VotingOutput(thought="t", target_id=42)
+
+        def reask(self, player, state, config, spec, verdict):
+            self.reasks.append(verdict.options)
+            return VotingOutput(thought="t", target_id=self.second)
+
+    stats = ValidationStats()
+    config = {"configurable": {"validation_stats": stats}}
+    player = PlayerState(id=1, role="villager")
+    fixed = Flaky(second=2)
+    assert decide_validated(fixed, player, _state("voting"), config, VOTE_SPEC).target_id == 2
+    assert len(fixed.reasks) == 1 and "2号" in fixed.reasks[0]
+    assert decide_validated(Flaky(second=42), player, _state("voting"), config, VOTE_SPEC) is None
+
+    off = {"configurable": {"validation_stats": stats, "output_reask": False}}
+    assert decide_validated(Flaky(second=2), player, _state("voting"), off, VOTE_SPEC) is None
+    voting = stats.snapshot()["voting"]
+    assert (voting.reasked, voting.fallback, voting.reask_calls) == (1, 2, 2)
+    assert "voting" in stats.report()
+
+
+def test_bot_game_consumes_potions_and_never_falls_back(bot_game) -> None:
+    stats = ValidationStats()
+    final = bot_game("classic_12", 3, validation_stats=stats)
+    assert final["game_over"]
+    assert final["witch_potions"]["save"] is False  # 首夜必救
+    assert sum(s.fallback for s in stats.snapshot().values()) == 0
+
+
+def test_llm_game_only_applies_legal_votes() -> None:
+    server = MockOpenAIServer(port=0, behavior=MockBehavior(latency="fixed", median_s=0.0, seed=5))
+    server.start_in_thread()
+    stats = ValidationStats()
+    config = {"recursion_limit": 2000, "configurable": {"preset": "classic_9", "seed": 5, "model_tiers": mock_model_tiers(server.base_url), "validation_stats": stats}}
+    final = workflow.compile().invoke({}, config)
+    assert final["game_over"]
+    seats = {p.id for p in final["players"]}
+    assert all(v["target"] is None or (v["target"] in seats and v["target"] != v["voter"]) for v in final["vote_log"])
+    snapshot = stats.snapshot()
+    assert sum(s.valid + s.repaired + s.reasked + s.fallback for s in snapshot.values()) > 0